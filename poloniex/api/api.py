@@ -1,4 +1,6 @@
 from poloniex.api.coach import Coach
+from poloniex.api.cache import ResponseCache
+from poloniex.api.nonce import NonceManager
 
 import time
 import calendar
@@ -7,8 +9,14 @@ import json
 import hmac
 import hashlib
 import requests
+from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlencode
 
+PUBLIC_URL = 'https://poloniex.com/public'
+PRIVATE_URL = 'https://poloniex.com/tradingApi'
+
 PUBLIC_COMMANDS = [
     'returnTicker',
     'return24hVolume',
@@ -52,17 +60,38 @@ class PoloniexAPI(object):
     """The Poloniex Object!"""
     def __init__(
             self, APIKey=False, Secret=False,
-            timeout=3, coach=False, loglevel=logging.WARNING):
+            timeout=3, coach=False, loglevel=logging.WARNING,
+            privateCoach=None, poolSize=10, retries=2, cache=False,
+            nonces=None):
         """
         APIKey = str api key supplied by Poloniex
         Secret = str secret hash supplied by Poloniex
         timeout = int time in sec to wait for an api response
             (otherwise 'requests.exceptions.Timeout' is raised)
-        coach = bool to indicate if the api coach should be used
+        coach = bool to indicate if the api coach should be used,
+            or a Coach object to share one budget between api objects
         loglevel = logging level object to set the module at
             (changes the requests module as well)
+        privateCoach = Coach object giving private commands their own
+            budget [default = share 'coach' with public commands]
+        poolSize = int max keep-alive connections held open to Poloniex
+        retries = int times a failed connection attempt is retried
+            (only connect errors, a request that reached the server is
+            never re-sent)
+        cache = bool to indicate if slow changing public responses should
+            be cached, or a ResponseCache object to set ttls or share one
+            cache between api objects (private commands are never cached)
+        nonces = NonceManager object shared by every api object using the
+            same APIKey, or a str file path to persist a new one in
+            [default = new unpersisted NonceManager]
 
         self.apiCoach = object that regulates spacing between api calls
+        self.privateCoach = the same for private commands
+        self.session = pooled keep-alive 'requests.Session' used for
+            every call, None for clients that bring their own transport
+        self.timings = (command, secs) of the most recent calls
+        self.cache = ResponseCache object, or None if caching is off
+        self.nonces = NonceManager object handing out nonces
 
         # Time Placeholders # (MONTH == 30*DAYS)
 
@@ -76,17 +105,78 @@ class PoloniexAPI(object):
         # Suppress the requests	module logging output
         logging.getLogger("requests").setLevel(loglevel)
         logging.getLogger("urllib3").setLevel(loglevel)
-        # Call coach, set nonce
-        self.apiCoach, self.nonce = [Coach(), int(time.time())]
+        # Call coach, set nonce manager
+        self.apiCoach = coach if isinstance(coach, Coach) else Coach()
+        self.privateCoach = privateCoach if privateCoach else self.apiCoach
+        if isinstance(nonces, NonceManager):
+            self.nonces = nonces
+        else:
+            self.nonces = NonceManager(nonces)
         # Grab keys, set timeout, ditch coach?
         self.APIKey, self.Secret, self.timeout, self._coaching = \
-            [APIKey, Secret, timeout, coach]
+            [APIKey, Secret, timeout, bool(coach)]
+        self.publicURL, self.privateURL = [PUBLIC_URL, PRIVATE_URL]
+        self.session = self._openSession(poolSize, retries)
+        self.timings = deque(maxlen=1000)
+        # Opt in response cache
+        if isinstance(cache, ResponseCache):
+            self.cache = cache
+        else:
+            self.cache = ResponseCache() if cache else None
         # Set time labels
         self.MINUTE, self.HOUR, self.DAY, self.WEEK, self.MONTH, self.YEAR = \
             [60, 60*60, 60*60*24, 60*60*24*7, 60*60*24*30, 60*60*24*365]
 
     # -----------------Meat and Potatos---------------------------------------
-    def api(self, command, args={}):
+    def _openSession(self, poolSize, retries):
+        """
+        Returns a pooled keep-alive session, so only the first call to a
+        host pays for the TCP and TLS handshakes
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=poolSize,
+                max_retries=Retry(
+                    total=retries, connect=retries, read=0, status=0,
+                    backoff_factor=0.05, raise_on_status=False))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        """ Closes the pooled connections """
+        if self.session is not None:
+            self.session.close()
+
+    def _post(self, command, url, **kwargs):
+        """
+        - posts to <url> over the pooled session
+        - records (command, secs) in self.timings
+        - returns decoded json api message
+        """
+        start = time.perf_counter()
+        ret = self.session.post(url, timeout=self.timeout, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.timings.append((command, elapsed))
+        logging.debug("%s took %f sec" % (command, elapsed))
+        return json.loads(ret.text)
+
+    def _sign(self, args):
+        """
+        - signs the url encoded <args> with our Secret
+        - returns the auth headers for a private command
+        """
+        # encode arguments for url
+        postData = urlencode(args)
+        # sign postData with our Secret
+        sign = hmac.new(
+                self.Secret.encode('utf-8'),
+                postData.encode('utf-8'),
+                hashlib.sha512)
+        return {'Sign': sign.hexdigest(), 'Key': self.APIKey}
+
+    def api(self, command, args=None):
         """
         Main Api Function
         - encodes and sends <command> with optional [args] to Poloniex api
@@ -96,11 +186,8 @@ class PoloniexAPI(object):
         """
         global PUBLIC_COMMANDS, PRIVATE_COMMANDS
 
-        # check in with the coach
-        if self._coaching:
-            self.apiCoach.wait()
-
         # pass the command
+        args = dict(args) if args else {}
         args['command'] = command
 
         # private?
@@ -108,48 +195,44 @@ class PoloniexAPI(object):
             # check for keys
             if not self.APIKey or not self.Secret:
                 raise ValueError("APIKey and Secret needed!")
-            # set nonce
-            args['nonce'] = self.nonce
+            # check in with the coach
+            if self._coaching:
+                self.privateCoach.wait()
+            # set nonce, unique even with other threads signing meanwhile
+            args['nonce'] = self.nonces.next()
 
             try:
-                # encode arguments for url
-                postData = urlencode(args)
-                # sign postData with our Secret
-                sign = hmac.new(
-                        self.Secret.encode('utf-8'),
-                        postData.encode('utf-8'),
-                        hashlib.sha512)
-                # post request
-                ret = requests.post(
-                        'https://poloniex.com/tradingApi',
+                # post request, return decoded json
+                return self._post(
+                        command,
+                        self.privateURL,
                         data=args,
-                        headers={
-                            'Sign': sign.hexdigest(),
-                            'Key': self.APIKey
-                            },
-                        timeout=self.timeout)
-                # return decoded json
-                return json.loads(ret.text)
+                        headers=self._sign(args))
 
             except Exception as e:
                 raise e
 
-            finally:
-                # increment nonce(no matter what)
-                self.nonce += 1
-
         # public?
         elif command in PUBLIC_COMMANDS:
-            try:
-                ret = requests.post(
-                        'https://poloniex.com/public?' + urlencode(args),
-                        timeout=self.timeout)
-                return json.loads(ret.text)
-            except Exception as e:
-                raise e
+            # cached?
+            if self.cache is not None and self.cache.caches(command):
+                return self.cache.get(
+                        command, args, lambda: self._public(command, args))
+            return self._public(command, args)
         else:
             raise ValueError("Invalid Command!")
 
+    def _public(self, command, args):
+        """ Sends a public <command>, returns decoded json api message """
+        # check in with the coach
+        if self._coaching:
+            self.apiCoach.wait()
+        try:
+            return self._post(
+                    command, self.publicURL + '?' + urlencode(args))
+        except Exception as e:
+            raise e
+
     # Conversions
     def epoch2UTCstr(self, timestamp=time.time(), fmat="%Y-%m-%d %H:%M:%S"):
         """
@@ -244,15 +327,14 @@ class PoloniexAPI(object):
         if not start:
             start = time.time()-self.HOUR
         try:
-            ret = requests.post(
-                    'https://poloniex.com/public?'+urlencode({
+            return self._post(
+                    'returnTradeHistory',
+                    self.publicURL + '?' + urlencode({
                         'command': 'returnTradeHistory',
                         'currencyPair': str(pair),
                         'start': str(start),
                         'end': str(end)
-                        }),
-                    timeout=self.timeout)
-            return json.loads(ret.text)
+                        }))
         except Exception as e:
             raise e
 
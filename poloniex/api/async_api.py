@@ -0,0 +1,152 @@
+from poloniex.api.api import PoloniexAPI, PUBLIC_COMMANDS, PRIVATE_COMMANDS
+
+import asyncio
+import time
+import logging
+import json
+import aiohttp
+from urllib.parse import urlencode
+
+
+class AsyncPoloniexAPI(PoloniexAPI):
+    """
+    The Poloniex Object, for asyncio!
+
+    Every PoloniexAPI command wrapper (marketTicker, buy, cancelOrder...)
+    works unchanged and returns a coroutine, because they all go through
+    the api() coroutine below. Calls share the same Coach budgets as the
+    synchronous client, so bulk helpers keep as many requests in flight as
+    the limit allows and no more.
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as PoloniexAPI, 'coach' defaults to True
+        since the bulk helpers would otherwise fire every request at once
+
+        self.aioSession = pooled 'aiohttp.ClientSession', opened on the
+            first call
+        """
+        kwargs.setdefault('coach', True)
+        self._poolSize = kwargs.get('poolSize', 10)
+        PoloniexAPI.__init__(self, *args, **kwargs)
+        self.aioSession = None
+
+    def _openSession(self, poolSize, retries):
+        """ Calls go over aioSession, no requests.Session is needed """
+        return None
+
+    async def close(self):
+        """ Closes the pooled connections """
+        if self.aioSession is not None:
+            await self.aioSession.close()
+            self.aioSession = None
+
+    async def _post(self, command, url, **kwargs):
+        """
+        - posts to <url> over the pooled aiohttp session
+        - records (command, secs) in self.timings
+        - returns decoded json api message
+        """
+        if self.aioSession is None:
+            self.aioSession = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self._poolSize),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout))
+        start = time.perf_counter()
+        async with self.aioSession.post(url, **kwargs) as ret:
+            text = await ret.text()
+        elapsed = time.perf_counter() - start
+        self.timings.append((command, elapsed))
+        logging.debug("%s took %f sec" % (command, elapsed))
+        return json.loads(text)
+
+    async def api(self, command, args=None):
+        """
+        Main Api Coroutine
+        - same as PoloniexAPI.api(), awaits the coach instead of sleeping
+        """
+        # pass the command
+        args = dict(args) if args else {}
+        args['command'] = command
+
+        # private?
+        if command in PRIVATE_COMMANDS:
+            # check for keys
+            if not self.APIKey or not self.Secret:
+                raise ValueError("APIKey and Secret needed!")
+            # check in with the coach
+            if self._coaching:
+                await self.privateCoach.waitAsync()
+            # set nonce, unique even with other tasks signing meanwhile
+            args['nonce'] = self.nonces.next()
+            headers = self._sign(args)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            return await self._post(
+                    command,
+                    self.privateURL,
+                    data=urlencode(args),
+                    headers=headers)
+
+        # public?
+        elif command in PUBLIC_COMMANDS:
+            # cached?
+            if self.cache is not None and self.cache.caches(command):
+                return await self.cache.getAsync(
+                        command, args, lambda: self._public(command, args))
+            return await self._public(command, args)
+        else:
+            raise ValueError("Invalid Command!")
+
+    async def _public(self, command, args):
+        """ Sends a public <command>, returns decoded json api message """
+        # check in with the coach
+        if self._coaching:
+            await self.apiCoach.waitAsync()
+        return await self._post(
+                command, self.publicURL + '?' + urlencode(args))
+
+    async def marketTradeHist(self, pair, start=False, end=None):
+        """
+        Returns public trade history for <pair>
+        starting at <start> and ending at [end=time.time()]
+        """
+        if self._coaching:
+            await self.apiCoach.waitAsync()
+        if not start:
+            start = time.time()-self.HOUR
+        if end is None:
+            end = time.time()
+        return await self._post(
+                'returnTradeHistory',
+                self.publicURL + '?' + urlencode({
+                    'command': 'returnTradeHistory',
+                    'currencyPair': str(pair),
+                    'start': str(start),
+                    'end': str(end)
+                    }))
+
+    # --BULK COMMANDS---------------------------------------------------------
+    async def _gather(self, keys, calls):
+        """
+        - runs <calls> concurrently, the coach paces them
+        - returns dict of key: result (or the exception it raised)
+        """
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        return dict(zip(keys, results))
+
+    async def marketOrdersBulk(self, pairs, depth=20):
+        """ Returns dict of pair: orderbook for every pair in <pairs> """
+        pairs = list(pairs)
+        return await self._gather(
+                pairs, [self.marketOrders(pair, depth) for pair in pairs])
+
+    async def marketTradeHistBulk(self, pairs, start=False):
+        """ Returns dict of pair: trade history for every pair in <pairs> """
+        pairs = list(pairs)
+        return await self._gather(
+                pairs, [self.marketTradeHist(pair, start) for pair in pairs])
+
+    async def cancelOrders(self, orderIds):
+        """ Cancels every order in <orderIds>, returns dict of id: result """
+        orderIds = list(orderIds)
+        return await self._gather(
+                orderIds, [self.cancelOrder(orderId) for orderId in orderIds])
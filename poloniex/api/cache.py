@@ -0,0 +1,176 @@
+from collections import OrderedDict
+import asyncio
+import threading
+import time
+
+# secs a response stays fresh, per public command
+DEFAULT_TTLS = {
+    'returnTicker': 1.0,
+    'return24hVolume': 60.0,
+    'returnCurrencies': 300.0,
+    'returnLoanOrders': 10.0}
+
+
+class _Call(object):
+    """ An in flight fetch that identical concurrent calls wait on """
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done, self.value, self.error = [threading.Event(), None, None]
+
+
+class ResponseCache(object):
+    """
+    Size bounded LRU cache of public api responses, keyed by command and
+    args, each command with its own time to live. Concurrent identical
+    calls are coalesced: the first one fetches, the rest wait for its
+    result instead of spending rate limit budget on the same request.
+    Error responses are passed on but never cached.
+    Cached responses are shared, treat them as read only.
+    """
+    def __init__(self, ttls=None, maxSize=256):
+        """
+        ttls = dict of command: secs, merged over DEFAULT_TTLS, commands
+            without a ttl are never cached
+        maxSize = int max number of responses held
+        """
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.maxSize = maxSize
+        # key: (expiry, response), least recently used first
+        self._entries = OrderedDict()
+        # key: _Call for fetches in flight from threads
+        self._calls = {}
+        # key: [asyncio.Task, callers waiting] for fetches in flight from
+        # coroutines
+        self._futures = {}
+        self._lock = threading.Lock()
+        # metrics
+        self.hits, self.misses, self.coalesced = [0, 0, 0]
+
+    def caches(self, command):
+        """ Returns True if responses to <command> are cached """
+        return command in self.ttls
+
+    @staticmethod
+    def key(command, args):
+        return (command, tuple(sorted(
+            (k, str(v)) for k, v in args.items() if k != 'command')))
+
+    def _lookup(self, key):
+        """ Returns the fresh cached response for <key>, or None """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _store(self, key, command, value):
+        """ Caches <value>, unless it is an {'error': ...} api response """
+        if isinstance(value, dict) and 'error' in value:
+            return
+        self._entries[key] = (time.monotonic() + self.ttls[command], value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def get(self, command, args, fetch):
+        """
+        - returns the cached response for <command> <args> if fresh
+        - otherwise calls fetch() once, however many threads ask at once
+        """
+        key = self.key(command, args)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fetch()
+            with self._lock:
+                self._store(key, command, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def getAsync(self, command, args, fetch):
+        """
+        - get() for coroutines, fetch is a coroutine function
+        - must be used from a single event loop
+        - a cancelled caller stops waiting, the fetch itself is only
+          cancelled once no caller is left waiting on it
+        """
+        key = self.key(command, args)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            shared = self._futures.get(key)
+            if shared is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        if shared is None:
+            task = asyncio.ensure_future(self._fetchAsync(key, command, fetch))
+            shared = self._futures[key] = [task, 0]
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        task = shared[0]
+        shared[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if shared[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            shared[1] -= 1
+
+    async def _fetchAsync(self, key, command, fetch):
+        """ The fetch every getAsync() call for <key> waits on """
+        value = await fetch()
+        with self._lock:
+            self._store(key, command, value)
+        return value
+
+    def _forget(self, key, task):
+        """ Drops <task> from the fetches in flight once it is done """
+        shared = self._futures.get(key)
+        if shared is not None and shared[0] is task:
+            del self._futures[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """ Returns a dict of hits, misses, coalesced calls and size """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'size': len(self._entries)
+            }
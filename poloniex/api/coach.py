@@ -1,3 +1,6 @@
+from collections import deque
+import asyncio
+import threading
 import time
 import logging
 
@@ -6,6 +9,13 @@ class Coach(object):
     """
     Coaches the api wrapper, makes sure it doesn't get all hyped up on Mt.Dew
     Poloniex default call limit is 6 calls per 1 sec.
+
+    The limit is enforced as a token bucket holding one token per call
+    slot: each call reserves the slot freed 'timeFrame' after the call
+    'callLimit' calls before it, so a full burst goes through at once but no
+    'timeFrame' window ever holds more than 'callLimit' calls. Reserving a
+    slot is O(1) under a lock, the sleep happens outside it, so any number
+    of threads and asyncio tasks can share one Coach.
     """
     def __init__(self, timeFrame=1.0, callLimit=6):
         """
@@ -13,39 +23,56 @@ class Coach(object):
         callLimit = int max amount of calls per 'timeFrame' [default = 6]
         """
         self._timeFrame, self._callLimit = [timeFrame, callLimit]
-        self._timeBook = []
+        # reserved start times of the last 'callLimit' calls, oldest first
+        self._timeBook = deque(maxlen=callLimit)
+        self._lock = threading.Lock()
+        # metrics
+        self.calls, self.waits, self.waitTime = [0, 0, 0.0]
+
+    def _reserve(self):
+        """ Claims the next slot, returns the secs to wait before using it """
+        with self._lock:
+            now = time.monotonic()
+            start = now
+            # no free token? take the one the oldest call gives back
+            if len(self._timeBook) == self._callLimit:
+                start = max(now, self._timeBook[0] + self._timeFrame)
+            self._timeBook.append(start)
+            delay = start - now
+            self.calls += 1
+            if delay > 0:
+                self.waits += 1
+                self.waitTime += delay
+        return delay
 
     def wait(self):
         """ Makes sure our api calls don't go past the api call limit """
-        # what time is it?
-        now = time.time()
-        # if it's our turn
-        if len(self._timeBook) is 0 or \
-                (now - self._timeBook[-1]) >= self._timeFrame:
-            # add 'now' to the front of 'timeBook', pushing other times back
-            self._timeBook.insert(0, now)
-            logging.info(
-                "Now: %d  Oldest Call: %d  Diff: %f sec" %
-                (now, self._timeBook[-1], now - self._timeBook[-1])
-                )
-            # 'timeBook' list is longer than 'callLimit'?
-            if len(self._timeBook) > self._callLimit:
-                # remove the oldest time
-                self._timeBook.pop()
-        else:
-            logging.info(
-                "Now: %d  Oldest Call: %d  Diff: %f sec" %
-                (now, self._timeBook[-1], now - self._timeBook[-1])
-                )
-            logging.info(
-                "Waiting %s sec..." %
-                str(self._timeFrame-(now - self._timeBook[-1]))
-                )
-            # wait your turn (maxTime - (now - oldest)) = time left to wait
-            time.sleep(self._timeFrame-(now - self._timeBook[-1]))
-            # add 'now' to the front of 'timeBook', pushing other times back
-            self._timeBook.insert(0, time.time())
-            # 'timeBook' list is longer than 'callLimit'?
-            if len(self._timeBook) > self._callLimit:
-                # remove the oldest time
-                self._timeBook.pop()
\ No newline at end of file
+        delay = self._reserve()
+        if delay > 0:
+            logging.info("Waiting %f sec..." % delay)
+            time.sleep(delay)
+
+    async def waitAsync(self):
+        """ wait() for asyncio callers, sleeps without blocking the loop """
+        delay = self._reserve()
+        if delay > 0:
+            logging.info("Waiting %f sec..." % delay)
+            await asyncio.sleep(delay)
+
+    def tokens(self):
+        """ Returns the number of calls that could go through right now """
+        with self._lock:
+            since = time.monotonic() - self._timeFrame
+            return self._callLimit - sum(1 for t in self._timeBook if t > since)
+
+    def metrics(self):
+        """
+        Returns a dict of calls made, calls that waited, total secs
+        waited and tokens currently available
+        """
+        return {
+            'calls': self.calls,
+            'waits': self.waits,
+            'waitTime': self.waitTime,
+            'tokens': self.tokens()
+            }
@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+
+
+class NonceManager(object):
+    """
+    Hands out strictly increasing nonces to any number of threads and
+    asyncio tasks (allocation never awaits, so one lock covers both).
+
+    Nonces follow the clock in milliseconds, so they stay ahead of anything
+    a previous run sent. With a 'path', a high-water mark is persisted
+    ahead of use: every nonce handed out is below the mark on disk, so a
+    restart, even after a crash or a clock step back, resumes above it.
+    """
+    def __init__(self, path=None, reserve=60000):
+        """
+        path = str file to persist the high-water mark in [default = None,
+            nothing persisted]
+        reserve = int nonces claimed per write to 'path', the file is
+            written at most once per 'reserve' nonces (or ms)
+        """
+        self._path, self._reserve = [path, reserve]
+        self._lock = threading.Lock()
+        # every nonce below this has been, or may have been, used
+        self._next = self._load()
+        # nonces below this are covered by the mark on disk
+        self._ceiling = self._next
+
+    def _load(self):
+        if self._path and os.path.exists(self._path):
+            with open(self._path) as f:
+                return int(f.read().strip() or 0)
+        return 0
+
+    def _persist(self, ceiling):
+        """ Writes <ceiling> atomically, a torn write can't lower it """
+        tmpPath = self._path + '.tmp'
+        with open(tmpPath, 'w') as f:
+            f.write(str(ceiling))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, self._path)
+
+    def next(self):
+        """ Returns the next nonce, greater than every nonce before it """
+        with self._lock:
+            nonce = max(self._next, int(time.time() * 1000))
+            self._next = nonce + 1
+            if self._path and self._next > self._ceiling:
+                self._ceiling = self._next + self._reserve
+                self._persist(self._ceiling)
+            return nonce
+
+    __next__ = next
+
+    def __iter__(self):
+        return self
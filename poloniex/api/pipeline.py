@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+
+class OrderPipeline(object):
+    """
+    Keeps several signed private order requests (buy, sell, moveOrder,
+    cancelOrder) in flight at once over one PoloniexAPI.
+
+    Each request takes its nonce from the api's NonceManager when it is
+    sent, not when it is queued. Requests still race on the wire, so one
+    can reach the exchange after a higher nonce and be rejected for it.
+    The exchange rejects those before acting on them, so the pipeline
+    re-signs and re-sends them with a fresh nonce.
+    """
+    def __init__(self, api, inFlight=4, nonceRetries=3):
+        """
+        api = PoloniexAPI with keys, its 'poolSize' should be at least
+            'inFlight'
+        inFlight = int max requests in flight at once
+        nonceRetries = int times a request rejected for its nonce is
+            re-signed and re-sent
+        """
+        self.api, self.nonceRetries = [api, nonceRetries]
+        self._executor = ThreadPoolExecutor(max_workers=inFlight)
+        # metrics
+        self.sent, self.nonceRetried = [0, 0]
+
+    def _call(self, command, args):
+        for attempt in range(self.nonceRetries + 1):
+            self.sent += 1
+            ret = self.api.api(command, args)
+            error = ret.get('error', '') if isinstance(ret, dict) else ''
+            if 'nonce' not in error.lower():
+                break
+            self.nonceRetried += 1
+            logging.info("%s rejected for its nonce, re-sending" % command)
+        return ret
+
+    def submit(self, command, args):
+        """
+        - queues private <command> with [args]
+        - returns a concurrent.futures.Future of the decoded json message
+        """
+        return self._executor.submit(self._call, command, dict(args))
+
+    def buy(self, pair, rate, amount):
+        """ Queues buy order for <pair> at <rate> for <amount> """
+        return self.submit('buy', {
+                    'currencyPair': str(pair),
+                    'rate': str(rate),
+                    'amount': str(amount)
+                    })
+
+    def sell(self, pair, rate, amount):
+        """ Queues sell order for <pair> at <rate> for <amount> """
+        return self.submit('sell', {
+                    'currencyPair': str(pair),
+                    'rate': str(rate),
+                    'amount': str(amount)
+                    })
+
+    def cancelOrder(self, orderId):
+        """ Queues cancel of order <orderId> """
+        return self.submit('cancelOrder', {'orderNumber': str(orderId)})
+
+    def moveOrder(self, orderId, rate, amount):
+        """ Queues move of order <orderId> to <rate> for <amount> """
+        return self.submit('moveOrder', {
+                    'orderNumber': str(orderId),
+                    'rate': str(rate),
+                    'amount': str(amount)
+                    })
+
+    def close(self, wait=True):
+        """ Stops taking requests, waits for those in flight if <wait> """
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,107 @@
+"""
+Order book side microbenchmark, the array-backed BookSide against the old FastRBTree + dict books.
+
+Usage:
+	python -m poloniex.bench.book_bench [depth ...]
+"""
+from poloniex.model.wizard_build import BidBook, AskBook
+
+from bintrees import FastRBTree
+import random
+import sys
+import time
+
+
+class RBTreeBook(object):
+	"""
+	The FastRBTree + rate_dict book the BookSide replaced, kept only as the baseline for this benchmark
+	"""
+
+	def __init__(self, side, max_depth, data):
+		self.side = side
+		self.rate_tree = FastRBTree()
+		self.rate_dict = {}
+		self.max_depth = max_depth
+		for level in data:
+			self.rate_tree.insert(float(level[0]), 0)
+			self.rate_dict[float(level[0])] = float(level[1])
+
+	def max_rate_level(self):
+		if self.rate_dict:
+			rate = self.rate_tree.max_key()
+			return rate, self.rate_dict[rate]
+
+	def min_rate_level(self):
+		if self.rate_dict:
+			rate = self.rate_tree.min_key()
+			return rate, self.rate_dict[rate]
+
+	def modify(self, event):
+		rate = float(event[u'data'][u'rate'])
+		amount = float(event[u'data'][u'amount'])
+		if rate in self.rate_dict:
+			self.rate_dict[rate] = amount
+		elif len(self.rate_dict) < self.max_depth:
+			self.rate_tree.insert(rate, 0)
+			self.rate_dict[rate] = amount
+		else:
+			worst = self.rate_tree.min_key() if self.side == 'bid' else self.rate_tree.max_key()
+			if (rate > worst) if self.side == 'bid' else (rate < worst):
+				self.rate_tree.remove(worst)
+				del self.rate_dict[worst]
+				self.rate_tree.insert(rate, 0)
+				self.rate_dict[rate] = amount
+
+	def remove(self, event):
+		rate = float(event[u'data'][u'rate'])
+		if rate in self.rate_dict:
+			self.rate_tree.remove(rate)
+			del self.rate_dict[rate]
+
+
+def make_events(side, depth, n_events, seed=0):
+	"""
+	Modifies and removes clustered around the top of the book, as the live stream produces them
+	"""
+	rng = random.Random(seed)
+	direction = -1 if side == 'bid' else 1
+	data = [['{0:.8f}'.format(0.05 + direction * i * 1e-5), '1.0'] for i in range(depth)]
+	events = []
+	for _ in range(n_events):
+		rate = '{0:.8f}'.format(0.05 + direction * int(rng.expovariate(1.0 / depth)) * 1e-5)
+		if rng.random() < 0.35:
+			events.append((False, {u'type': u'orderBookRemove', u'data': {u'type': side, u'rate': rate}}))
+		else:
+			events.append((True, {u'type': u'orderBookModify', u'data': {
+				u'type': side, u'rate': rate, u'amount': '{0:.8f}'.format(rng.random() * 10)}}))
+	return data, events
+
+
+def run(book, events, best):
+	start = time.perf_counter()
+	for is_modify, event in events:
+		if is_modify:
+			book.modify(event)
+		else:
+			book.remove(event)
+		best()
+	return len(events) / (time.perf_counter() - start)
+
+
+def main(depths=(10, 25, 50), n_events=200000):
+	for depth in depths:
+		for side, book_cls in (('bid', BidBook), ('ask', AskBook)):
+			data, events = make_events(side, depth, n_events)
+			array_book = book_cls(depth, data)
+			tree_book = RBTreeBook(side, depth, data)
+			array_best = array_book.best_level
+			tree_best = tree_book.max_rate_level if side == 'bid' else tree_book.min_rate_level
+			after = run(array_book, events, array_best)
+			before = run(tree_book, events, tree_best)
+			assert sorted(array_book) == sorted(tree_book.rate_dict.items())
+			print('{0} depth {1:>3}: RBTree {2:>10,.0f} ops/sec, BookSide {3:>10,.0f} ops/sec ({4:.1f}x)'.format(
+				side, depth, before, after, after / before))
+
+
+if __name__ == "__main__":
+	main(*([tuple(int(d) for d in sys.argv[1:])] if sys.argv[1:] else []))
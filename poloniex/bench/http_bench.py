@@ -0,0 +1,77 @@
+"""
+HTTP benchmark, N sequential PoloniexAPI calls with and without connection pooling against a local stub server.
+
+Usage:
+	python -m poloniex.bench.http_bench [n_calls]
+"""
+from poloniex.api.api import PoloniexAPI
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+import requests
+import sys
+import time
+
+TICKER = b'{"BTC_ETH":{"last":"0.05","lowestAsk":"0.0501","highestBid":"0.0499"}}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+	"""
+	Answers every POST with a fixed ticker, keeping the connection open like Poloniex does
+	"""
+	protocol_version = 'HTTP/1.1'
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get('Content-Length') or 0))
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(TICKER)))
+		self.end_headers()
+		self.wfile.write(TICKER)
+
+	def log_message(self, *args):
+		pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+def start_stub_server():
+	server = StubServer(('127.0.0.1', 0), StubHandler)
+	Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def timed(call, n_calls):
+	latencies = []
+	for _ in range(n_calls):
+		start = time.perf_counter()
+		call()
+		latencies.append(time.perf_counter() - start)
+	latencies.sort()
+	return sum(latencies), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main(n_calls=500):
+	server = start_stub_server()
+	url = 'http://127.0.0.1:{0}/public'.format(server.server_address[1])
+
+	api = PoloniexAPI()
+	api.publicURL = url
+
+	# what every call did before: module level requests.post, a new connection each time
+	before = timed(lambda: requests.post(url + '?command=returnTicker', timeout=3).json(), n_calls)
+	after = timed(api.marketTicker, n_calls)
+	for label, (total, p50, p99) in (('requests.post (no pooling)', before), ('PoloniexAPI session (pooled)', after)):
+		print('{0:<30} {1} calls: {2:.3f} s total, p50 {3:.3f} ms, p99 {4:.3f} ms'.format(
+			label, n_calls, total, p50 * 1e3, p99 * 1e3))
+
+	api.close()
+	server.shutdown()
+
+
+if __name__ == "__main__":
+	main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,110 @@
+"""
+BookDataLibrary storage benchmark, the old pickled book dicts against the columnar encoding, on a mongomock collection.
+
+Usage:
+	python -m poloniex.bench.library_bench [n_snapshots] [mongodb://host:port to use a real mongod]
+"""
+from poloniex.model import columnar
+from poloniex.model.book_library import BookData
+
+from bson.binary import Binary
+import datetime
+import mongomock
+import numpy as np
+import pickle
+import pymongo
+import sys
+import time
+
+
+def make_snapshots(n_snapshots, depth=50, n_trades=200, seed=0):
+	rng = np.random.RandomState(seed)
+	start = datetime.datetime(2017, 6, 1)
+	snapshots = []
+	for i in range(n_snapshots):
+		bid_rates = 0.05 - np.arange(depth) * 1e-5
+		ask_rates = 0.0501 + np.arange(depth) * 1e-5
+		trades = np.zeros(n_trades, dtype=columnar.TRADE_DTYPE)
+		trades['trade_id'] = np.arange(n_trades) + i
+		trades['timestamp'] = 1496275200.0 + np.arange(n_trades)
+		trades['rate'] = 0.05 + rng.randn(n_trades) * 1e-4
+		trades['amount'] = rng.rand(n_trades) * 10
+		trades['total'] = trades['rate'] * trades['amount']
+		trades['side'] = rng.choice([1, -1], n_trades)
+		snapshots.append(BookData('BTC_ETH', start + datetime.timedelta(seconds=i),
+								  (bid_rates, rng.rand(depth) * 10), (ask_rates, rng.rand(depth) * 10), trades))
+	return snapshots
+
+
+def legacy_books(book_data):
+	"""
+	Returns the (pair, timestamp, bid_book, ask_book, trade_book) dicts the old BookDataLibrary.store was handed,
+	built before timing so the pickle baseline, like the columnar one, only measures encoding and storing
+	"""
+	def book_dict(side):
+		return {'rate_tree': [float(r) for r in side[0]], 'rate_dict': dict(zip(side[0].tolist(), side[1].tolist()))}
+	trades = book_data.trade_book
+	trade_dict = dict((int(t['trade_id']), {'timestamp': float(t['timestamp']), 'rate': float(t['rate']),
+											'amount': float(t['amount']), 'total': float(t['total']),
+											'type': 'buy' if t['side'] > 0 else 'sell'}) for t in trades)
+	return (book_data.pair, book_data.timestamp, book_dict(book_data.bid_book), book_dict(book_data.ask_book),
+			{'trade_deque': list(trade_dict), 'trade_dict': trade_dict})
+
+
+def pickle_doc(books):
+	"""
+	The document the old BookDataLibrary.store built from legacy_books(), kept only as the baseline for this benchmark
+	"""
+	pair, timestamp, bid_book, ask_book, trade_book = books
+	return {'pair': pair, 'timestamp': timestamp, 'bid_book': Binary(pickle.dumps(bid_book)),
+			'ask_book': Binary(pickle.dumps(ask_book)), 'trade_book': Binary(pickle.dumps(trade_book))}
+
+
+def columnar_doc(book_data, compress):
+	doc = columnar.encode(book_data, compress)
+	doc['pair'] = book_data.pair
+	doc['timestamp'] = book_data.timestamp
+	return doc
+
+
+def timed(label, n, function):
+	start = time.perf_counter()
+	result = function()
+	elapsed = time.perf_counter() - start
+	print('{0:<40} {1:>10,.0f} docs/sec'.format(label, n / elapsed))
+	return result
+
+
+def main(n_snapshots=2000, mongo_uri=None):
+	if mongo_uri:
+		db = pymongo.MongoClient(mongo_uri).library_bench
+	else:
+		db = mongomock.MongoClient().library_bench
+	snapshots = make_snapshots(n_snapshots)
+	n = len(snapshots)
+
+	pickled = db.pickled
+	pickled.drop()
+	legacy = [legacy_books(s) for s in snapshots]
+	timed('pickle write', n, lambda: pickled.insert_many([pickle_doc(books) for books in legacy]))
+	timed('pickle read, every book', n, lambda: [
+		[pickle.loads(doc[field]) for field in ('bid_book', 'ask_book', 'trade_book')] for doc in pickled.find()])
+
+	for compress in (False, True):
+		name = 'columnar' + (' zlib' if compress else '')
+		collection = db['columnar_zlib' if compress else 'columnar']
+		collection.drop()
+		timed(name + ' write', n, lambda: collection.insert_many([columnar_doc(s, compress) for s in snapshots]))
+		timed(name + ' read, every book', n, lambda: [
+			columnar.decode(doc) for doc in collection.find({}, columnar.projection(columnar.COLUMNS))])
+		timed(name + ' read, bid_book only', n, lambda: [
+			columnar.decode(doc, ('bid_book',)) for doc in collection.find({}, columnar.projection(('bid_book',)))])
+
+	sizes = dict((name, sum(len(doc[field]) for doc in db[name].find() for field in doc
+							 if isinstance(doc[field], bytes)))
+				 for name in ('pickled', 'columnar', 'columnar_zlib'))
+	print('stored bytes per doc: ' + ', '.join('{0} {1:,.0f}'.format(k, v / n) for k, v in sorted(sizes.items())))
+
+
+if __name__ == "__main__":
+	main(*([int(sys.argv[1])] if sys.argv[1:] else []) + sys.argv[2:3])
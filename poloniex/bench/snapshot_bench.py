@@ -0,0 +1,122 @@
+"""
+Book read contention benchmark, strategy threads reading Wizard.snapshot() against readers sharing a lock with the
+tick writer.
+
+Usage:
+	python -m poloniex.bench.snapshot_bench [readers ...]
+
+One writer thread applies synthetic ticks to a Wizard as fast as it can while the reader threads read the top of both
+books in a tight loop. Every snapshot read is checked for consistency: sequences never go backwards for a reader,
+each side is sorted best level first and both sides are exactly the ones the snapshot's sequence left, compared
+against reference snapshots taken by replaying the same ticks beforehand, so a bid side from one tick paired with an
+ask side from another is caught.
+"""
+from poloniex.bench.book_bench import make_events
+from poloniex.construct.replay import ReplayWizard
+from poloniex.model.wizard_build import Tick
+
+from threading import Lock, Thread
+import sys
+import time
+
+
+def make_ticks(depth, n_ticks, events_per_side=2, seed=0):
+	"""
+	Returns the starting marketOrders() snapshot and <n_ticks> sequenced Ticks of bid and ask modifies and removes
+	"""
+	n_events = n_ticks * events_per_side
+	bids, bid_events = make_events('bid', depth, n_events, seed)
+	asks, ask_events = make_events('ask', depth, n_events, seed + 1)
+	ticks = []
+	for i in range(n_ticks):
+		events = [event for _, event in bid_events[i * events_per_side:(i + 1) * events_per_side]]
+		events += [event for _, event in ask_events[i * events_per_side:(i + 1) * events_per_side]]
+		ticks.append(Tick.from_wamp(events, {u'seq': i + 1}))
+	return {'bids': bids, 'asks': asks, 'seq': 0}, ticks
+
+
+def reference_snapshots(market_orders, ticks, depth):
+	"""
+	Returns a dict of sequence and (bids, asks) key value pairs, the sides of the snapshot every tick leaves
+	"""
+	wizard = ReplayWizard('BTC_ETH', depth, market_orders=market_orders)
+	snapshot = wizard.snapshot()
+	references = {snapshot.sequence: (snapshot.bids, snapshot.asks)}
+	for tick in ticks:
+		wizard.on_tick(tick)
+		snapshot = wizard.snapshot()
+		references[snapshot.sequence] = (snapshot.bids, snapshot.asks)
+	return references
+
+
+def consistent(snapshot, last_sequence, references):
+	if snapshot.sequence < last_sequence:
+		return False
+	bid_rates = [rate for rate, _ in snapshot.bids]
+	ask_rates = [rate for rate, _ in snapshot.asks]
+	if bid_rates != sorted(bid_rates, reverse=True) or ask_rates != sorted(ask_rates):
+		return False
+	# the sequence ties both sides to one tick
+	return references[snapshot.sequence] == (snapshot.bids, snapshot.asks)
+
+
+def run(mode, n_readers, market_orders, ticks, depth, references):
+	"""
+	Returns (writer ticks/sec, reads/sec summed over readers, inconsistent reads)
+	"""
+	wizard = ReplayWizard('BTC_ETH', depth, market_orders=market_orders)
+	lock = Lock()
+	done = []
+	reads = [0] * n_readers
+	errors = [0] * n_readers
+
+	def snapshot_reader(n):
+		last_sequence = 0
+		while not done:
+			snapshot = wizard.snapshot()
+			if not consistent(snapshot, last_sequence, references):
+				errors[n] += 1
+			last_sequence = snapshot.sequence
+			reads[n] += 1
+
+	def locked_reader(n):
+		while not done:
+			with lock:
+				wizard.bid_book.top(10)
+				wizard.ask_book.top(10)
+			reads[n] += 1
+
+	def writer():
+		if mode == 'snapshot':
+			for tick in ticks:
+				wizard.on_tick(tick)
+		else:
+			for tick in ticks:
+				with lock:
+					wizard.on_tick(tick)
+
+	readers = [Thread(target=snapshot_reader if mode == 'snapshot' else locked_reader, args=(n,))
+			   for n in range(n_readers)]
+	for reader in readers:
+		reader.start()
+	start = time.perf_counter()
+	writer()
+	seconds = time.perf_counter() - start
+	done.append(True)
+	for reader in readers:
+		reader.join()
+	return len(ticks) / seconds, sum(reads) / seconds, sum(errors)
+
+
+def main(reader_counts=(0, 1, 2, 4, 8), depth=50, n_ticks=50000):
+	market_orders, ticks = make_ticks(depth, n_ticks)
+	references = reference_snapshots(market_orders, ticks, depth)
+	for n_readers in reader_counts:
+		for mode in ('lock', 'snapshot'):
+			writes, reads, errors = run(mode, n_readers, market_orders, ticks, depth, references)
+			print('{0:>8} readers {1}: writer {2:>9,.0f} ticks/sec, readers {3:>10,.0f} reads/sec, {4} inconsistent'
+				  .format(mode, n_readers, writes, reads, errors))
+
+
+if __name__ == "__main__":
+	main(*([tuple(int(n) for n in sys.argv[1:])] if sys.argv[1:] else []))
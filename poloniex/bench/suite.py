@@ -0,0 +1,233 @@
+"""
+Book building hot path benchmark suite, runs offline on seeded synthetic ticks (see synthetic.py).
+
+Usage:
+	python -m poloniex.bench.suite [--ticks N] [--depth N] [--seed N] [--only NAME ...]
+									[--output results.json] [--compare baseline.json] [--threshold 0.1]
+
+Every benchmark is set up fresh three times: a warm-up run, a timed run recording each operation's latency into a
+LatencyHistogram, and a run under tracemalloc for allocations. Results are printed and, with --output, saved as JSON
+with the commit and interpreter they came from. --compare prints each operation's ops/sec against a saved run and
+exits with status 1 if any dropped by more than --threshold.
+"""
+from poloniex.api.coach import Coach
+from poloniex.bench.synthetic import encode_lines, synthetic_ticks
+from poloniex.construct.replay import ReplayWizard
+from poloniex.model.latency import LatencyHistogram
+from poloniex.model.wizard_build import Tick, BidBook, AskBook, TradeBook
+
+from collections import OrderedDict
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _book_ops(book, side, ticks):
+	ops = []
+	for _, args, _ in ticks:
+		for event in args:
+			if event[u'data'][u'type'] != side or event[u'type'] == u'newTrade':
+				continue
+			if event[u'type'] == u'orderBookRemove':
+				ops.append((side + '_remove', book.remove, (event,)))
+			else:
+				ops.append((side + '_modify', book.modify, (event,)))
+	return ops
+
+
+def setup_tick_parse(data):
+	return [('Tick', Tick, (line,)) for line in data['lines']]
+
+
+def setup_tick_from_wamp(data):
+	return [('Tick.from_wamp', Tick.from_wamp, (args, kwargs)) for _, args, kwargs in data['ticks']]
+
+
+def setup_bid_book(data):
+	return _book_ops(BidBook(data['depth'], data['market_orders']['bids']), 'bid', data['ticks'])
+
+
+def setup_ask_book(data):
+	return _book_ops(AskBook(data['depth'], data['market_orders']['asks']), 'ask', data['ticks'])
+
+
+def setup_trade_book(data):
+	trade_book = TradeBook(data['depth'], [])
+	return [('new_trade', trade_book.new_trade, (event, timestamp))
+			for timestamp, args, _ in data['ticks'] for event in args if event[u'type'] == u'newTrade']
+
+
+def setup_coach_wait(data):
+	# a limit the run never reaches, this times the slot bookkeeping every api call pays, not sleeping
+	n_calls = len(data['ticks'])
+	coach = Coach(timeFrame=1.0, callLimit=n_calls + 1)
+	return [('wait', coach.wait, ())] * n_calls
+
+
+def setup_catch_book(data):
+	wizard = ReplayWizard(data['pair'], data['depth'], market_orders=data['market_orders'])
+	return [('catch_book', wizard.catch_book, (data['pair'], args, kwargs)) for _, args, kwargs in data['ticks']]
+
+
+# benchmark name and function returning its (operation name, function, args) list, with fresh state every call
+BENCHMARKS = OrderedDict([
+	('tick_parse', setup_tick_parse),
+	('tick_from_wamp', setup_tick_from_wamp),
+	('bid_book', setup_bid_book),
+	('ask_book', setup_ask_book),
+	('trade_book', setup_trade_book),
+	('coach_wait', setup_coach_wait),
+	('catch_book', setup_catch_book),
+])
+
+
+def run_ops(ops):
+	"""
+	Calls every operation in order, returns a dict of operation name and (LatencyHistogram, seconds spent in it)
+	"""
+	clock = time.perf_counter
+	timings = {}
+	for name, function, args in ops:
+		timing = timings.get(name)
+		if timing is None:
+			timing = timings[name] = [LatencyHistogram(), 0.0]
+		start = clock()
+		function(*args)
+		elapsed = clock() - start
+		timing[0].record(elapsed * 1e9)
+		timing[1] += elapsed
+	return timings
+
+
+def allocations(setup, data):
+	"""
+	Returns a dict of allocation stats while running a fresh set of <setup>'s operations
+	"""
+	ops = setup(data)
+	tracemalloc.start()
+	try:
+		for name, function, args in ops:
+			function(*args)
+		current, peak = tracemalloc.get_traced_memory()
+		blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+	finally:
+		tracemalloc.stop()
+	n_ops = max(len(ops), 1)
+	return {'peak_kb': peak / 1024.0, 'retained_kb': current / 1024.0, 'retained_bytes_per_op': current / float(n_ops),
+			'retained_blocks_per_op': blocks / float(n_ops)}
+
+
+def run_benchmark(setup, data):
+	run_ops(setup(data))
+	results = OrderedDict()
+	for name, (histogram, seconds) in sorted(run_ops(setup(data)).items()):
+		result = {'ops': histogram.count, 'ops_per_sec': histogram.count / seconds if seconds else 0.0,
+				  'mean_us': histogram.mean() / 1e3, 'max_us': histogram.max / 1e3}
+		for percent in PERCENTILES:
+			result['p{0:g}_us'.format(percent)] = histogram.percentile(percent) / 1e3
+		results[name] = result
+	return {'operations': results, 'allocations': allocations(setup, data)}
+
+
+def clock_overhead_ns(n=100000):
+	clock = time.perf_counter
+	start = clock()
+	for _ in range(n):
+		clock()
+	return (clock() - start) / n * 1e9
+
+
+def commit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+									   stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def run(names=None, n_ticks=50000, depth=50, seed=0, pair='BTC_ETH'):
+	"""
+	Runs the <names> benchmarks, every one by default, and returns the results dict saved by --output
+	"""
+	market_orders, ticks = synthetic_ticks(n_ticks, depth=depth, seed=seed)
+	data = {'pair': pair, 'depth': depth, 'market_orders': market_orders, 'ticks': ticks,
+			'lines': encode_lines(ticks)}
+	results = {'meta': {'commit': commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+						'timestamp': time.time(), 'ticks': n_ticks, 'events': sum(len(args) for _, args, _ in ticks),
+						'depth': depth, 'seed': seed, 'clock_overhead_ns': clock_overhead_ns()},
+			   'benchmarks': OrderedDict()}
+	for name in (names or BENCHMARKS):
+		results['benchmarks'][name] = run_benchmark(BENCHMARKS[name], data)
+	return results
+
+
+def report(results):
+	meta = results['meta']
+	print('BENCH: commit {0}, python {1}, {2} ticks / {3} events, depth {4}, seed {5}, clock {6:.0f}ns'.format(
+		meta['commit'], meta['python'], meta['ticks'], meta['events'], meta['depth'], meta['seed'],
+		meta['clock_overhead_ns']))
+	print('{0:<16}{1:<16}{2:>9}{3:>13}{4:>9}{5:>9}{6:>9}{7:>10}{8:>11}'.format(
+		'benchmark', 'operation', 'ops', 'ops/sec', 'p50 us', 'p99 us', 'p99.9', 'B/op', 'peak KB'))
+	for name, benchmark in results['benchmarks'].items():
+		allocated = benchmark['allocations']
+		for operation, result in benchmark['operations'].items():
+			print('{0:<16}{1:<16}{2:>9}{3:>13,.0f}{4:>9.2f}{5:>9.2f}{6:>9.2f}{7:>10.1f}{8:>11.1f}'.format(
+				name, operation, result['ops'], result['ops_per_sec'], result['p50_us'], result['p99_us'],
+				result['p99.9_us'], allocated['retained_bytes_per_op'], allocated['peak_kb']))
+
+
+def compare(results, baseline, threshold=0.1):
+	"""
+	Prints every operation's ops/sec against <baseline>, returns the number that dropped by more than <threshold>
+	"""
+	print('BENCH: against commit {0}'.format(baseline['meta'].get('commit')))
+	regressions = 0
+	for name, benchmark in results['benchmarks'].items():
+		before = baseline['benchmarks'].get(name, {}).get('operations', {})
+		for operation, result in benchmark['operations'].items():
+			if operation not in before or not before[operation]['ops_per_sec']:
+				continue
+			ratio = result['ops_per_sec'] / before[operation]['ops_per_sec']
+			flag = ''
+			if ratio < 1.0 - threshold:
+				flag = '  REGRESSION'
+				regressions += 1
+			print('{0:<16}{1:<16}{2:>13,.0f} -> {3:>13,.0f} ops/sec ({4:+.1%}){5}'.format(
+				name, operation, before[operation]['ops_per_sec'], result['ops_per_sec'], ratio - 1.0, flag))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Book building hot path benchmarks')
+	parser.add_argument('--ticks', type=int, default=50000)
+	parser.add_argument('--depth', type=int, default=50)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+	parser.add_argument('--output', help='save results as JSON')
+	parser.add_argument('--compare', help='JSON results of an earlier run')
+	parser.add_argument('--threshold', type=float, default=0.1, help='ops/sec drop reported as a regression')
+	args = parser.parse_args(argv)
+
+	results = run(args.only, args.ticks, args.depth, args.seed)
+	report(results)
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(results, f, indent=2)
+		print('BENCH: results saved to {0}'.format(args.output))
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+		if compare(results, baseline, args.threshold):
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
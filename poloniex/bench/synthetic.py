@@ -0,0 +1,129 @@
+"""
+Seeded synthetic tick generator for benchmarks and replays, no network needed.
+
+The book lives on a fixed rate grid around a mid that random walks. Modifies and removes cluster near the top of the
+book as the live stream's do, removes only hit levels that exist, a mid move clears the levels it crosses and a trade
+takes from the best level on its side and updates or removes that level in the same tick.
+
+Usage:
+	python -m poloniex.bench.synthetic recording.jsonl [n_ticks] [seed]
+
+The recording has the JSON line framing of Tick.encode(), so it replays with poloniex.construct.replay.file_ticks().
+"""
+from poloniex.model.wizard_build import Tick
+
+import datetime
+import random
+import sys
+
+
+def _rate(level, tick_size):
+	return '{0:.8f}'.format(level * tick_size)
+
+
+def _amount(rng):
+	return '{0:.8f}'.format(rng.lognormvariate(0.0, 1.2))
+
+
+def synthetic_ticks(n_ticks, depth=50, seed=0, mid=5000, tick_size=1e-5, start=1496275200.0, interval=0.05,
+					events_per_tick=(1, 4), remove_ratio=0.3, trade_ratio=0.08, move_ratio=0.01):
+	"""
+	Returns (market_orders, ticks): the starting marketOrders() snapshot and a list of <n_ticks>
+	(timestamp, args, kwargs) stream ticks, the same for the same arguments.
+
+	Args:
+		n_ticks: Int number of ticks.
+		depth: Int levels per side in the starting snapshot, events reach about twice as deep.
+		seed: Int random seed.
+		mid: Int starting mid, in rate grid steps.
+		tick_size: Float rate of one grid step.
+		start: Float epoch of the first tick.
+		interval: Float mean seconds between ticks.
+		events_per_tick: (min, max) book events per tick, trades come on top.
+		remove_ratio: Float share of book events that remove a level.
+		trade_ratio: Float chance of a tick carrying a trade.
+		move_ratio: Float chance of the mid moving one step before a tick.
+
+	"""
+	rng = random.Random(seed)
+	# dict: side and {grid level: amount string} of the current book
+	book = {'bid': {}, 'ask': {}}
+	for k in range(depth):
+		book['bid'][mid - 1 - k] = _amount(rng)
+		book['ask'][mid + 1 + k] = _amount(rng)
+	market_orders = {
+		'bids': [[_rate(level, tick_size), book['bid'][level]] for level in sorted(book['bid'], reverse=True)],
+		'asks': [[_rate(level, tick_size), book['ask'][level]] for level in sorted(book['ask'])],
+		'seq': 0}
+
+	def modify(side, level, amount):
+		book[side][level] = amount
+		return {u'type': u'orderBookModify', u'data': {u'type': side, u'rate': _rate(level, tick_size),
+														 u'amount': amount}}
+
+	def remove(side, level):
+		book[side].pop(level, None)
+		return {u'type': u'orderBookRemove', u'data': {u'type': side, u'rate': _rate(level, tick_size)}}
+
+	ticks = []
+	timestamp = start
+	trade_id = 1
+	for seq in range(1, n_ticks + 1):
+		timestamp += rng.expovariate(1.0 / interval)
+		events = []
+
+		if rng.random() < move_ratio:
+			mid += rng.choice((-1, 1))
+			for level in [level for level in book['bid'] if level >= mid]:
+				events.append(remove('bid', level))
+			for level in [level for level in book['ask'] if level <= mid]:
+				events.append(remove('ask', level))
+
+		for _ in range(rng.randint(*events_per_tick)):
+			side = rng.choice(('bid', 'ask'))
+			if book[side] and rng.random() < remove_ratio:
+				events.append(remove(side, rng.choice(list(book[side]))))
+			else:
+				distance = 1 + min(int(rng.expovariate(4.0 / depth)), 2 * depth)
+				events.append(modify(side, mid - distance if side == 'bid' else mid + distance, _amount(rng)))
+
+		if rng.random() < trade_ratio:
+			# a taker buy lifts the best ask, a taker sell hits the best bid
+			taker = rng.choice(('buy', 'sell'))
+			side = 'ask' if taker == 'buy' else 'bid'
+			if book[side]:
+				level = min(book[side]) if side == 'ask' else max(book[side])
+				available = float(book[side][level])
+				amount = available * rng.choice((rng.random(), 1.0))
+				rate = _rate(level, tick_size)
+				events.append({u'type': u'newTrade', u'data': {
+					u'tradeID': str(trade_id), u'rate': rate, u'amount': '{0:.8f}'.format(amount),
+					u'total': '{0:.8f}'.format(amount * level * tick_size), u'type': taker,
+					u'date': datetime.datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}})
+				trade_id += 1
+				if available - amount > 1e-8:
+					events.append(modify(side, level, '{0:.8f}'.format(available - amount)))
+				else:
+					events.append(remove(side, level))
+
+		ticks.append((timestamp, events, {u'seq': seq}))
+	return market_orders, ticks
+
+
+def encode_lines(ticks):
+	"""
+	Returns synthetic ticks as JSON lines, see Tick.encode()
+	"""
+	return [Tick.encode(args, kwargs, timestamp) for timestamp, args, kwargs in ticks]
+
+
+def main(path, n_ticks=100000, seed=0):
+	market_orders, ticks = synthetic_ticks(int(n_ticks), seed=int(seed))
+	with open(path, 'w') as f:
+		f.writelines(encode_lines(ticks))
+	print('SYNTHETIC: {0} ticks, {1} events written to {2}'.format(
+		len(ticks), sum(len(args) for _, args, _ in ticks), path))
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:4])
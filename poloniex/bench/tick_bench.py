@@ -0,0 +1,91 @@
+"""
+Tick decoding benchmark, old '*'-joined str() format + ast.literal_eval against the JSON line framing.
+
+Usage:
+	python -m poloniex.bench.tick_bench [recorded_ticks.jsonl]
+
+A recording is made with `python -m poloniex.stream.wizard_streamer BTC_ETH > recorded_ticks.jsonl`.
+Without one, a random recording is generated in memory.
+"""
+from poloniex.model.wizard_build import Tick
+
+import ast
+import json
+import random
+import sys
+import time
+
+
+def legacy_line(line):
+	"""
+	Re-frames a JSON tick line the way wizard_streamer.py used to print it
+	"""
+	tick = json.loads(line)
+	return '*' + str({u'seq': tick[u'seq']}) + ''.join('*' + str(event) for event in tick[u'ev'])
+
+
+def legacy_decode(tick):
+	"""
+	The old Tick.__init__ parsing loop, kept only as the baseline for this benchmark
+	"""
+	bid_arr, ask_arr, trade_arr = [], [], []
+	for i, event_str in enumerate(tick.split('*')):
+		if i == 1:
+			ast.literal_eval(event_str)[u'seq']
+		elif i > 1:
+			event = ast.literal_eval(event_str)
+			if event[u'type'] == "newTrade":
+				trade_arr.append(event)
+			if event[u'data'][u'type'] == "bid":
+				bid_arr.append(event)
+			elif event[u'data'][u'type'] == "ask":
+				ask_arr.append(event)
+	return bid_arr, ask_arr, trade_arr
+
+
+def random_recording(n_ticks=20000, seed=0):
+	rng = random.Random(seed)
+	lines = []
+	for seq in range(n_ticks):
+		events = []
+		for _ in range(rng.randint(1, 4)):
+			rate = '{0:.8f}'.format(0.05 + rng.randint(-200, 200) * 1e-5)
+			if rng.random() < 0.1:
+				events.append({u'type': u'newTrade', u'data': {
+					u'tradeID': str(seq), u'rate': rate, u'amount': '1.5', u'total': '0.075',
+					u'date': u'2017-06-01 00:00:00', u'type': rng.choice([u'buy', u'sell'])}})
+			elif rng.random() < 0.4:
+				events.append({u'type': u'orderBookRemove', u'data': {
+					u'type': rng.choice([u'bid', u'ask']), u'rate': rate}})
+			else:
+				events.append({u'type': u'orderBookModify', u'data': {
+					u'type': rng.choice([u'bid', u'ask']), u'rate': rate, u'amount': '{0:.8f}'.format(rng.random() * 10)}})
+		lines.append(Tick.encode(events, {u'seq': seq}, timestamp=1496275200.0 + seq))
+	return lines
+
+
+def events_per_sec(decode, lines, n_events):
+	start = time.perf_counter()
+	for line in lines:
+		decode(line)
+	return n_events / (time.perf_counter() - start)
+
+
+def main(path=None):
+	if path:
+		with open(path) as f:
+			lines = [line for line in f if line.strip()]
+	else:
+		lines = random_recording()
+	n_events = sum(len(json.loads(line)[u'ev']) for line in lines)
+	old_lines = [legacy_line(line) for line in lines]
+
+	before = events_per_sec(legacy_decode, old_lines, n_events)
+	after = events_per_sec(Tick, lines, n_events)
+	print('ticks: {0}, events: {1}'.format(len(lines), n_events))
+	print('before (str + ast.literal_eval): {0:,.0f} events/sec'.format(before))
+	print('after (JSON lines):              {0:,.0f} events/sec ({1:.1f}x)'.format(after, after / before))
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:2])
@@ -0,0 +1,157 @@
+from poloniex.construct.dispatch import Dispatcher
+
+from collections import namedtuple
+import time
+
+# Poloniex taker fee applied once per leg
+TAKER_FEE_FACTOR = 0.9975
+
+
+# currencies: tuple of currencies visited, starting and ending with the first one
+# legs: tuple of (pair, 'buy' or 'sell', rate) per leg, rate is the best level traded against
+# ratio: amount of the first currency returned per unit spent, after fees
+# size: amount of the first currency that can go around the cycle at the best levels
+# timestamp: epoch time the opportunity was computed
+Opportunity = namedtuple('Opportunity', ['currencies', 'legs', 'ratio', 'size', 'timestamp'])
+
+
+class Leg(object):
+	"""
+	A Leg converts one currency into another by trading against one side of a pair's book.
+	For pair 'BTC_ETH', rates are BTC per ETH, so ETH -> BTC sells into the bids and BTC -> ETH buys from the asks.
+	"""
+
+	__slots__ = ('pair', 'action', 'source', 'target')
+
+	def __init__(self, pair, action, source, target):
+		self.pair = pair
+		self.action = action
+		self.source = source
+		self.target = target
+
+	def quote(self, snapshot):
+		"""
+		Returns (rate, units of target received per unit of source, capacity in units of source) at the best level of
+		a Wizard's BookSnapshot, None if that side of the book is empty
+		"""
+		if self.action == 'sell':
+			level = snapshot.best_bid()
+			if level is None:
+				return None
+			return level[0], level[0], level[1]
+		else:
+			level = snapshot.best_ask()
+			if level is None:
+				return None
+			return level[0], 1.0 / level[0], level[0] * level[1]
+
+
+class TriangularArbitrage(object):
+	"""
+	Event driven triangular arbitrage across a set of pair books.
+	Every 3-currency cycle the pairs allow is found once up front and indexed by the pairs it trades. When a wizard
+	reports a best bid or best ask change, only the cycles using that pair are re-evaluated, on one dispatcher thread
+	shared by every subscription and reading each book's latest BookSnapshot, so the stream thread never waits on it.
+	"""
+
+	def __init__(self, wizards, callback=None, fee=TAKER_FEE_FACTOR, min_ratio=1.0):
+		"""
+		Args:
+			wizards: Dict (or WizardManager) of pair and Wizard key value pairs.
+			callback: Function called with every Opportunity whose ratio exceeds min_ratio.
+			fee: Float fraction of each leg's proceeds kept after fees.
+			min_ratio: Float ratio a cycle has to beat, after fees, to be reported.
+
+		"""
+		self.wizards = wizards
+		self.callback = callback
+		self.fee = fee
+		self.min_ratio = min_ratio
+
+		# list: every cycle, as a tuple of three Legs
+		self.cycles = self._find_cycles([pair for pair in wizards])
+
+		# dict: pair and list of cycle index key value pairs
+		self._cycles_by_pair = {}
+		for i, cycle in enumerate(self.cycles):
+			for leg in cycle:
+				self._cycles_by_pair.setdefault(leg.pair, []).append(i)
+
+		# dict: cycle index and latest Opportunity key value pairs, only holds currently profitable cycles
+		self.opportunities = {}
+
+	@staticmethod
+	def _find_cycles(pairs):
+		legs_from = {}
+		for pair in pairs:
+			base, quote = pair.split('_')
+			legs_from.setdefault(quote, []).append(Leg(pair, 'sell', quote, base))
+			legs_from.setdefault(base, []).append(Leg(pair, 'buy', base, quote))
+
+		cycles = []
+		# each cycle starts from its lowest sorting currency, so it is found once per direction
+		for start in sorted(legs_from):
+			for first in legs_from[start]:
+				if first.target <= start:
+					continue
+				for second in legs_from.get(first.target, ()):
+					if second.target <= start:
+						continue
+					for third in legs_from.get(second.target, ()):
+						if third.target == start:
+							cycles.append((first, second, third))
+		return cycles
+
+	def start(self, threaded=True):
+		"""
+		Subscribes to best bid and best ask changes on every wizard that takes part in a cycle.
+		With threaded False, cycles are evaluated on the thread applying ticks, as a replay needs.
+		"""
+		self.dispatcher = Dispatcher('arbitrage', threaded=threaded)
+		self.subscriptions = []
+		for pair in self._cycles_by_pair:
+			wizard = self.wizards[pair]
+			self.subscriptions.append(wizard.on_best_bid_change(self.on_top_of_book, dispatcher=self.dispatcher))
+			self.subscriptions.append(wizard.on_best_ask_change(self.on_top_of_book, dispatcher=self.dispatcher))
+
+	def stop(self):
+		for subscription in self.subscriptions:
+			subscription.cancel()
+		self.dispatcher.stop()
+
+	def on_top_of_book(self, wizard, snapshot=None):
+		for i in self._cycles_by_pair.get(wizard.pair, ()):
+			self._evaluate(i)
+
+	def evaluate_all(self):
+		for i in range(len(self.cycles)):
+			self._evaluate(i)
+		return list(self.opportunities.values())
+
+	def _evaluate(self, i):
+		cycle = self.cycles[i]
+		fee = self.fee
+		ratio = 1.0
+		size = float('inf')
+		legs = []
+		for leg in cycle:
+			quote = leg.quote(self.wizards[leg.pair].snapshot())
+			if quote is None:
+				self.opportunities.pop(i, None)
+				return None
+			rate, conversion, capacity = quote
+			# capacity is in this leg's source currency, ratio so far converts it back to the start currency
+			size = min(size, capacity / ratio)
+			ratio *= conversion * fee
+			legs.append((leg.pair, leg.action, rate))
+
+		if ratio <= self.min_ratio:
+			self.opportunities.pop(i, None)
+			return None
+
+		currencies = tuple(leg.source for leg in cycle) + (cycle[0].source,)
+		opportunity = Opportunity(currencies, tuple(legs), ratio, size, time.time())
+		self.opportunities[i] = opportunity
+		if self.callback is not None:
+			self.callback(opportunity)
+		return opportunity
@@ -0,0 +1,310 @@
+from poloniex.construct.mm_strat import MarketMaker
+from poloniex.construct.replay import Replay, ReplayWizard, file_ticks, journal_ticks
+
+from collections import defaultdict, namedtuple
+from multiprocessing import Pool
+import calendar
+import itertools
+import os
+
+# returnFeeInfo() answer of the lowest volume tier
+DEFAULT_FEES = {'makerFee': '0.00150000', 'takerFee': '0.00250000', 'thirtyDayVolume': '0.00000000',
+				'nextTier': '600.00000000'}
+
+# amounts below this are treated as fully filled
+DUST = 1e-10
+
+Fill = namedtuple('Fill', ['timestamp', 'order_number', 'side', 'rate', 'amount', 'fee', 'maker'])
+
+
+class _Order(object):
+	"""
+	A resting order, <ahead> is the amount queued before it at its rate
+	"""
+
+	__slots__ = ('number', 'side', 'rate', 'amount', 'ahead', 'timestamp')
+
+	def __init__(self, number, side, rate, amount, ahead, timestamp):
+		self.number = number
+		self.side = side
+		self.rate = rate
+		self.amount = amount
+		self.ahead = ahead
+		self.timestamp = timestamp
+
+
+class SimulatedExchange(object):
+	"""
+	Stands in for PoloniexAPI's trading calls (buy, sell, cancelOrder, moveOrder, myOrders, myBalances,
+	returnFeeInfo) against a Wizard being replayed, answering in the same shapes the exchange does.
+
+	Matching assumptions:
+	An order crossing the book fills at once as taker, walking the replayed levels without depleting them.
+	A resting order joins the back of its level's queue. Replayed trades at its rate eat the queue ahead of it
+	before filling it, trades through its rate fill it first. Either way a trade fills no more than its own amount,
+	best priced then oldest orders first, and the queue ahead never exceeds what the book shows at the rate, so
+	cancels ahead of it move it up.
+	"""
+
+	def __init__(self, wizard, fees=None, balances=None):
+		"""
+		Args:
+			wizard: Wizard being replayed, its pair is the only one traded.
+			fees: Dict as returned by returnFeeInfo(), DEFAULT_FEES if not given.
+			balances: Dict of currency and starting amount, balances may go negative so inventory is unconstrained.
+
+		"""
+		self.wizard = wizard
+		self.pair = wizard.pair
+		self.base, self.quote = self.pair.split('_')
+		self.fees = dict(fees if fees is not None else DEFAULT_FEES)
+		self.maker_fee = float(self.fees['makerFee'])
+		self.taker_fee = float(self.fees['takerFee'])
+
+		self.balances = defaultdict(float, balances or {})
+		self.start_balances = dict(self.balances)
+
+		# dict: order number and _Order key value pairs for resting orders
+		self._orders = {}
+		self._order_numbers = itertools.count(1)
+		self._trade_ids = itertools.count(1)
+		self.fills = []
+		self.timestamp = None
+
+	def _now(self):
+		return self.timestamp if self.timestamp is not None else 0.0
+
+	def on_tick(self, wizard, tick):
+		"""
+		Replay callback, matches resting orders against the tick's trades and the book it left
+		"""
+		self.timestamp = calendar.timegm(tick.timestamp.utctimetuple()) + tick.timestamp.microsecond / 1e6
+		if not self._orders:
+			return
+
+		for trade in tick.trade_arr:
+			data = trade[u'data']
+			# a taker buy lifts resting sells, a taker sell hits resting buys
+			side = 'sell' if data[u'type'] == 'buy' else 'buy'
+			self._match_trade(side, float(data[u'rate']), float(data[u'amount']))
+
+		for order in list(self._orders.values()):
+			book = self.wizard.bid_book if order.side == 'buy' else self.wizard.ask_book
+			level = book.get_amount_at_rate(order.rate) or 0.0
+			if order.ahead > level:
+				order.ahead = level
+
+	def _match_trade(self, side, rate, amount):
+		sign = 1.0 if side == 'buy' else -1.0
+		orders = [order for order in self._orders.values() if order.side == side and sign * (order.rate - rate) >= 0]
+		# best priced first, then oldest
+		orders.sort(key=lambda order: (-sign * order.rate, order.number))
+		for order in orders:
+			if amount <= DUST:
+				break
+			# a trade through the order's rate reached it before the printed level, no queue ahead of it is left
+			if order.rate == rate:
+				eaten = min(amount, order.ahead)
+				order.ahead -= eaten
+				amount -= eaten
+			filled = min(amount, order.amount)
+			amount -= filled
+			if filled > 0:
+				self._fill(order, filled)
+
+	def _fill(self, order, amount):
+		self._settle(order.number, order.side, order.rate, amount, True)
+		order.amount -= amount
+		if order.amount <= DUST:
+			del self._orders[order.number]
+
+	def _settle(self, order_number, side, rate, amount, maker):
+		fee_rate = self.maker_fee if maker else self.taker_fee
+		total = rate * amount
+		# fees come out of the currency received
+		if side == 'buy':
+			self.balances[self.base] -= total
+			self.balances[self.quote] += amount * (1.0 - fee_rate)
+		else:
+			self.balances[self.quote] -= amount
+			self.balances[self.base] += total * (1.0 - fee_rate)
+		fill = Fill(self._now(), order_number, side, rate, amount, total * fee_rate, maker)
+		self.fills.append(fill)
+		return fill
+
+	def _trade_dict(self, fill):
+		return {'amount': '{0:.8f}'.format(fill.amount), 'date': str(fill.timestamp), 'rate': '{0:.8f}'.format(fill.rate),
+				'total': '{0:.8f}'.format(fill.rate * fill.amount), 'tradeID': str(next(self._trade_ids)),
+				'type': fill.side}
+
+	def _place(self, side, pair, rate, amount):
+		if pair != self.pair:
+			return {'error': 'Invalid currency pair.'}
+		rate = float(rate)
+		amount = float(amount)
+		if rate <= 0 or amount <= 0:
+			return {'error': 'Invalid rate or amount.'}
+		number = str(next(self._order_numbers))
+
+		# the part crossing the book fills at once as taker
+		trades = []
+		if side == 'buy':
+			crossed = ((level_rate, level_amount) for level_rate, level_amount in self.wizard.ask_book
+					   if level_rate <= rate)
+		else:
+			crossed = ((level_rate, level_amount) for level_rate, level_amount in self.wizard.bid_book
+					   if level_rate >= rate)
+		for level_rate, level_amount in crossed:
+			filled = min(amount, level_amount)
+			trades.append(self._trade_dict(self._settle(number, side, level_rate, filled, False)))
+			amount -= filled
+			if amount <= DUST:
+				break
+
+		if amount > DUST:
+			book = self.wizard.bid_book if side == 'buy' else self.wizard.ask_book
+			self._orders[number] = _Order(number, side, rate, amount, book.get_amount_at_rate(rate) or 0.0,
+										  self._now())
+		return {'orderNumber': number, 'resultingTrades': trades}
+
+	def buy(self, pair, rate, amount):
+		""" Creates buy order for <pair> at <rate> for <amount> """
+		return self._place('buy', pair, rate, amount)
+
+	def sell(self, pair, rate, amount):
+		""" Creates sell order for <pair> at <rate> for <amount> """
+		return self._place('sell', pair, rate, amount)
+
+	def cancelOrder(self, orderId):
+		""" Cancels order <orderId> """
+		order = self._orders.pop(str(orderId), None)
+		if order is None:
+			return {'error': 'Invalid order number, or you are not the person who placed the order.'}
+		return {'success': 1, 'amount': '{0:.8f}'.format(order.amount),
+				'message': 'Order #{0} canceled.'.format(order.number)}
+
+	def moveOrder(self, orderId, rate, amount=None):
+		""" Moves an order by <orderId> to <rate> for <amount>, it goes to the back of the new level's queue """
+		order = self._orders.pop(str(orderId), None)
+		if order is None:
+			return {'success': 0, 'error': 'Invalid order number, or you are not the person who placed the order.'}
+		ret = self._place(order.side, self.pair, rate, order.amount if amount is None else amount)
+		if 'error' in ret:
+			# the exchange leaves the order where it was when the move is refused
+			self._orders[order.number] = order
+			return {'success': 0, 'error': ret['error']}
+		return {'success': 1, 'orderNumber': ret['orderNumber'], 'resultingTrades': {self.pair: ret['resultingTrades']}}
+
+	def myOrders(self, pair='all'):
+		""" Returns open orders for [pair='all'] """
+		orders = [{'orderNumber': order.number, 'type': order.side, 'rate': '{0:.8f}'.format(order.rate),
+				   'amount': '{0:.8f}'.format(order.amount), 'total': '{0:.8f}'.format(order.rate * order.amount),
+				   'date': str(order.timestamp), 'margin': 0}
+				  for order in sorted(self._orders.values(), key=lambda order: int(order.number))]
+		if pair == 'all':
+			return {self.pair: orders}
+		return orders if pair == self.pair else []
+
+	def myBalances(self):
+		""" Returns coin balances """
+		return dict((currency, '{0:.8f}'.format(amount)) for currency, amount in self.balances.items())
+
+	def returnFeeInfo(self):
+		""" Returns current trading fees and trailing 30-day volume in BTC """
+		return dict(self.fees)
+
+	def report(self):
+		"""
+		Returns a dict of PnL marked to the current mid, inventory and fill statistics
+		"""
+		bid = self.wizard.bid_book.best_level()
+		ask = self.wizard.ask_book.best_level()
+		mid = (bid[0] + ask[0]) / 2.0 if bid is not None and ask is not None else float('nan')
+		base_change = self.balances[self.base] - self.start_balances.get(self.base, 0.0)
+		inventory = self.balances[self.quote] - self.start_balances.get(self.quote, 0.0)
+
+		stats = {'pnl': base_change + inventory * mid, 'mid': mid, 'inventory': inventory, 'base_change': base_change,
+				 'fills': len(self.fills), 'maker_fills': 0, 'taker_fills': 0, 'fees': 0.0, 'open_orders': len(self._orders)}
+		for side in ('buy', 'sell'):
+			fills = [fill for fill in self.fills if fill.side == side]
+			volume = sum(fill.amount for fill in fills)
+			stats[side + '_volume'] = volume
+			stats[side + '_vwap'] = sum(fill.rate * fill.amount for fill in fills) / volume if volume else float('nan')
+		for fill in self.fills:
+			stats['maker_fills' if fill.maker else 'taker_fills'] += 1
+			stats['fees'] += fill.fee
+		return stats
+
+
+class Backtest(object):
+	"""
+	Runs a MarketMaker over recorded ticks: a ReplayWizard rebuilds the books, a SimulatedExchange takes the
+	strategy's orders in place of PoloniexAPI and the strategy requotes after every <quote_every> ticks.
+	"""
+
+	def __init__(self, pair, ticks, depth=50, size=1.0, offset=0.0, quote_every=1, market_orders=None, fees=None,
+				 balances=None):
+		"""
+		Args:
+			pair: String currency pair, for ex. 'BTC_ETH'.
+			ticks: Iterable of Ticks, for ex. file_ticks() or journal_ticks().
+			depth: Int maximum number of levels held by each book.
+			size: Float amount quoted on each side.
+			offset: Float distance of the quotes behind the best bid and ask.
+			quote_every: Int number of ticks between requotes.
+			market_orders: Dict marketOrders() snapshot the recording starts from, empty books if not given.
+			fees: Dict as returned by returnFeeInfo(), DEFAULT_FEES if not given.
+			balances: Dict of currency and starting amount.
+
+		"""
+		self.size = size
+		self.offset = offset
+		self.quote_every = quote_every
+		self.wizard = ReplayWizard(pair, depth, market_orders=market_orders)
+		self.exchange = SimulatedExchange(self.wizard, fees=fees, balances=balances)
+		self.strategy = MarketMaker(self.wizard, api=self.exchange)
+		self.replay = Replay(self.wizard, ticks)
+		self.replay.add_callback(self.exchange.on_tick)
+		self.replay.add_callback(self._requote)
+
+	def _requote(self, wizard, tick):
+		if self.replay.tick_count % self.quote_every == 0:
+			self.strategy.quote(self.size, self.offset)
+
+	def run(self, limit=None):
+		"""
+		Replays up to <limit> ticks and returns the exchange report merged with the replay stats
+		"""
+		stats = self.replay.run(limit)
+		report = self.exchange.report()
+		report.update(('replay_' + key, value) for key, value in stats.items())
+		return report
+
+
+def source_ticks(source, start_time=None, end_time=None):
+	"""
+	Returns the Ticks of <source>, a tick journal directory or a JSON lines recording
+	"""
+	if os.path.isdir(source):
+		return journal_ticks(source, start_time, end_time)
+	return file_ticks(source)
+
+
+def _run_job(job):
+	pair, source, params = job
+	return params, Backtest(pair, source_ticks(source), **params).run()
+
+
+def sweep(pair, source, param_sets, processes=None):
+	"""
+	Runs one Backtest per dict of Backtest keyword arguments in <param_sets>, spread over a process pool.
+	Every process replays <source> (see source_ticks) itself, so only the parameters and reports cross processes.
+	Returns a list of (params, report) pairs in the order of <param_sets>.
+	"""
+	jobs = [(pair, source, dict(params)) for params in param_sets]
+	pool = Pool(processes)
+	try:
+		return pool.map(_run_job, jobs, chunksize=1)
+	finally:
+		pool.close()
+		pool.join()
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from threading import Condition, Thread
+import itertools
+
+
+class Dispatcher(object):
+	"""
+	Runs subscriber callbacks off the stream thread, so a slow subscriber never stalls the books.
+	Posting only queues the call. A coalescing post replaces any call of the same key still waiting, so a subscriber
+	that falls behind gets the latest state instead of a backlog. Other posts queue in order, up to <max_queue>
+	waiting calls, after which they are dropped and counted.
+	One dispatcher thread can be shared by several subscriptions, they are then called one at a time.
+	"""
+
+	def __init__(self, name='dispatcher', threaded=True, max_queue=10000):
+		"""
+		Args:
+			name: String name of the dispatcher thread.
+			threaded: Bool, False calls every callback at once on the posting thread, for replays and backtests.
+			max_queue: Int maximum calls waiting.
+
+		"""
+		self.name = name
+		self.threaded = threaded
+		self.max_queue = max_queue
+
+		# OrderedDict: key and (callback, args) key value pairs waiting to be called, oldest first
+		self._pending = OrderedDict()
+		self._condition = Condition()
+		self._unique = itertools.count()
+		self._stopped = False
+
+		# counters for monitoring subscribers
+		self.posted = 0
+		self.delivered = 0
+		self.coalesced = 0
+		self.dropped = 0
+		self.errors = 0
+
+		self._dispatchT = None
+		if threaded:
+			self._dispatchT = Thread(target=self._run, name=name)
+			self._dispatchT.daemon = True
+			self._dispatchT.start()
+
+	def post(self, key, callback, args, coalesce=True):
+		"""
+		Queues callback(*args), replacing a waiting call posted under the same <key> if <coalesce>
+		"""
+		if not self.threaded:
+			with self._condition:
+				self.posted += 1
+			self._deliver(callback, args)
+			return
+		with self._condition:
+			self.posted += 1
+			if coalesce and key in self._pending:
+				# the waiting call keeps its place in line, with the newer arguments
+				self._pending[key] = (callback, args)
+				self.coalesced += 1
+				return
+			if len(self._pending) >= self.max_queue:
+				self.dropped += 1
+				return
+			self._pending[key if coalesce else (key, next(self._unique))] = (callback, args)
+			self._condition.notify()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while not self._pending and not self._stopped:
+					self._condition.wait()
+				if not self._pending:
+					return
+				callback, args = self._pending.popitem(last=False)[1]
+			self._deliver(callback, args)
+
+	def _deliver(self, callback, args):
+		try:
+			callback(*args)
+		except Exception as e:
+			with self._condition:
+				self.errors += 1
+			print('DISPATCH: {0} subscriber raised: {1}'.format(self.name, e))
+			return
+		with self._condition:
+			self.delivered += 1
+
+	def pending(self):
+		return len(self._pending)
+
+	def stats(self):
+		with self._condition:
+			return {'posted': self.posted, 'delivered': self.delivered, 'coalesced': self.coalesced,
+					'dropped': self.dropped, 'errors': self.errors, 'pending': len(self._pending)}
+
+	def stop(self, timeout=None):
+		"""
+		Delivers the calls still waiting, then stops the dispatcher thread
+		"""
+		with self._condition:
+			self._stopped = True
+			self._condition.notify()
+		if self._dispatchT is not None:
+			self._dispatchT.join(timeout)
+
+
+class Subscription(object):
+	"""
+	One callback subscribed to a Wizard event, returned by Wizard.on_best_bid_change() and friends.
+	"""
+
+	def __init__(self, wizard, event, callback, where=None, dispatcher=None, coalesce=True):
+		"""
+		Args:
+			wizard: Wizard subscribed to.
+			event: String event name, 'best_bid', 'best_ask', 'trade' or 'tick'.
+			callback: Function called with (wizard, value).
+			where: Function of value, called on the stream thread, only values it returns True for are delivered.
+			dispatcher: Dispatcher calling <callback>, a new one with its own thread if not given.
+			coalesce: Bool, only the latest value is delivered to a subscriber that falls behind.
+
+		"""
+		self.wizard = wizard
+		self.event = event
+		self.callback = callback
+		self.where = where
+		self.coalesce = coalesce
+		self._owns_dispatcher = dispatcher is None
+		self.dispatcher = dispatcher if dispatcher is not None else \
+			Dispatcher('{0}-{1}'.format(wizard.pair, event))
+
+	def publish(self, value):
+		if self.where is None or self.where(value):
+			self.dispatcher.post(self, self.callback, (self.wizard, value), self.coalesce)
+
+	def cancel(self):
+		"""
+		Stops delivery, the dispatcher is stopped too if the subscription made it
+		"""
+		self.wizard.unsubscribe(self)
+		if self._owns_dispatcher:
+			self.dispatcher.stop()
@@ -0,0 +1,106 @@
+from poloniex.api.api import PoloniexAPI
+from poloniex.save.journal import JournalWriter
+from poloniex.stream.wamp_client import StreamClient
+
+from poloniex.construct.wizard import Wizard
+
+from multiprocessing.dummy import Pool
+from multiprocessing.dummy import Process as Thread
+import asyncio
+import os
+
+
+class WizardManager(object):
+	"""
+	Builds and runs a Wizard for every requested pair over a single stream connection and event loop thread.
+	Order book snapshots for all pairs come from one marketOrders('all') call, trade histories are fetched
+	concurrently through a shared, coached PoloniexAPI, so startup stays close to one round trip per rate limit slot.
+	"""
+
+	def __init__(self, pairs, depth, api=None, workers=6, gap_tolerance=5, raw_writer=None, journal_dir=None,
+				 checkpoint_writer=None, latency=None):
+		"""
+		Args:
+			pairs: List of currency pair strings, for ex. ['BTC_ETH', 'BTC_ETC'].
+			depth: Int maximum number of levels held by each book.
+			api: PoloniexAPI shared by every wizard, a coached one is made if not given.
+			workers: Int number of trade history requests kept in flight while bootstrapping.
+			gap_tolerance: Int passed through to every Wizard.
+			raw_writer: RawTickWriter capturing every pair's raw ticks, optional.
+			journal_dir: String directory under which every pair's ticks are journaled to disk, optional.
+			checkpoint_writer: CheckpointWriter recording every pair's book checkpoints and deltas, optional.
+			latency: LatencyRecorder shared by every Wizard, None leaves latency timing off.
+
+		"""
+		self.pairs = list(pairs)
+		self.depth = depth
+		self.api = api if api is not None else PoloniexAPI(coach=True)
+		self._stream = StreamClient()
+		self._loop = None
+		self.latency = latency
+
+		print('MANAGER: Fetching snapshots for {0} pairs'.format(len(self.pairs)))
+		market_orders = self.api.marketOrders('all', depth)
+		pool = Pool(max(1, min(workers, len(self.pairs))))
+		try:
+			trade_histories = pool.map(self.api.marketTradeHist, self.pairs)
+		finally:
+			pool.close()
+			pool.join()
+
+		# dict: pair and Wizard key value pairs, every wizard is subscribed on the shared stream client
+		self.wizards = {}
+		for pair, market_trade_history in zip(self.pairs, trade_histories):
+			self.wizards[pair] = Wizard(pair, depth, gap_tolerance=gap_tolerance, api=self.api,
+										market_orders=market_orders[pair],
+										market_trade_history=market_trade_history,
+										stream=self._stream, latency=latency)
+			if raw_writer is not None:
+				self._stream.subscribe(pair, raw_writer.on_event)
+			if checkpoint_writer is not None:
+				checkpoint_writer.subscribe(self.wizards[pair])
+
+		# dict: pair and JournalWriter key value pairs
+		self.journals = {}
+		if journal_dir is not None:
+			for pair in self.pairs:
+				self.journals[pair] = JournalWriter(os.path.join(journal_dir, pair))
+				self._stream.subscribe(pair, self.journals[pair].on_event)
+
+	def __getitem__(self, pair):
+		return self.wizards[pair]
+
+	def __iter__(self):
+		return iter(self.pairs)
+
+	def __len__(self):
+		return len(self.pairs)
+
+	def start(self):
+		"""
+		Starts the thread running the shared stream client's event loop
+		"""
+		self._loop = asyncio.new_event_loop()
+		for wizard in self.wizards.values():
+			wizard._loop = self._loop
+		self._streamT = Thread(target=self._run_stream)
+		self._streamT.daemon = True
+		self._streamT.start()
+		print('MANAGER: stream thread started for {0} pairs'.format(len(self.pairs)))
+
+	def stop(self):
+		"""
+		Stops the shared stream client and joins its thread
+		"""
+		self._loop.call_soon_threadsafe(self._stream.stop)
+		self._streamT.join()
+		for journal in self.journals.values():
+			journal.close()
+		print('MANAGER: stream thread joined')
+
+	def _run_stream(self):
+		asyncio.set_event_loop(self._loop)
+		try:
+			self._loop.run_until_complete(self._stream.run())
+		finally:
+			self._loop.close()
@@ -1,32 +1,100 @@
 from poloniex.settings import POLONIEX_DIR
 from poloniex.api.api import PoloniexAPI
 from poloniex.model.wizard_build import Tick, BidBook, AskBook, TradeBook
+from poloniex.model.book_analytics import snapshot_arrays, analyze
+
+from poloniex.construct.dispatch import Dispatcher
 
-from wizard import Wizard
 import time
 
 class MarketMaker(object):
 
-	def __init__(self, wizard):
+	def __init__(self, wizard, api=None):
+		"""
+		Args:
+			wizard: Wizard whose books are quoted around.
+			api: Object taking the orders, PoloniexAPI with keys live or SimulatedExchange in a backtest,
+				the wizard's api if not given.
+
+		"""
 		print("initializing market maker...")
 		self.wizard = wizard
+		self.api = api if api is not None else wizard.api
+
+		# dict: side ('bid' or 'ask') and (order number, rate) of the quote resting on it
+		self.orders = {}
 
 	def start(self):
 		print("starting market maker...")
+		# the spread is recalculated on one dispatcher thread whenever the top of the book changes
+		self.dispatcher = Dispatcher('market-maker')
+		self.wizard.on_best_bid_change(self.on_top_of_book, dispatcher=self.dispatcher)
+		self.wizard.on_best_ask_change(self.on_top_of_book, dispatcher=self.dispatcher)
 		self.wizard.start_book()
-		#while True:
-			#self.calculate_spread()
-			#time.sleep(.5)
+
+	def on_top_of_book(self, wizard, snapshot):
+		self.calculate_spread()
 
 	def calculate_spread(self):
-		max_bid_level = self.get_bids().max_rate_level()
-		max_ask_level = self.get_asks().max_rate_level()
-		print("max bid level is " + str(max_bid_level))
-		spread = max_ask_level[0] - max_bid_level[0]
-		print("Spread is " + str(spread))
+		"""
+		Returns the best ask rate minus the best bid rate, None while either side of the book is empty
+		"""
+		# one consistent view of both sides, the stream thread keeps applying ticks meanwhile
+		return self.wizard.snapshot().spread()
+
+	def book_metrics(self, depths=(1, 5, 10), sizes=(1.0, 10.0)):
+		"""
+		Returns microprice, depth-weighted mid, imbalance and VWAP-to-size for the latest BookSnapshot (see book_analytics),
+		depths past the wizard's snapshot_depth see an empty book
+		"""
+		book = snapshot_arrays(self.wizard.snapshot(), max(depths))
+		return analyze(book, depths, sizes)
+
+	def quote(self, size, offset=0.0):
+		"""
+		Keeps a bid and an ask of <size> resting <offset> behind the best bid and ask, moving them as the book moves
+		and replacing them once filled
+		"""
+		snapshot = self.wizard.snapshot()
+		best_bid = snapshot.best_bid()
+		best_ask = snapshot.best_ask()
+		if best_bid is None or best_ask is None:
+			return
+
+		if self.orders:
+			open_orders = set(order['orderNumber'] for order in self.api.myOrders(self.wizard.pair))
+			for side, (order_number, rate) in list(self.orders.items()):
+				if order_number not in open_orders:
+					del self.orders[side]
+
+		self._quote_side('bid', round(best_bid[0] - offset, 8), size)
+		self._quote_side('ask', round(best_ask[0] + offset, 8), size)
+
+	def _quote_side(self, side, rate, size):
+		order = self.orders.get(side)
+		if order is not None:
+			if order[1] == rate:
+				return
+			ret = self.api.moveOrder(order[0], rate, size)
+			if 'error' not in ret:
+				self.orders[side] = (ret['orderNumber'], rate)
+				return
+			del self.orders[side]
+
+		place = self.api.buy if side == 'bid' else self.api.sell
+		ret = place(self.wizard.pair, rate, size)
+		if 'error' in ret:
+			print("{0} quote at {1} rejected: {2}".format(side, rate, ret['error']))
+			return
+		self.orders[side] = (ret['orderNumber'], rate)
+
+	def cancel_quotes(self):
+		for order_number, rate in self.orders.values():
+			self.api.cancelOrder(order_number)
+		self.orders.clear()
 
 	def get_bids(self):
 		return self.wizard.bid_book
 
 	def get_asks(self):
-		return self.wizard.ask_book
\ No newline at end of file
+		return self.wizard.ask_book
@@ -0,0 +1,197 @@
+from poloniex.model.wizard_build import Tick
+from poloniex.save.journal import JournalReader
+
+from poloniex.construct.dispatch import Dispatcher
+from poloniex.construct.wizard import Wizard
+
+import datetime
+import time
+
+# empty marketOrders() snapshot, books are then built from the replayed ticks alone
+EMPTY_BOOK = {'bids': [], 'asks': [], 'seq': None}
+
+
+def file_ticks(path):
+	"""
+	Yields the Ticks of a JSON lines recording, as printed by wizard_streamer.py or Tick.encode()
+	"""
+	with open(path, 'rb') as f:
+		for line in f:
+			if line.strip():
+				yield Tick(line)
+
+
+def journal_ticks(directory, start_time=None, end_time=None):
+	"""
+	Yields the Ticks of a tick journal (see poloniex.save.journal) between epoch seconds <start_time> and <end_time>
+	"""
+	reader = JournalReader(directory)
+	records = reader.read(start_time=start_time, end_time=end_time)
+	try:
+		for record in records:
+			tick = record.tick()
+			# drop the view into the map before yielding, so the maps can be closed if iteration stops here
+			del record
+			yield tick
+	finally:
+		records.close()
+		reader.close()
+
+
+def library_ticks(raw_library, pair, start=None, end=None):
+	"""
+	Yields the Ticks of <pair> stored in a RawDataLibrary between epoch seconds <start> and <end>, in receipt order
+	"""
+	query = {'pair': pair, 'data_type': 'tick'}
+	if start is not None or end is not None:
+		query['timestamp'] = {}
+		if start is not None:
+			query['timestamp']['$gte'] = start
+		if end is not None:
+			query['timestamp']['$lt'] = end
+	for raw_data in raw_library.query(query, sort=[('timestamp', 1)]):
+		tick = Tick.from_wamp(raw_data.data, {u'seq': raw_data.sequence})
+		if raw_data.timestamp is not None:
+			tick.timestamp = datetime.datetime.utcfromtimestamp(raw_data.timestamp)
+		yield tick
+
+
+class ReplayWizard(Wizard):
+	"""
+	Wizard built offline from a recorded snapshot, or from nothing, for replaying recorded ticks.
+	There is no exchange to resync from, so a sequence gap that doesn't fill is skipped: the held ticks are applied
+	in sequence order and counted in resyncs.
+	"""
+
+	def __init__(self, pair, depth, market_orders=None, market_trade_history=None, gap_tolerance=5, latency=None):
+		"""
+		Args:
+			pair: String currency pair, for ex. 'BTC_ETH'.
+			depth: Int maximum number of levels held by each book.
+			market_orders: Dict marketOrders() snapshot the recording starts from, empty books if not given.
+			market_trade_history: List marketTradeHist() result the recording starts from, optional.
+			gap_tolerance: Int number of out-of-order ticks held waiting for a missing sequence before skipping it.
+			latency: LatencyRecorder timing the apply stages of every replayed tick, optional.
+
+		"""
+		Wizard.__init__(self, pair, depth, gap_tolerance=gap_tolerance,
+						market_orders=market_orders if market_orders is not None else EMPTY_BOOK,
+						market_trade_history=market_trade_history if market_trade_history is not None else [],
+						latency=latency)
+
+	def start_book(self, pair=None, depth=None):
+		raise RuntimeError('a ReplayWizard is driven by Replay, it has no stream to start')
+
+	def resync(self):
+		ahead = sorted(self._ahead.items())
+		self._ahead.clear()
+		self.resyncs += 1
+		print('BOOK: {0} skipping sequence gap after {1} offline'.format(self.pair, self.sequence))
+		for sequence, tick in ahead:
+			self.apply_tick(tick)
+			self.sequence = sequence
+
+
+class Replay(object):
+	"""
+	Drives a Wizard's books from recorded ticks through the same on_tick() path the stream uses, on the calling
+	thread with no subprocess. Ticks are applied as fast as possible unless a speed is given.
+	Callbacks only see ticks the wizard applied, never ones it dropped as stale or is holding for a missing sequence.
+	"""
+
+	def __init__(self, wizard, ticks, speed=None):
+		"""
+		Args:
+			wizard: Wizard (usually a ReplayWizard) whose books the ticks are applied to.
+			ticks: Iterable of Ticks, for ex. file_ticks(), journal_ticks() or library_ticks().
+			speed: Float multiple of the recorded pace, 1.0 is wall clock pace, None replays as fast as possible.
+
+		"""
+		self.wizard = wizard
+		self.ticks = ticks
+		self.speed = speed
+
+		# list: callbacks called with (wizard, tick) after each tick is applied
+		self._callbacks = []
+		self._stopped = False
+
+		# list: ticks the wizard applied while handling the current input tick, filled by its tick subscription
+		self._applied = []
+		self._dispatcher = Dispatcher('replay', threaded=False)
+
+		# counters filled in by run()
+		self.tick_count = 0
+		self.event_count = 0
+		self.seconds = 0.0
+
+	def add_callback(self, callback):
+		"""
+		Registers callback(wizard, tick), called for every tick applied to the books, right after it with the books as
+		that tick left them. A tick that fills a sequence gap releases the ticks held behind it, those are all applied
+		first and then passed to callbacks in sequence order, with the books as the last of them left them.
+		"""
+		self._callbacks.append(callback)
+
+	def stop(self):
+		"""
+		Makes run() return after the tick being applied, callable from a callback
+		"""
+		self._stopped = True
+
+	def run(self, limit=None):
+		"""
+		Replays up to <limit> ticks, every tick by default, and returns stats()
+		"""
+		wizard = self.wizard
+		callbacks = self._callbacks
+		speed = self.speed
+		first_tick = None
+		self._stopped = False
+
+		subscription = wizard.on_tick_applied(self._on_applied, dispatcher=self._dispatcher, coalesce=False)
+		start = time.time()
+		try:
+			for tick in self.ticks:
+				if speed is not None:
+					if first_tick is None:
+						first_tick, first_wall = tick.timestamp, time.time()
+					delay = first_wall + (tick.timestamp - first_tick).total_seconds() / speed - time.time()
+					if delay > 0:
+						time.sleep(delay)
+
+				wizard.on_tick(tick)
+				self.tick_count += 1
+				self.event_count += len(tick.bid_arr) + len(tick.ask_arr) + len(tick.trade_arr)
+				if self._applied:
+					applied = self._applied
+					self._applied = []
+					for applied_tick in applied:
+						for callback in callbacks:
+							callback(wizard, applied_tick)
+
+				if self._stopped or (limit is not None and self.tick_count >= limit):
+					break
+		finally:
+			subscription.cancel()
+			self._applied = []
+		self.seconds += time.time() - start
+
+		stats = self.stats()
+		print('REPLAY: {0} ticks replayed into {1} at {2:.0f} ticks/sec'.format(
+			stats['ticks'], wizard.pair, stats['ticks_per_sec']))
+		return stats
+
+	def _on_applied(self, wizard, tick):
+		# None is a resync reloading the books, not a tick
+		if tick is not None:
+			self._applied.append(tick)
+
+	def stats(self):
+		"""
+		Returns a dict of replay throughput and the wizard's stream health counters
+		"""
+		seconds = self.seconds or float('nan')
+		return {'ticks': self.tick_count, 'events': self.event_count, 'seconds': self.seconds,
+				'ticks_per_sec': self.tick_count / seconds, 'events_per_sec': self.event_count / seconds,
+				'sequence': self.wizard.sequence, 'stale_ticks': self.wizard.stale_ticks, 'gaps': self.wizard.gaps,
+				'resyncs': self.wizard.resyncs}
@@ -1,9 +1,5 @@
-from wizard import Wizard
+from poloniex.construct.manager import WizardManager
 
-btc_wizard = Wizard('BTC_ETH', 10)
-btc_etc = Wizard('BTC_ETC', 10)
-eth_etc = Wizard('ETH_ETC', 10)
+wizards = WizardManager(['BTC_ETH', 'BTC_ETC', 'ETH_ETC'], 10)
 
-btc_wizard.start_book('BTC_ETH', 10)
-
- 
\ No newline at end of file
+wizards.start()
@@ -1,109 +1,387 @@
 
-from poloniex.settings import POLONIEX_DIR
 from poloniex.api.api import PoloniexAPI
-from poloniex.model.wizard_build import Tick, BidBook, AskBook, TradeBook
+from poloniex.model.wizard_build import Tick, BidBook, AskBook, TradeBook, BookSnapshot
+from poloniex.stream.wamp_client import StreamClient
+
+from poloniex.construct.dispatch import Subscription
 
 from multiprocessing.dummy import Process as Thread
-from subprocess import Popen, PIPE
+import asyncio
+import datetime
 import time
 
 
 class Wizard(object):
 	"""
-	BookBuilder object used for controlling the order data thread and subprocess
-	Holds poloniex ticker dict under self.markets
+	BookBuilder object used for controlling the order data thread and its in-process stream client
+	Holds the pair's bid, ask and trade books, updated in place as ticks arrive
+	Ticks are applied strictly in sequence order. A gap buffers incoming ticks while a fresh marketOrders() snapshot
+	is fetched, then only the buffered ticks newer than the snapshot are replayed.
 	"""
 
-	def __init__(self, pair, depth):
+	def __init__(self, pair, depth, gap_tolerance=5, api=None, market_orders=None, market_trade_history=None,
+				 stream=None, snapshot_depth=10, latency=None, trade_capacity=5000):
+		"""
+		Args:
+			pair: String currency pair, for ex. 'BTC_ETH'.
+			depth: Int maximum number of levels held by each book.
+			gap_tolerance: Int number of out-of-order ticks held waiting for a missing sequence before resyncing.
+			api: PoloniexAPI used for snapshots, a new one is made if not given.
+			market_orders: Dict marketOrders() snapshot for the pair, fetched if not given.
+			market_trade_history: List marketTradeHist() result for the pair, fetched if not given.
+			stream: StreamClient shared with other wizards (see WizardManager), the wizard then doesn't own a thread.
+			snapshot_depth: Int levels per side held by the BookSnapshot published after every tick, None for all.
+			latency: LatencyRecorder timing every tick's receipt, decode and apply stages, None leaves timing off.
+			trade_capacity: Int number of trades the trade book holds, enough to cover its longest rolling window.
+
+		"""
 		self.pair = pair
+		self.depth = depth
+		self.api = api if api is not None else PoloniexAPI()
 		print('BOOK: Starting book for pair: {0}'.format(self.pair))
-		market_orders = PoloniexAPI().marketOrders(self.pair, depth)
+		if market_orders is None:
+			market_orders = self.api.marketOrders(self.pair, depth)
 		self.bid_book = BidBook(depth, market_orders['bids'])
 		print('BOOK: bid_book populated with public API marketOrders() call')
 		self.ask_book = AskBook(depth, market_orders['asks'])
 		print('BOOK: ask_book populated with public API marketOrders() call')
-		market_trade_history = PoloniexAPI().marketTradeHist(self.pair)
-		self.trade_book = TradeBook(depth, market_trade_history)
+		if market_trade_history is None:
+			market_trade_history = self.api.marketTradeHist(self.pair)
+		self.trade_book = TradeBook(trade_capacity, market_trade_history)
 		print('BOOK: trade_book populated with public API marketTradeHist() call')
-		self._tickerP = Popen(["python", POLONIEX_DIR['stream'] + 'wizard_streamer.py', self.pair], stdout=PIPE, bufsize=1)
-		print('BOOK: polo_streamer.py subprocess started')
 
-	def start_book(self, pair, depth):
+		# int: sequence of the last tick applied to the books, None until a snapshot or tick carries one
+		self.sequence = market_orders.get('seq')
+		self.gap_tolerance = gap_tolerance
+
+		# dict: sequence and tick key value pairs for ticks that arrived ahead of a missing sequence
+		self._ahead = {}
+
+		# list: ticks received while a resync snapshot is in flight, None when not resyncing
+		self._resync_buffer = None
+
+		# float: seconds before a failed resync snapshot is fetched again
+		self.resync_retry_delay = 1.0
+		# float: time.time() after which a failed snapshot is retried, only used without a running event loop
+		self._retry_at = None
+
+		# counters for monitoring stream health
+		self.stale_ticks = 0
+		self.gaps = 0
+		self.resyncs = 0
+
+		# dict: event and list of Subscription key value pairs, see on_best_bid_change() and friends
+		self._subscriptions = {'best_bid': [], 'best_ask': [], 'trade': [], 'tick': []}
+
+		# BookSnapshot: both books as of the last applied tick, replaced whole and never mutated
+		self.snapshot_depth = snapshot_depth
+		self._snapshot = None
+		self._publish(self.sequence, None, True, True)
+
+		self._stream = stream if stream is not None else StreamClient()
+		self._loop = None
+		# Thread: running the stream client's event loop, only set once start_book() runs a stream the wizard owns
+		self._tickerT = None
+
+		self.latency = latency
+		if latency is not None:
+			self._stream.track_receipt = True
+			# dict: stage and LatencyHistogram key value pairs, looked up once so recording is a plain method call
+			self._timings = dict((stage, latency.histogram(self.pair, stage)) for stage in latency.stages)
+
+		# last, a shared stream may deliver a tick on its own thread as soon as the handler is registered
+		self._stream.subscribe(self.pair, self.catch_book)
+
+	def start_book(self, pair=None, depth=None):
 		"""
-		Starts the ticker subprocess
+		Starts the thread running the stream client's event loop
 		"""
-		self._tickerT = Thread(target=self.catch_book)
+		self._loop = asyncio.new_event_loop()
+		self._tickerT = Thread(target=self._run_stream)
 		self._tickerT.daemon = True
 		self._tickerT.start()
 		print('BOOK: catch_book thread started')
 
 	def stop_book(self):
 		"""
-		Stops the ticker subprocess
+		Stops the stream client and joins its thread
 		"""
-		self._tickerP.terminate()
-		self._tickerP.kill()
-		print('BOOK: polo_streamer.py subprocess stopped')
+		if self._tickerT is None:
+			raise RuntimeError('{0} has no stream thread of its own, stop the WizardManager running it or call '
+							   'start_book() first'.format(self.pair))
+		self._loop.call_soon_threadsafe(self._stream.stop)
+		print('BOOK: stream client stopped')
 		self._tickerT.join()
 		print('BOOK: catch_book thread joined')
 
-	def catch_book(self):
-		with self._tickerP.stdout:
-			for tick_str in iter(self._tickerP.stdout.readline, b''):
-				try:
-					tick = Tick(tick_str)
-					# print tick
-					for bid in tick.bid_arr:
-						if bid[u'type'] == 'orderBookRemove':
-							self.bid_book.remove(bid)
-						else:
-							self.bid_book.modify(bid)
-
-					for ask in tick.ask_arr:
-						if ask[u'type'] == 'orderBookRemove':
-							self.ask_book.remove(ask)
-						else:
-							self.bid_book.remove(ask)
-
-					for trade in tick.trade_arr:
+	def _run_stream(self):
+		asyncio.set_event_loop(self._loop)
+		try:
+			self._loop.run_until_complete(self._stream.run())
+		finally:
+			self._loop.close()
+
+	def catch_book(self, topic, args, kwargs):
+		"""
+		Stream handler, receives every decoded event published for the pair and applies it to the books
+		"""
+		try:
+			if self.latency is None:
+				self.on_tick(Tick.from_wamp(args, kwargs))
+				return
+			started = time.perf_counter()
+			tick = Tick.from_wamp(args, kwargs)
+			decoded = time.perf_counter()
+			# carried on the tick, so a tick held for a missing sequence is timed until it is finally applied
+			tick.received = self._stream.received_at if self._stream.received_at is not None else started
+			self._timings['receive'].record((started - tick.received) * 1e9)
+			self._timings['decode'].record((decoded - started) * 1e9)
+			self.on_tick(tick)
+		except Exception as e:
+			print(e)
+
+	def on_tick(self, tick):
+		"""
+		Applies a tick in sequence order, holding ticks that arrive early and resyncing when a gap doesn't fill
+		"""
+		if self._resync_buffer is not None:
+			self._resync_buffer.append(tick)
+			if self._retry_at is not None and time.time() >= self._retry_at:
+				self._retry_at = None
+				self._request_snapshot()
+			return
+
+		if self.sequence is None or tick.sequence is None:
+			self.apply_tick(tick)
+			if tick.sequence is not None:
+				self.sequence = tick.sequence
+			return
+
+		expected = self.sequence + 1
+		if tick.sequence < expected:
+			# duplicate or late tick, its changes are already in the books
+			self.stale_ticks += 1
+
+		elif tick.sequence == expected:
+			self.apply_tick(tick)
+			self.sequence = tick.sequence
+			# a held tick may now be next in line
+			while self._ahead:
+				tick = self._ahead.pop(self.sequence + 1, None)
+				if tick is None:
+					break
+				self.apply_tick(tick)
+				self.sequence = tick.sequence
+
+		else:
+			if not self._ahead:
+				self.gaps += 1
+			self._ahead[tick.sequence] = tick
+			if len(self._ahead) > self.gap_tolerance:
+				print('BOOK: {0} sequence gap after {1}, resyncing'.format(self.pair, self.sequence))
+				self.resync()
+
+	def resync(self):
+		"""
+		Buffers incoming ticks and fetches a fresh marketOrders() snapshot without stopping the stream
+		"""
+		if self._resync_buffer is not None:
+			return
+		self._resync_buffer = list(self._ahead.values())
+		self._ahead.clear()
+		self.resyncs += 1
+		self._request_snapshot()
+
+	def _request_snapshot(self):
+		if self._loop is not None and self._loop.is_running():
+			# fetch off the loop thread, finish back on it so the books are only ever touched by one thread
+			future = self._loop.run_in_executor(None, self._fetch_snapshot)
+			future.add_done_callback(self._snapshot_fetched)
+		else:
+			try:
+				market_orders = self._fetch_snapshot()
+			except Exception as e:
+				self._snapshot_failed(e)
+				return
+			self._load_snapshot(market_orders)
+
+	def _fetch_snapshot(self):
+		return self.api.marketOrders(self.pair, self.depth)
+
+	def _snapshot_fetched(self, future):
+		try:
+			market_orders = future.result()
+		except Exception as e:
+			self._snapshot_failed(e)
+			return
+		self._load_snapshot(market_orders)
+
+	def _snapshot_failed(self, error):
+		"""
+		Schedules another snapshot fetch, the resync buffer keeps filling until one loads
+		"""
+		print('BOOK: {0} resync snapshot failed, retrying: {1}'.format(self.pair, error))
+		if self._loop is not None and self._loop.is_running():
+			self._loop.call_later(self.resync_retry_delay, self._request_snapshot)
+		else:
+			# no loop to schedule on, the next tick buffered after the delay retries
+			self._retry_at = time.time() + self.resync_retry_delay
+
+	def _load_snapshot(self, market_orders):
+		try:
+			if not isinstance(market_orders, dict) or 'error' in market_orders or \
+					'bids' not in market_orders or 'asks' not in market_orders:
+				raise ValueError('unusable marketOrders() response: {0}'.format(market_orders))
+			self.bid_book.load(market_orders['bids'])
+			self.ask_book.load(market_orders['asks'])
+		except Exception as e:
+			# the resync buffer is still held, a later snapshot reloads both books
+			self._snapshot_failed(e)
+			return
+		self.sequence = market_orders.get('seq')
+		buffered = self._resync_buffer
+		self._resync_buffer = None
+
+		# stamped like the latest tick received, the snapshot is at least as recent as every buffered tick
+		timestamp = max(tick.timestamp for tick in buffered) if buffered else datetime.datetime.utcnow()
+		previous = self._snapshot
+		self._publish(self.sequence, timestamp, True, True)
+		self._notify_subscribers(previous, None)
+		print('BOOK: {0} books reloaded from marketOrders() at sequence {1}'.format(self.pair, self.sequence))
+
+		replay = []
+		for tick in buffered:
+			if self.sequence is not None and tick.sequence is not None and tick.sequence <= self.sequence:
+				# book changes are already in the snapshot, trades aren't
+				for trade in tick.trade_arr:
+					if not self.trade_book.trade_exists(trade[u'data'][u'tradeID']):
 						self.trade_book.new_trade(trade)
+			else:
+				replay.append(tick)
+		replay.sort(key=lambda tick: -1 if tick.sequence is None else tick.sequence)
+		for tick in replay:
+			self.on_tick(tick)
+
+	def _record_apply(self, tick, started, bids_applied, asks_applied, trades_applied):
+		timings = self._timings
+		if tick.bid_arr:
+			timings['apply_bid'].record((bids_applied - started) * 1e9)
+		if tick.ask_arr:
+			timings['apply_ask'].record((asks_applied - bids_applied) * 1e9)
+		if tick.trade_arr:
+			timings['apply_trade'].record((trades_applied - asks_applied) * 1e9)
+		received = getattr(tick, 'received', None)
+		if received is not None:
+			timings['total'].record((trades_applied - received) * 1e9)
+
+	def snapshot(self):
+		"""
+		Returns the BookSnapshot of both books as of the last fully applied tick, safe to call from any thread
+		"""
+		return self._snapshot
+
+	def _publish(self, sequence, timestamp, bids_changed, asks_changed):
+		# copy on write: a side the tick didn't touch is shared with the previous snapshot
+		previous = self._snapshot
+		bids = self.bid_book.top(self.snapshot_depth) if bids_changed else previous.bids
+		asks = self.ask_book.top(self.snapshot_depth) if asks_changed else previous.asks
+		# a single reference assignment, readers see the old snapshot or the new one and nothing in between
+		self._snapshot = BookSnapshot(self.pair, sequence, timestamp, bids, asks)
+
+	def on_best_bid_change(self, callback, where=None, dispatcher=None):
+		"""
+		Subscribes callback(wizard, snapshot) to changes of the best bid level's rate or amount.
+		Callbacks run on <dispatcher>'s thread (a new one by default) with the BookSnapshot the change was made in, a
+		subscriber that falls behind only gets the latest one. <where> filters snapshots on the stream thread.
+		Returns the Subscription, cancel() it to stop.
+		"""
+		return self._subscribe('best_bid', callback, where, dispatcher, True)
+
+	def on_best_ask_change(self, callback, where=None, dispatcher=None):
+		"""
+		Subscribes callback(wizard, snapshot) to changes of the best ask level's rate or amount, see on_best_bid_change()
+		"""
+		return self._subscribe('best_ask', callback, where, dispatcher, True)
+
+	def on_trade(self, callback, where=None, dispatcher=None):
+		"""
+		Subscribes callback(wizard, event) to every newTrade event applied, for ex. where=lambda e: e['data']['type'] ==
+		'buy'. Trades are never coalesced, they queue up to the dispatcher's max_queue.
+		"""
+		return self._subscribe('trade', callback, where, dispatcher, False)
+
+	def on_tick_applied(self, callback, where=None, dispatcher=None, coalesce=True):
+		"""
+		Subscribes callback(wizard, tick) to every tick applied to the books, and to resyncs reloading them from a
+		snapshot with tick None (timestamped in wizard.snapshot()). A subscriber that falls behind only gets the latest
+		tick unless <coalesce> is False. Pass a Dispatcher(threaded=False) to be called on the stream thread, with the
+		books as the tick left them, as CheckpointWriter is.
+		"""
+		return self._subscribe('tick', callback, where, dispatcher, coalesce)
+
+	def _subscribe(self, event, callback, where, dispatcher, coalesce):
+		subscription = Subscription(self, event, callback, where, dispatcher, coalesce)
+		# copy on write, the stream thread may be iterating the current list
+		self._subscriptions = dict(self._subscriptions)
+		self._subscriptions[event] = self._subscriptions[event] + [subscription]
+		return subscription
+
+	def unsubscribe(self, subscription):
+		subscriptions = dict(self._subscriptions)
+		subscriptions[subscription.event] = [s for s in subscriptions[subscription.event] if s is not subscription]
+		self._subscriptions = subscriptions
+
+	def _notify_subscribers(self, previous, tick):
+		subscriptions = self._subscriptions
+		snapshot = self._snapshot
+		if subscriptions['best_bid'] and snapshot.bids[:1] != previous.bids[:1]:
+			for subscription in subscriptions['best_bid']:
+				subscription.publish(snapshot)
+		if subscriptions['best_ask'] and snapshot.asks[:1] != previous.asks[:1]:
+			for subscription in subscriptions['best_ask']:
+				subscription.publish(snapshot)
+		if tick is not None and subscriptions['trade']:
+			for trade in tick.trade_arr:
+				for subscription in subscriptions['trade']:
+					subscription.publish(trade)
+		for subscription in subscriptions['tick']:
+			subscription.publish(tick)
+
+	def apply_tick(self, tick):
+		latency = self.latency
+		if latency is not None:
+			clock = time.perf_counter
+			started = clock()
+
+		for bid in tick.bid_arr:
+			if bid[u'type'] == 'orderBookRemove':
+				self.bid_book.remove(bid)
+			else:
+				self.bid_book.modify(bid)
+
+		if latency is not None:
+			bids_applied = clock()
+
+		for ask in tick.ask_arr:
+			if ask[u'type'] == 'orderBookRemove':
+				self.ask_book.remove(ask)
+			else:
+				self.ask_book.modify(ask)
+
+		if latency is not None:
+			asks_applied = clock()
+
+		for trade in tick.trade_arr:
+			self.trade_book.new_trade(trade)
+
+		if latency is not None:
+			self._record_apply(tick, started, bids_applied, asks_applied, clock())
+
+		sequence = tick.sequence if tick.sequence is not None else self.sequence
+		previous = self._snapshot
+		self._publish(sequence, tick.timestamp, bool(tick.bid_arr), bool(tick.ask_arr))
+		self._notify_subscribers(previous, tick)
 
-					# print 'BID TREE: ' + str(self.bid_book.rate_tree)
-					# print 'ASK TREE: ' + str(self.ask_book.rate_tree)
-					# print 'TRADE DEQUE: ' + str(self.trade_book.trade_deque)
-
-				except Exception as e:
-					print(e)
-
-		self._tickerP.wait()
-
-# if __name__ == "__main__":
-# 	test_popen = Popen(["python", POLONIEX_DIR['stream'] + 'wizard_streamer.py', 'BTC_ETH'], stdout=PIPE, bufsize=1)
-# 	with test_popen.stdout:
-# 			for tick_str in iter(test_popen.stdout.readline, b''):
-# 				print(tick_str)
-
-#if __name__ == "__main__":
-	#btc_eth = Wizard('BTC_ETH', 10)
-	#btc_etc = Wizard('BTC_ETC', 10)
-	#eth_etc = Wizard('ETH_ETC', 10)
-
-	#while True:
-		#first_leg = btc_eth.ask_book.min_rate_level()[0]
-		# print 'FIRST LEG: ' + str(first_leg)
-		#second_leg = btc_etc.ask_book.min_rate_level()[0]
-		# print 'SECOND LEG: ' + str(second_leg)
-		#third_leg = eth_etc.bid_book.max_rate_level()[0]
-		# print 'THIRD LEG: ' + str(third_leg)
-		# print (first_leg * third_leg / second_leg) * (.9975 * .9975 * .9975)
-		#inverse_first_leg = eth_etc.ask_book.min_rate_level()[0]
-		# print 'INVERSE FIRST LEG: ' + str(inverse_first_leg)
-		#inverse_second_leg = btc_etc.bid_book.max_rate_level()[0]
-		# print 'INVERSE SECOND LEG: ' + str(inverse_second_leg)
-		#inverse_third_leg = btc_eth.bid_book.max_rate_level()[0]
-		# print 'INVERSE THIRD LEG: ' + str(inverse_third_leg)
-		#print ("BTC-ETH MIN ASK: " + str(first_leg))
-		#print ("BTC-ETC MIN ASK: " + str(second_leg))
-		# print ("BTC-ETH MIN ASK: " + str(first_leg))
-		# print (inverse_first_leg * inverse_third_leg / inverse_second_leg) * (.9975 * .9975 * .9975)
-		#time.sleep(.5)
+		# print(self.bid_book)
+		# print(self.ask_book)
+		# print(self.trade_book)
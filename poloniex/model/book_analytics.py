@@ -0,0 +1,112 @@
+"""
+Vectorized order book analytics.
+
+A book is handled as four arrays, bid rates, bid amounts, ask rates and ask amounts, each ordered best level first
+along the last axis and padded to a fixed depth (rates with NaN, amounts with 0). The same functions accept a single
+live book, shape (depth,), or a stack of historical snapshots, shape (n_snapshots, depth), with no per-level python
+loops in either case.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+# bid_rates, ask_rates: float64 arrays of rates, best level first, NaN past the end of the book
+# bid_amounts, ask_amounts: float64 arrays of amounts, parallel to the rates, 0 past the end of the book
+BookArrays = namedtuple('BookArrays', ['bid_rates', 'bid_amounts', 'ask_rates', 'ask_amounts'])
+
+
+def side_arrays(book, depth):
+	"""
+	Exports a BidBook/AskBook as (rates, amounts) float64 arrays of length <depth>, best level first
+	"""
+	rates = np.full(depth, np.nan)
+	amounts = np.zeros(depth)
+	book_rates = book.rates(depth)
+	rates[:len(book_rates)] = book_rates
+	amounts[:len(book_rates)] = book.amounts(depth)
+	return rates, amounts
+
+
+def book_arrays(bid_book, ask_book, depth):
+	"""
+	Exports both sides of a live book as BookArrays of length <depth>
+	"""
+	bid_rates, bid_amounts = side_arrays(bid_book, depth)
+	ask_rates, ask_amounts = side_arrays(ask_book, depth)
+	return BookArrays(bid_rates, bid_amounts, ask_rates, ask_amounts)
+
+
+def snapshot_arrays(snapshot, depth):
+	"""
+	Exports a Wizard's BookSnapshot as BookArrays of length <depth>, levels past the snapshot's own depth are empty
+	"""
+	arrays = []
+	for levels in (snapshot.bids, snapshot.asks):
+		rates = np.full(depth, np.nan)
+		amounts = np.zeros(depth)
+		levels = levels[:depth]
+		if levels:
+			rates[:len(levels)], amounts[:len(levels)] = zip(*levels)
+		arrays.extend((rates, amounts))
+	return BookArrays(*arrays)
+
+
+def stack(snapshots):
+	"""
+	Stacks a sequence of equal depth BookArrays into one BookArrays of shape (n_snapshots, depth)
+	"""
+	return BookArrays(*(np.stack(column) for column in zip(*snapshots)))
+
+
+def _vwap_to_size(rates, amounts, sizes):
+	# amount taken from each level when filling each size, shape (..., n_sizes, depth)
+	before = np.cumsum(amounts, axis=-1) - amounts
+	fill = np.clip(sizes[:, None] - before[..., None, :], 0.0, amounts[..., None, :])
+	notional = np.sum(fill * np.nan_to_num(rates)[..., None, :], axis=-1)
+	vwap = notional / sizes
+	# sizes deeper than the book can't be filled
+	vwap[np.sum(amounts, axis=-1)[..., None] < sizes] = np.nan
+	return vwap
+
+
+def analyze(book, depths=(1, 5, 10), sizes=(1.0, 10.0)):
+	"""
+	Computes book statistics for one book or a stack of snapshots in a single vectorized pass.
+
+	Args:
+		book: BookArrays, from book_arrays() for a live book or stack() for historical snapshots.
+		depths: Sequence of level counts for the depth based statistics.
+		sizes: Sequence of amounts, in units of the second member of the pair, for the VWAP-to-size statistics.
+
+	Returns:
+		Dict of arrays, the leading shape of each matches the book's leading shape:
+			spread, mid, microprice: best level statistics.
+			imbalance: (bid depth - ask depth) / (bid depth + ask depth) per entry of depths, last axis.
+			weighted_mid: mean of each side's amount-weighted rate over the best levels per entry of depths, last axis.
+			bid_vwap, ask_vwap: average rate to sell/buy each entry of sizes, NaN if the book is too thin, last axis.
+
+	"""
+	bid_rates, bid_amounts, ask_rates, ask_amounts = [np.asarray(column, dtype=np.float64) for column in book]
+	max_depth = bid_rates.shape[-1]
+	depth_index = np.minimum(np.asarray(depths, dtype=np.intp), max_depth) - 1
+	sizes = np.asarray(sizes, dtype=np.float64)
+
+	with np.errstate(invalid='ignore', divide='ignore'):
+		best_bid, best_ask = bid_rates[..., 0], ask_rates[..., 0]
+		best_bid_amount, best_ask_amount = bid_amounts[..., 0], ask_amounts[..., 0]
+
+		bid_cumulative = np.cumsum(bid_amounts, axis=-1)[..., depth_index]
+		ask_cumulative = np.cumsum(ask_amounts, axis=-1)[..., depth_index]
+		bid_notional = np.cumsum(np.nan_to_num(bid_rates) * bid_amounts, axis=-1)[..., depth_index]
+		ask_notional = np.cumsum(np.nan_to_num(ask_rates) * ask_amounts, axis=-1)[..., depth_index]
+
+		return {
+			'spread': best_ask - best_bid,
+			'mid': (best_ask + best_bid) / 2,
+			'microprice': (best_bid * best_ask_amount + best_ask * best_bid_amount) / (best_bid_amount + best_ask_amount),
+			'imbalance': (bid_cumulative - ask_cumulative) / (bid_cumulative + ask_cumulative),
+			'weighted_mid': (bid_notional / bid_cumulative + ask_notional / ask_cumulative) / 2,
+			'bid_vwap': _vwap_to_size(bid_rates, bid_amounts, sizes),
+			'ask_vwap': _vwap_to_size(ask_rates, ask_amounts, sizes),
+		}
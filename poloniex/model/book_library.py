@@ -1,37 +1,43 @@
 from __future__ import print_function
-from bson.binary import Binary
-import cPickle
+from poloniex.model import columnar
+
 from arctic import Arctic, register_library_type
 from arctic.decorators import mongo_retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import pymongo
 
 
 class BookData(object):
 	"""
 	This BookData class is the main data model for book data that has already been constructed by our scripts.
-	An instance of BookData contains a timestamp and the corresponding updated bid, ask, and/or trade book.
+	An instance of BookData contains a pair, a timestamp and the corresponding bid, ask, and/or trade book as arrays.
 	This model for data storage is implemented by BookDataLibrary, our custom Arctic library implementation of MongoDB.
 	"""
 
-	def __init__(self, timestamp, bid_book=None, ask_book=None, trade_book=None):
+	def __init__(self, pair, timestamp, bid_book=None, ask_book=None, trade_book=None):
+		"""
+		Args:
+			pair: String currency pair.
+			timestamp: Datetime of the snapshot.
+			bid_book: Tuple of (rates, amounts) NumPy arrays, best level first, or None.
+			ask_book: Tuple of (rates, amounts) NumPy arrays, best level first, or None.
+			trade_book: columnar.TRADE_DTYPE structured NumPy array, oldest trade first, or None.
+
+		"""
+		self.pair = pair
 		self.timestamp = timestamp
-		if bid_book:
-			self.bid_book = {'rate_tree': bid_book['rate_tree'],
-			                 'rate_dict': bid_book['rate_dict']
-			                 }
-		else:
-			self.bid_book = None
-		if ask_book:
-			self.ask_book = ask_book
-			self.ask_book = {'rate_tree': ask_book['rate_tree'],
-			                 'rate_dict': ask_book['rate_dict']
-			                 }
-		else:
-			self.ask_book = None
-		if trade_book:
-			self.trade_book = trade_book
-			self.trade_book = {'trade_deque': trade_book['trade_deque'],
-			                 'trade_dict': trade_book['trade_dict']
-			                 }
+		self.bid_book = bid_book
+		self.ask_book = ask_book
+		self.trade_book = trade_book
+
+	@classmethod
+	def from_wizard(cls, wizard, timestamp):
+		"""
+		Snapshots a Wizard's bid, ask and trade books, the trade book to its last <depth> trades like the books
+		"""
+		return cls(wizard.pair, timestamp, columnar.side_columns(wizard.bid_book),
+				   columnar.side_columns(wizard.ask_book), columnar.trade_columns(wizard.trade_book, wizard.depth))
 
 
 class BookDataLibrary(object):
@@ -61,21 +67,79 @@ class BookDataLibrary(object):
 		Index the fields that get used by queries
 		"""
 		collection = self._collection
-		collection.create_index('timestamp')  # MUST EDIT
+		collection.create_index('timestamp')
+		# read() filters on pair and scans a timestamp range in order
+		collection.create_index([('pair', pymongo.ASCENDING), ('timestamp', pymongo.ASCENDING)])
 
 	@mongo_retry
-	def query(self, *args, **kwargs):
+	def query(self, filter=None, fields=None, **kwargs):
 		"""
 		Generic query method that creates a generator to yield data that matches the query.
 		A Generator is the most memory efficient choice here, as the entire set of documents that match the query isn't
 		handled in memory at once.
+		Only the columns of <fields> ('bid_book', 'ask_book', 'trade_book', all by default) are fetched and decoded.
+		"""
+		fields = fields or tuple(columnar.COLUMNS)
+		for book_tick in self._collection.find(filter, columnar.projection(fields), **kwargs):
+			yield BookData(book_tick['pair'], book_tick['timestamp'], **columnar.decode(book_tick, fields))
+
+	@staticmethod
+	def _decode_batch(book_ticks, fields):
+		return [BookData(book_tick['pair'], book_tick['timestamp'], **columnar.decode(book_tick, fields))
+				for book_tick in book_ticks]
+
+	@mongo_retry
+	def read_batches(self, pair, start=None, end=None, fields=None, batch_size=500, workers=1):
+		"""
+		Creates a generator yielding lists of up to <batch_size> BookData for <pair> with start <= timestamp < end,
+		in timestamp order, served by the (pair, timestamp) index.
+		Only the columns of <fields> ('bid_book', 'ask_book', 'trade_book', all by default) are fetched and decoded.
+		With workers > 1, batches are decoded on a thread pool (zlib and NumPy release the GIL) while later batches
+		are still being fetched, which is what keeps month long ranges fast.
+		"""
+		fields = fields or tuple(columnar.COLUMNS)
+		query = {'pair': pair}
+		if start is not None or end is not None:
+			query['timestamp'] = {}
+			if start is not None:
+				query['timestamp']['$gte'] = start
+			if end is not None:
+				query['timestamp']['$lt'] = end
+		cursor = self._collection.find(query, columnar.projection(fields)) \
+			.sort([('timestamp', pymongo.ASCENDING)]).batch_size(batch_size)
+
+		def chunks():
+			chunk = []
+			for book_tick in cursor:
+				chunk.append(book_tick)
+				if len(chunk) == batch_size:
+					yield chunk
+					chunk = []
+			if chunk:
+				yield chunk
+
+		if workers <= 1:
+			for chunk in chunks():
+				yield self._decode_batch(chunk, fields)
+			return
+
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			# keep one batch per worker in flight, yield in order
+			in_flight = deque()
+			for chunk in chunks():
+				in_flight.append(executor.submit(self._decode_batch, chunk, fields))
+				if len(in_flight) >= workers:
+					yield in_flight.popleft().result()
+			while in_flight:
+				yield in_flight.popleft().result()
+
+	def read(self, pair, start=None, end=None, fields=None, batch_size=500, workers=1):
+		"""
+		Creates a generator yielding BookData for <pair> with start <= timestamp < end, see read_batches()
 		"""
-		for book_tick in self._collection.find(*args, **kwargs):
-			book_tick['bid_book'] = cPickle.loads(book_tick['bid_book'])
-			book_tick['ask_book'] = cPickle.loads(book_tick['ask_book'])
-			book_tick['trade_book'] = cPickle.loads(book_tick['trade_book'])
-			del book_tick['_id']
-			yield BookData(book_tick)
+		for batch in self.read_batches(pair, start, end, fields, batch_size, workers):
+			for book_data in batch:
+				yield book_data
 
 	@mongo_retry
 	def stats(self):
@@ -91,14 +155,14 @@ class BookDataLibrary(object):
 		return stats
 
 	@mongo_retry
-	def store(self, book_data):
+	def store(self, book_data, compress=False):
 		"""
-		Simple persistence method
+		Simple persistence method, every book column is stored as its own fixed-dtype array (see columnar).
+		<compress> zlibs the arrays, about a quarter smaller but several times slower to write, so it is off by default.
 		"""
-		to_store = {'pair': book_data.pair, 'timestamp': book_data.timestamp,
-					'bid_book': Binary(cPickle.dumps(book_data.bid_book)),
-					'ask_book': Binary(cPickle.dumps(book_data.ask_book)),
-					'trade_book': Binary(cPickle.dumps(book_data.trade_book))}
+		to_store = columnar.encode(book_data, compress)
+		to_store['pair'] = book_data.pair
+		to_store['timestamp'] = book_data.timestamp
 
 		# Respect any soft-quota on write - raises if stats().totals.size > quota
 		self._arctic_lib.check_quota()
@@ -0,0 +1,138 @@
+from __future__ import print_function
+from poloniex.model import columnar
+from poloniex.model.book_library import BookData
+from poloniex.model.wizard_build import BidBook, AskBook
+
+from arctic import Arctic, register_library_type
+from arctic.decorators import mongo_retry
+from bson.objectid import ObjectId
+import calendar
+import pymongo
+
+
+def epoch(timestamp):
+	"""
+	Returns a naive UTC datetime as float epoch seconds
+	"""
+	return calendar.timegm(timestamp.utctimetuple()) + timestamp.microsecond / 1e6
+
+
+class CheckpointLibrary(object):
+	"""
+	This CheckpointLibrary class is a custom implementation of the Arctic MongoDB layer for point-in-time book
+	reconstruction, a sibling of BookDataLibrary.
+	Full bid and ask books are stored as checkpoints at an interval, every level change applied between two
+	checkpoints is stored in compact delta chunks tied to the checkpoint before them (see CheckpointWriter).
+	The book at any time is the nearest checkpoint before it with only that checkpoint's deltas replayed on top.
+	"""
+	_LIBRARY_TYPE = 'wg-crypto.CheckpointLibrary'
+
+	def __init__(self, arctic_lib):
+		self._arctic_lib = arctic_lib
+		# arctic_lib automatically provides a root pymongo.Collection to store data
+		self._collection = arctic_lib.get_top_level_collection()
+		self._checkpoints = self._collection.checkpoints
+		self._deltas = self._collection.deltas
+
+	@classmethod
+	def initialize_library(cls, arctic_lib, **kwargs):
+		CheckpointLibrary(arctic_lib)._ensure_index()
+
+	def _ensure_index(self):
+		"""
+		Index the fields that get used by queries
+		"""
+		# the nearest checkpoint at or before a time
+		self._checkpoints.create_index([('pair', pymongo.ASCENDING), ('timestamp', pymongo.DESCENDING)])
+		# a checkpoint's delta chunks in order
+		self._deltas.create_index([('checkpoint', pymongo.ASCENDING), ('chunk', pymongo.ASCENDING)])
+
+	@staticmethod
+	def checkpoint_doc(pair, timestamp, sequence, bid_book, ask_book, compress=True):
+		"""
+		Returns the document of a checkpoint of a BidBook and AskBook, its _id is set so deltas can refer to it
+		before it is stored
+		"""
+		doc = columnar.encode(BookData(pair, timestamp, columnar.side_columns(bid_book),
+									   columnar.side_columns(ask_book)), compress)
+		doc.update({'_id': ObjectId(), 'pair': pair, 'timestamp': timestamp, 'sequence': sequence,
+					'depth': bid_book.max_depth})
+		return doc
+
+	@staticmethod
+	def delta_doc(pair, checkpoint_id, chunk, deltas, compress=True):
+		"""
+		Returns the document of the <chunk>th run of level changes after a checkpoint, <deltas> is a
+		columnar.DELTA_DTYPE array in the order the changes were applied
+		"""
+		return {'pair': pair, 'checkpoint': checkpoint_id, 'chunk': chunk, 'count': len(deltas),
+				'start': float(deltas['timestamp'][0]), 'end': float(deltas['timestamp'][-1]),
+				'compression': 'zlib' if compress else None, 'deltas': columnar.encode_array(deltas, compress)}
+
+	@mongo_retry
+	def store_checkpoint(self, doc):
+		# Respect any soft-quota on write - raises if stats().totals.size > quota
+		self._arctic_lib.check_quota()
+		self._checkpoints.insert_one(doc)
+
+	@mongo_retry
+	def store_deltas(self, doc):
+		self._arctic_lib.check_quota()
+		self._deltas.insert_one(doc)
+
+	@mongo_retry
+	def books_at(self, pair, timestamp, depth=None):
+		"""
+		Returns the (BidBook, AskBook) of <pair> as they stood at datetime <timestamp>, or None before the first
+		checkpoint.
+		Books hold the checkpoint's depth unless <depth> is given, deltas are replayed through the same modify() and
+		remove() the stream uses, so levels beyond the depth drop out exactly as they did live.
+		"""
+		checkpoint = self._checkpoints.find_one({'pair': pair, 'timestamp': {'$lte': timestamp}},
+												sort=[('timestamp', pymongo.DESCENDING)])
+		if checkpoint is None:
+			return None
+		depth = depth or checkpoint['depth']
+		books = columnar.decode(checkpoint, ('bid_book', 'ask_book'))
+		bid_book = BidBook(depth, list(zip(*books['bid_book'])))
+		ask_book = AskBook(depth, list(zip(*books['ask_book'])))
+
+		end = epoch(timestamp)
+		sides = {1: bid_book, -1: ask_book}
+		chunks = self._deltas.find({'checkpoint': checkpoint['_id'], 'start': {'$lte': end}},
+								   sort=[('chunk', pymongo.ASCENDING)])
+		for chunk in chunks:
+			deltas = columnar.decode_array(chunk['deltas'], columnar.DELTA_DTYPE, chunk['compression'] == 'zlib')
+			if chunk['end'] > end:
+				deltas = deltas[:deltas['timestamp'].searchsorted(end, side='right')]
+			for side, rate, amount in zip(deltas['side'].tolist(), deltas['rate'].tolist(), deltas['amount'].tolist()):
+				event = {u'data': {u'rate': rate, u'amount': amount}}
+				if amount >= 0:
+					sides[side].modify(event)
+				else:
+					sides[side].remove(event)
+		return bid_book, ask_book
+
+	def book_at(self, pair, timestamp, depth=None):
+		"""
+		Returns a BookData of the bid and ask books of <pair> at datetime <timestamp>, see books_at()
+		"""
+		books = self.books_at(pair, timestamp, depth)
+		if books is None:
+			return None
+		return BookData(pair, timestamp, columnar.side_columns(books[0]), columnar.side_columns(books[1]))
+
+	@mongo_retry
+	def stats(self):
+		"""
+		Database usage statistics.
+		Used by quota.
+		"""
+		stats = {}
+		db = self._collection.database
+		stats['dbstats'] = db.command('dbstats')
+		stats['checkpoints'] = db.command('collstats', self._checkpoints.name)
+		stats['deltas'] = db.command('collstats', self._deltas.name)
+		stats['totals'] = {'count': stats['checkpoints']['count'] + stats['deltas']['count'],
+						   'size': stats['checkpoints']['size'] + stats['deltas']['size']}
+		return stats
@@ -0,0 +1,99 @@
+"""
+Columnar encoding of book snapshots for BookDataLibrary.
+
+Every column is stored as its own Binary field holding a fixed-dtype little endian array, optionally zlib
+compressed, so a reader fetches and decodes only the columns it asks for, straight into NumPy, with no per-level
+python objects and no pickle.
+"""
+from bson.binary import Binary
+import numpy as np
+import zlib
+
+CODEC_VERSION = 1
+
+RATE_DTYPE = np.dtype('<f8')
+AMOUNT_DTYPE = np.dtype('<f8')
+TRADE_DTYPE = np.dtype([('trade_id', '<i8'), ('timestamp', '<f8'), ('rate', '<f8'), ('amount', '<f8'),
+						('total', '<f8'), ('side', 'i1')])
+# one book level change: receipt epoch, side (1 bid, -1 ask), rate and new amount, -1 for a removed level
+DELTA_DTYPE = np.dtype([('timestamp', '<f8'), ('side', 'i1'), ('rate', '<f8'), ('amount', '<f8')])
+
+# book field and (document column, dtype) pairs making it up
+COLUMNS = {
+	'bid_book': (('bid_rate', RATE_DTYPE), ('bid_amount', AMOUNT_DTYPE)),
+	'ask_book': (('ask_rate', RATE_DTYPE), ('ask_amount', AMOUNT_DTYPE)),
+	'trade_book': (('trades', TRADE_DTYPE),),
+}
+
+
+def side_columns(book):
+	"""
+	Returns (rates, amounts) arrays of a BidBook/AskBook, best level first
+	"""
+	return np.array(book.rates(), dtype=RATE_DTYPE), np.array(book.amounts(), dtype=AMOUNT_DTYPE)
+
+
+def trade_columns(trade_book, last=None):
+	"""
+	Returns a TRADE_DTYPE structured array of a TradeBook, oldest trade first, every trade held or the <last> ones
+	"""
+	columns = trade_book.columns(last)
+	trades = np.empty(len(columns[0]), dtype=TRADE_DTYPE)
+	for name, column in zip(TRADE_DTYPE.names, columns):
+		trades[name] = np.frombuffer(column, dtype=column.typecode)
+	return trades
+
+
+def encode_array(array, compress=True):
+	data = np.ascontiguousarray(array).tobytes()
+	return Binary(zlib.compress(data, 1) if compress else data)
+
+
+def decode_array(data, dtype, compressed=True):
+	if compressed:
+		data = zlib.decompress(data)
+	return np.frombuffer(data, dtype=dtype)
+
+
+def encode(book_data, compress=True):
+	"""
+	Returns the document columns for a BookData, books that are None are left out
+	"""
+	doc = {'codec': {'version': CODEC_VERSION, 'compression': 'zlib' if compress else None}}
+	for field, columns in COLUMNS.items():
+		value = getattr(book_data, field)
+		if value is None:
+			continue
+		if len(columns) == 1:
+			value = (value,)
+		for (name, dtype), array in zip(columns, value):
+			doc[name] = encode_array(np.asarray(array, dtype=dtype), compress)
+	return doc
+
+
+def projection(fields):
+	"""
+	Returns the Mongo projection fetching only the columns of <fields> (bid_book, ask_book, trade_book)
+	"""
+	projected = {'_id': 0, 'pair': 1, 'timestamp': 1, 'codec': 1}
+	for field in fields:
+		for name, _ in COLUMNS[field]:
+			projected[name] = 1
+	return projected
+
+
+def decode(doc, fields=None):
+	"""
+	Returns a dict of book field and decoded arrays for the <fields> present in a document, every field by default.
+	bid_book/ask_book decode to (rates, amounts), trade_book to a TRADE_DTYPE structured array.
+	"""
+	compressed = doc['codec']['compression'] == 'zlib'
+	books = {}
+	for field in (fields or COLUMNS):
+		columns = COLUMNS[field]
+		if columns[0][0] not in doc:
+			books[field] = None
+			continue
+		arrays = tuple(decode_array(doc[name], dtype, compressed) for name, dtype in columns)
+		books[field] = arrays if len(arrays) > 1 else arrays[0]
+	return books
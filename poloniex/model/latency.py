@@ -0,0 +1,199 @@
+"""
+Low overhead latency histograms for the tick path.
+
+A LatencyHistogram buckets nanosecond values the way HdrHistogram does: exact below 2 ** SUB_BUCKET_BITS, then
+2 ** (SUB_BUCKET_BITS - 1) linear buckets per power of two, so every recorded value keeps about 3% precision from
+nanoseconds to minutes in a fixed array of counts. Recording is a bit_length, a shift and an array increment.
+"""
+from array import array
+from threading import Thread
+import time
+
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+# values are clamped to 2 ** MAX_BITS ns, about 18 minutes
+MAX_BITS = 40
+BUCKET_COUNT = SUB_BUCKET_COUNT + (MAX_BITS - SUB_BUCKET_BITS) * SUB_BUCKET_HALF
+MAX_VALUE = (1 << MAX_BITS) - 1
+
+# stages recorded for every tick, in path order
+# receive: websocket message in to the wizard's handler called, includes decoding the WAMP frame
+# decode: building the Tick from the event list
+# apply_bid, apply_ask, apply_trade: applying each kind of event to its book
+# total: websocket message in to the tick fully applied, includes time held waiting for a missing sequence
+STAGES = ('receive', 'decode', 'apply_bid', 'apply_ask', 'apply_trade', 'total')
+
+
+def _bucket(value):
+	bits = value.bit_length()
+	if bits <= SUB_BUCKET_BITS:
+		return value
+	shift = bits - SUB_BUCKET_BITS
+	return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def _bucket_value(index):
+	"""
+	Returns the midpoint of the values counted in bucket <index>
+	"""
+	if index < SUB_BUCKET_COUNT:
+		return index
+	shift = index // SUB_BUCKET_HALF - 1
+	low = (index - shift * SUB_BUCKET_HALF) << shift
+	return low + ((1 << shift) - 1) / 2.0
+
+
+class LatencyHistogram(object):
+	"""
+	Log-linear histogram of latencies in nanoseconds, see the module docstring
+	"""
+
+	def __init__(self):
+		self.counts = array('q', bytes(8 * BUCKET_COUNT))
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	def record(self, nanoseconds):
+		value = int(nanoseconds)
+		if value > MAX_VALUE:
+			value = MAX_VALUE
+		elif value < 0:
+			value = 0
+		# _bucket() inlined, this runs several times per tick
+		bits = value.bit_length()
+		if bits <= SUB_BUCKET_BITS:
+			self.counts[value] += 1
+		else:
+			shift = bits - SUB_BUCKET_BITS
+			self.counts[shift * SUB_BUCKET_HALF + (value >> shift)] += 1
+		self.count += 1
+		self.total += value
+		if value > self.max:
+			self.max = value
+
+	def record_seconds(self, seconds):
+		self.record(seconds * 1e9)
+
+	@property
+	def min(self):
+		"""
+		Lowest value recorded, to the precision of its bucket
+		"""
+		for index, count in enumerate(self.counts):
+			if count:
+				return _bucket_value(index)
+		return 0
+
+	def percentile(self, percent):
+		"""
+		Returns the value in nanoseconds at or below which <percent> of the recorded values fall
+		"""
+		if not self.count:
+			return 0.0
+		rank = max(1, int(round(self.count * percent / 100.0)))
+		seen = 0
+		for index, count in enumerate(self.counts):
+			if count:
+				seen += count
+				if seen >= rank:
+					return min(_bucket_value(index), self.max)
+		return float(self.max)
+
+	def mean(self):
+		return self.total / float(self.count) if self.count else 0.0
+
+	def merge(self, other):
+		for index, count in enumerate(other.counts):
+			if count:
+				self.counts[index] += count
+		self.count += other.count
+		self.total += other.total
+		self.max = max(self.max, other.max)
+
+	def reset(self):
+		self.counts = array('q', bytes(8 * BUCKET_COUNT))
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	def summary(self, percentiles=(50, 90, 99, 99.9)):
+		"""
+		Returns a dict of count, mean, max and the <percentiles> in microseconds
+		"""
+		summary = {'count': self.count, 'mean_us': self.mean() / 1e3, 'max_us': self.max / 1e3 if self.count else 0.0}
+		for percent in percentiles:
+			summary['p{0:g}_us'.format(percent)] = self.percentile(percent) / 1e3
+		return summary
+
+
+class LatencyRecorder(object):
+	"""
+	LatencyHistograms per pair and stage, shared by the stream client and every Wizard that is given it.
+	Histograms are written by the stream thread only, stats() and the log line read them from any thread, so a read
+	may be off by the tick being recorded but never blocks the stream.
+	Pass no recorder (the default) to leave instrumentation off entirely.
+	"""
+
+	def __init__(self, stages=STAGES):
+		# dict: (pair, stage) and LatencyHistogram key value pairs
+		self.histograms = {}
+		self.stages = stages
+		self._loggerT = None
+		self._stopped = False
+
+	def histogram(self, pair, stage):
+		key = (pair, stage)
+		histogram = self.histograms.get(key)
+		if histogram is None:
+			histogram = self.histograms[key] = LatencyHistogram()
+		return histogram
+
+	def record(self, pair, stage, seconds):
+		self.histogram(pair, stage).record(seconds * 1e9)
+
+	def stats(self, pair=None):
+		"""
+		Returns a dict of pair and {stage: summary} key value pairs, only <pair>'s if given
+		"""
+		stats = {}
+		for (key_pair, stage), histogram in list(self.histograms.items()):
+			if pair is None or key_pair == pair:
+				stats.setdefault(key_pair, {})[stage] = histogram.summary()
+		return stats
+
+	def log_line(self, pair):
+		parts = []
+		for stage in self.stages:
+			histogram = self.histograms.get((pair, stage))
+			if histogram is not None and histogram.count:
+				parts.append('{0} p50 {1:.0f}us p99 {2:.0f}us max {3:.0f}us'.format(
+					stage, histogram.percentile(50) / 1e3, histogram.percentile(99) / 1e3, histogram.max / 1e3))
+		total = self.histograms.get((pair, 'decode'))
+		return 'LATENCY: {0} {1} ticks | {2}'.format(pair, total.count if total is not None else 0, ' | '.join(parts))
+
+	def reset(self):
+		for histogram in list(self.histograms.values()):
+			histogram.reset()
+
+	def start_logging(self, interval=60.0, reset=True):
+		"""
+		Starts a thread printing one log line per pair every <interval> seconds, covering only that interval if <reset>
+		"""
+		self._stopped = False
+		self._loggerT = Thread(target=self._log, args=(interval, reset))
+		self._loggerT.daemon = True
+		self._loggerT.start()
+
+	def stop_logging(self):
+		self._stopped = True
+
+	def _log(self, interval, reset):
+		while not self._stopped:
+			time.sleep(interval)
+			for pair in sorted(set(pair for pair, _ in list(self.histograms))):
+				print(self.log_line(pair))
+			if reset:
+				self.reset()
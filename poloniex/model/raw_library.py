@@ -1,8 +1,12 @@
 from __future__ import print_function
-from bson.binary import Binary
-import cPickle
 from arctic import Arctic, register_library_type
 from arctic.decorators import mongo_retry
+from bson import ObjectId
+import pymongo
+import pymongo.errors
+
+# Mongo error code of an insert clashing with an existing _id
+DUPLICATE_KEY = 11000
 
 
 class RawData(object):
@@ -12,6 +16,87 @@ class RawData(object):
 	This model for data storage is implemented by RawDataLibrary, our custom Arctic library implementation of MongoDB.
 	"""
 
-	def __init__(self, data_type, data):
+	def __init__(self, data_type, data, pair=None, timestamp=None, sequence=None):
+		"""
+		Args:
+			data_type: String kind of data, for ex. 'tick' for a WAMP stream tick or 'returnOrderBook'.
+			data: Decoded contents, for a tick the list of events published by the exchange.
+			pair: String currency pair the data belongs to.
+			timestamp: Float epoch seconds the data was received.
+			sequence: Int exchange sequence number of a tick.
+
+		"""
 		self.data_type = data_type
-		self.data = data
\ No newline at end of file
+		self.data = data
+		self.pair = pair
+		self.timestamp = timestamp
+		self.sequence = sequence
+
+	def to_doc(self):
+		return {'data_type': self.data_type, 'data': self.data, 'pair': self.pair, 'timestamp': self.timestamp,
+				'sequence': self.sequence}
+
+
+class RawDataLibrary(object):
+	"""
+	This RawDataLibrary class is a custom implementation of the Arctic MongoDB layer for storing raw stream and public
+	API data as received, so it can be replayed later.
+	"""
+	_LIBRARY_TYPE = 'wg-crypto.RawDataLibrary'
+
+	def __init__(self, arctic_lib):
+		self._arctic_lib = arctic_lib
+		# arctic_lib automatically provides a root pymongo.Collection to store data
+		self._collection = arctic_lib.get_top_level_collection()
+
+	@classmethod
+	def initialize_library(cls, arctic_lib, **kwargs):
+		RawDataLibrary(arctic_lib)._ensure_index()
+
+	def _ensure_index(self):
+		"""
+		Index the fields that get used by queries, replays read one pair in receipt order
+		"""
+		self._collection.create_index([('pair', pymongo.ASCENDING), ('timestamp', pymongo.ASCENDING)])
+
+	@mongo_retry
+	def query(self, *args, **kwargs):
+		"""
+		Generic query method that creates a generator to yield RawData that matches the query.
+		"""
+		for doc in self._collection.find(*args, **kwargs):
+			yield RawData(doc['data_type'], doc['data'], doc.get('pair'), doc.get('timestamp'), doc.get('sequence'))
+
+	@mongo_retry
+	def store(self, raw_data):
+		"""
+		Simple persistence method
+		"""
+		# Respect any soft-quota on write - raises if stats().totals.size > quota
+		self._arctic_lib.check_quota()
+		self._collection.insert_one(raw_data.to_doc())
+
+	def store_many(self, raw_datas):
+		"""
+		Bulk persistence method, one round trip for the whole list.
+		Every document gets its _id before the first attempt, so a retry after a dropped connection cannot store a
+		document the failed attempt already wrote a second time.
+		"""
+		docs = []
+		for raw_data in raw_datas:
+			doc = raw_data.to_doc()
+			doc['_id'] = ObjectId()
+			docs.append(doc)
+		self._insert_many(docs)
+
+	@mongo_retry
+	def _insert_many(self, docs):
+		self._arctic_lib.check_quota()
+		try:
+			self._collection.insert_many(docs, ordered=False)
+		except pymongo.errors.BulkWriteError as e:
+			# duplicate keys are documents an earlier attempt got in before its connection dropped, the rest went in
+			if (e.details.get('writeConcernErrors') or
+					any(error['code'] != DUPLICATE_KEY for error in e.details.get('writeErrors', []))):
+				raise
+
@@ -1,8 +1,10 @@
-from bintrees import FastRBTree
-from collections import deque
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+import calendar
 import datetime
-import dateutil.parser
-import ast
+import json
+import time
 
 
 class Tick(object):
@@ -16,292 +18,692 @@ class Tick(object):
 		Initializes a tick object, which is comprised of a timestamp, sequence and many events
 
 		Args:
-			tick: String representing tick received from STDOUT of exchange API.
+			tick: String or bytes holding one JSON line written by Tick.encode() (see wizard_streamer.py).
 
 		"""
-
-		self.timestamp = datetime.datetime.utcnow()
+		tick = json.loads(tick)
+		if u't' in tick:
+			self.timestamp = datetime.datetime.utcfromtimestamp(tick[u't'])
+		else:
+			self.timestamp = datetime.datetime.utcnow()
+		self.sequence = tick.get(u'seq')
 		self.bid_arr = []
 		self.ask_arr = []
 		self.trade_arr = []
+		for event in tick[u'ev']:
+			self._add_event(event)
+
+	@classmethod
+	def from_wamp(cls, args, kwargs):
+		"""
+		Builds a tick straight from a decoded WAMP event, skipping any string parsing
+
+		Args:
+			args: List of event dicts published by the exchange.
+			kwargs: Dict of keyword arguments published with the events, holds the sequence under u'seq'.
+
+		"""
+		tick = cls.__new__(cls)
+		tick.timestamp = datetime.datetime.utcnow()
+		tick.sequence = kwargs.get(u'seq')
+		tick.bid_arr = []
+		tick.ask_arr = []
+		tick.trade_arr = []
+		for event in args:
+			tick._add_event(event)
+		return tick
+
+	@staticmethod
+	def encode(args, kwargs, timestamp=None):
+		"""
+		Frames a WAMP event as a single JSON line: {"t": receipt epoch, "seq": sequence, "ev": events}
+		JSON escapes newlines inside strings, so one line is always exactly one tick whatever the payload holds.
+		"""
+		if timestamp is None:
+			timestamp = time.time()
+		return json.dumps({'t': timestamp, 'seq': kwargs.get(u'seq'), 'ev': args}, separators=(',', ':')) + '\n'
 
-		for i, event_str in enumerate(tick.split('*')):
-			# ignoring i=0 because it contains timestamp sent from poloniex, which lacks too much accuracy to be useful
-			# sequence is always second in tick
-			if i == 1:
-				self.sequence = ast.literal_eval(event_str)[u'seq']
-			elif i > 1:
-				event = ast.literal_eval(event_str)
-				# stream_type and order_type used to make separate lists for modifying tradeDeque, bidTree and askTree
-				if event[u'type']== "newTrade":
-					self.trade_arr.append(event)
+	def _add_event(self, event):
+		# stream_type and order_type used to make separate lists for modifying tradeDeque, bidTree and askTree
+		if event[u'type'] == "newTrade":
+			self.trade_arr.append(event)
 
-				if event[u'data'][u'type'] == "bid":
-					self.bid_arr.append(event)
+		if event[u'data'][u'type'] == "bid":
+			self.bid_arr.append(event)
 
-				elif event[u'data'][u'type'] == "ask":
-					self.ask_arr.append(event)
+		elif event[u'data'][u'type'] == "ask":
+			self.ask_arr.append(event)
 
 	def __str__(self):
 		ret_str = "TICK - Timestamp: {0}, Sequence: {1}, Bids: {2}, 'Asks: {3}, Trades: {4}"
 		return ret_str.format(self.timestamp, self.sequence, self.bid_arr, self.ask_arr, self.trade_arr)
 
 
-class BidBook(object):
+class BookSnapshot(namedtuple('BookSnapshot', ['pair', 'sequence', 'timestamp', 'bids', 'asks'])):
 	"""
-	A BidBook is used to store the order book's rates and amounts on the bid side with a defined depth.
-	To maintain a sorted order of rates, the BidBook uses a red-black tree to store rates and corresponding amounts.
-	For O(1) query of volume at a predetermined rate, the BidBook also uses a dictionary to store rate and amount.
+	An immutable view of both sides of a pair's book as of one fully applied tick.
+	bids and asks are tuples of (rate, amount) levels, best level first, cut to the publishing Wizard's snapshot depth.
+	A Wizard publishes a new BookSnapshot by swapping a single reference, so any thread can read one without locks and
+	never sees a half applied tick.
 	"""
 
-	def __init__(self, max_depth, data):
-		# RBTree: maintains sorted order of rates
-		# every value inserted to RBTree must be a tuple, so we hard code the second value to be 0
-		self.rate_tree = FastRBTree()
+	__slots__ = ()
 
-		# dict: Uses rate and amount for key value pairs
-		self.rate_dict = {}
+	def best_bid(self):
+		return self.bids[0] if self.bids else None
 
-		# float: amounts summed across all rate levels in tree
-		self.volume = 0
+	def best_ask(self):
+		return self.asks[0] if self.asks else None
 
-		# int: total number of rate levels in tree
-		self.depth = len(data)
+	def spread(self):
+		if self.bids and self.asks:
+			return self.asks[0][0] - self.bids[0][0]
+		return None
 
-		# int: maximum number of rate levels in tree
-		self.max_depth = max_depth
+	def mid(self):
+		if self.bids and self.asks:
+			return (self.asks[0][0] + self.bids[0][0]) / 2.0
+		return None
 
-		# populate rate_tree and rate_dict from public API call data
-		# set volume
-		for level in data:
-			rate = float(level[0])
-			amount = float(level[1])
-			self.rate_tree.insert(rate, 0)
-			self.rate_dict[rate] = amount
-			self.volume += amount
 
-	def __len__(self):
-		return len(self.rate_dict)
+class _DepthTree(object):
+	"""
+	A Fenwick tree of [level count, amount, notional] sums over a window of the 1e-8 rate grid Poloniex quotes on,
+	indexed by signed rate key. The window is sized to a few times the span of the keys it was built for, so updates
+	and queries walk log2(window) nodes, and nodes are held in a dict that only keeps the ones with a level under them.
+	"""
 
-	def rate_exists(self, rate):
-		return rate in self.rate_dict
+	__slots__ = ('nodes', 'base', 'size')
 
-	def get_amount_at_rate(self, rate):
-		return self.rate_dict.get(rate)
+	def __init__(self, low, high):
+		"""
+		Args:
+			low: Float lowest signed rate key the tree must cover.
+			high: Float highest signed rate key the tree must cover.
 
-	def max_rate_level(self):
-		if self.depth > 0:
-			rate = self.rate_tree.max_key()
-			amount = self.get_amount_at_rate(rate)
-			return rate, amount
-		else:
-			return None
+		"""
+		low = int(round(low * 1e8))
+		span = int(round(high * 1e8)) - low + 1
 
-	def min_rate_level(self):
-		if self.depth > 0:
-			rate = self.rate_tree.min_key()
-			amount = self.get_amount_at_rate(rate)
-			return rate, amount
-		else:
-			return None
+		# dict: Fenwick index and the [count, amount, notional] sums of the keys it covers
+		self.nodes = {}
 
-	def modify(self, event):
-		# if the event's rate is already in the book, just modify the amount at the event's rate
-		rate = float(event[u'data'][u'rate'])
-		amount = float(event[u'data'][u'amount'])
-		if self.rate_exists(rate):
-			# print '~~~~~~~~~~~~~~~~~~~~~~  BID MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_dict[rate] = amount
+		# int: grid steps covered, a power of two with room for the book to drift either side of the keys
+		self.size = 1 << max(10, (4 * span).bit_length())
 
-		# only rates not already in the book reach this logic
-		# if the max depth hasn't been reached, just insert the event's rate and amount
-		elif self.depth < self.max_depth:
-			# print '~~~~~~~~~~~~~~~~~~~~~~  BID MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_tree.insert(rate, 0)
-			self.rate_dict[rate] = amount
-			self.depth += 1
-
-		# only events being handled by a full order tree reach this logic
-		# if the event is a bid and the rate is greater than min rate, effectively replace min rate level with event
-		else:
-			min_rate = self.min_rate_level()[0]
-			if rate > min_rate:
-				# print '~~~~~~~~~~~~~~~~~~~~~~  BID MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-				self.rate_tree.remove(min_rate)
-				del self.rate_dict[min_rate]
-				self.rate_tree.insert(rate, 0)
-				self.rate_dict[rate] = amount
+		# int: grid step just below the window, index 1 is grid step base + 1
+		self.base = low - (self.size - span) // 2 - 1
 
-	def remove(self, event):
-		# if the event's rate is in the book, delete it
-		rate = float(event[u'data'][u'rate'])
-		if self.rate_exists(rate):
-			# print '~~~~~~~~~~~~~~~~~~~~~~  BID REMOVE  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_tree.remove(rate)
-			del self.rate_dict[rate]
-			self.depth -= 1
+	def add(self, key, count, amount, notional):
+		"""
+		Adds <count> levels holding <amount> and <notional> at signed rate <key>, count is -1, 0 or 1.
+		Returns False, changing nothing, when <key> lies outside the window
+		"""
+		nodes = self.nodes
+		size = self.size
+		i = int(round(key * 1e8)) - self.base
+		if not 0 < i <= size:
+			return False
+		while i <= size:
+			node = nodes.get(i)
+			if node is None:
+				nodes[i] = [count, amount, notional]
+			elif node[0] + count:
+				node[0] += count
+				node[1] += amount
+				node[2] += notional
+			else:
+				# the last level under this node left, dropping it also drops any rounding its sums picked up
+				del nodes[i]
+			i += i & -i
+		return True
+
+	def first_levels(self, levels):
+		"""
+		Returns the (amount, notional) summed over the <levels> lowest keys
+		"""
+		nodes = self.nodes
+		i = count = 0
+		amount = notional = 0.0
+		step = self.size >> 1
+		while step:
+			node = nodes.get(i + step)
+			if node is None:
+				i += step
+			elif count + node[0] <= levels:
+				i += step
+				count += node[0]
+				amount += node[1]
+				notional += node[2]
+			step >>= 1
+		return amount, notional
+
+	def fill(self, amount):
+		"""
+		Returns (levels, amount, notional) summed over the longest run of lowest keys holding less than <amount>
+		"""
+		nodes = self.nodes
+		i = count = 0
+		filled = notional = 0.0
+		step = self.size >> 1
+		while step:
+			node = nodes.get(i + step)
+			if node is None:
+				i += step
+			elif filled + node[1] < amount:
+				i += step
+				count += node[0]
+				filled += node[1]
+				notional += node[2]
+			step >>= 1
+		return count, filled, notional
+
+
+class BookSide(object):
+	"""
+	A BookSide stores one side of the order book's rates and amounts with a defined depth.
+	Levels are kept in two contiguous, parallel lists ordered best level first, so the best level is always index 0,
+	trimming the worst level is a pop from the end and walking the book is a plain list iteration.
+	Rates are stored as signed keys (rate for asks, -rate for bids) so both sides sort ascending with bisect.
+	Total volume is updated on every event. Cumulative amount/notional queries are answered by a _DepthTree over the
+	signed keys: events only queue their (key, level count, amount) change, the next depth query applies the queue in
+	O(log window) per change and answers in O(log window), whatever level changed and however deep the book is.
+	The tree is rebuilt from the level lists, O(depth log window), when the book drifts out of its window or the queue
+	grows past max_depth, so a book nobody queries stays bounded.
+	"""
 
-	def __str__(self):
-		rate_tree_str = '[' + ','.join(rate[0] for rate in self.rate_tree) + ']'
-		return 'BIDS: ' + rate_tree_str
+	def __init__(self, side, max_depth, data):
+		"""
+		Initializes a book side from a public API marketOrders() call
 
+		Args:
+			side: String "bid" or "ask".
+			max_depth: Int maximum number of rate levels held.
+			data: List of [rate, amount] levels as returned by the public API.
 
-class AskBook(object):
-	"""
-	An AskBook is used to store the order book's rate and volume on the ask side with a max depth.
-	To maintain a sorted order of rates, the AskBook uses a red-black tree to store rates.
-	For O(1) query of volume at a predetermined rate, the AskBook uses a dictionary to store rate and volume.
-	"""
+		"""
+		if side not in ('bid', 'ask'):
+			raise ValueError("side must be 'bid' or 'ask'")
 
-	def __init__(self, max_depth, data):
-		# RBTree: maintains sorted order of rates
-		self.rate_tree = FastRBTree()
+		# str: "bid" or "ask"
+		self.side = side
 
-		# dict: Uses rate and volume for key value pairs
-		self.rate_dict = {}
+		# float: multiplies a rate into its sort key, bids sort on -rate so the highest bid comes first
+		self._sign = -1.0 if side == 'bid' else 1.0
 
-		# float: amounts summed across all rate levels in tree
-		self.volume = 0
+		# list: signed rate keys, ascending, best level first
+		self._keys = []
+
+		# list: amounts, parallel to _keys
+		self._amounts = []
 
-		# int: total number of rate levels in tree
-		self.depth = len(data)
+		# _DepthTree: level count, amount and notional sums by signed key, behind by the _pending changes
+		self._tree = None
 
-		# int: maximum number of rate levels in tree
+		# list: (key, level count, amount) changes not in _tree yet, None when _tree must be rebuilt from the lists
+		self._pending = None
+
+		# float: amounts summed across all rate levels in book, kept current by modify() and remove()
+		self.volume = 0
+
+		# int: maximum number of rate levels in book
 		self.max_depth = max_depth
 
-		# populate rate_tree and rate_dict from public API call data
-		# set volume
-		for level in data:
-			rate = float(level[0])
-			amount = float(level[1])
-			self.rate_tree.insert(rate, 0)
-			self.rate_dict[rate] = amount
-			self.volume += amount
+		self.load(data)
+
+	def load(self, data):
+		"""
+		Replaces the book's contents with [rate, amount] levels from a public API call
+		"""
+		sign = self._sign
+		levels = sorted((sign * float(level[0]), float(level[1])) for level in data)[:self.max_depth]
+		self._keys = [level[0] for level in levels]
+		self._amounts = [level[1] for level in levels]
+		self._pending = None
+		self.volume = sum(self._amounts)
+
+	@property
+	def depth(self):
+		# int: total number of rate levels in book
+		return len(self._keys)
 
 	def __len__(self):
-		return len(self.rate_dict)
+		return len(self._keys)
+
+	def __iter__(self):
+		"""
+		Yields (rate, amount) levels, best level first
+		"""
+		sign = self._sign
+		for key, amount in zip(self._keys, self._amounts):
+			yield sign * key, amount
+
+	def rates(self, levels=None):
+		"""
+		Returns a list of the best <levels> rates, best level first, every level if levels is None
+		"""
+		sign = self._sign
+		return [sign * key for key in self._keys[:levels]]
+
+	def amounts(self, levels=None):
+		"""
+		Returns a list of the amounts at the best <levels> rates, best level first, every level if levels is None
+		"""
+		return self._amounts[:levels]
+
+	def top(self, levels=None):
+		"""
+		Returns a tuple of the best <levels> (rate, amount) levels, best level first, a copy the book never touches again
+		"""
+		sign = self._sign
+		return tuple((sign * key, amount) for key, amount in zip(self._keys[:levels], self._amounts[:levels]))
+
+	def _index(self, rate):
+		key = self._sign * rate
+		i = bisect_left(self._keys, key)
+		if i < len(self._keys) and self._keys[i] == key:
+			return i
+		return -1
 
 	def rate_exists(self, rate):
-		return rate in self.rate_dict
+		return self._index(rate) >= 0
 
 	def get_amount_at_rate(self, rate):
-		return self.rate_dict.get(rate)
-
-	def max_rate_level(self):
-		if self.depth > 0:
-			rate = self.rate_tree.max_key()
-			amount = self.get_amount_at_rate(rate)
-			return rate, amount
+		i = self._index(rate)
+		if i >= 0:
+			return self._amounts[i]
+		return None
+
+	def best_level(self):
+		if self._keys:
+			return self._sign * self._keys[0], self._amounts[0]
 		else:
 			return None
 
-	def min_rate_level(self):
-		if self.depth > 0:
-			rate = self.rate_tree.min_key()
-			amount = self.get_amount_at_rate(rate)
-			return rate, amount
+	def worst_level(self):
+		if self._keys:
+			return self._sign * self._keys[-1], self._amounts[-1]
 		else:
 			return None
 
+	def max_rate_level(self):
+		return self.best_level() if self.side == 'bid' else self.worst_level()
+
+	def min_rate_level(self):
+		return self.worst_level() if self.side == 'bid' else self.best_level()
+
 	def modify(self, event):
 		rate = float(event[u'data'][u'rate'])
 		amount = float(event[u'data'][u'amount'])
-		# if the event's rate is already in the book, just modify the volume at the event's rate
-		if self.rate_exists(rate):
-			# print '~~~~~~~~~~~~~~~~~~~~~~  ASK MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_dict[rate] = amount
+		keys = self._keys
+		key = self._sign * rate
+		i = bisect_left(keys, key)
+		pending = self._pending
+
+		# if the event's rate is already in the book, just modify the amount at the event's rate
+		if i < len(keys) and keys[i] == key:
+			change = amount - self._amounts[i]
+			self.volume += change
+			self._amounts[i] = amount
+			if pending is not None:
+				pending.append((key, 0, change))
 
 		# only rates not already in the book reach this logic
-		# if the max depth hasn't been reached, just insert the event's rate and volume
-		elif self.depth < self.max_depth:
-			# print '~~~~~~~~~~~~~~~~~~~~~~  ASK MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_tree.insert(rate, 0)
-			self.rate_dict[rate] = amount
-			self.depth += 1
-
-		# only events being handled by a full order tree reach this logic
-		# if the event is an ask and the rate is less than max rate, effectively replace min rate level with event
+		# if the max depth hasn't been reached, just insert the event's rate and amount
+		elif len(keys) < self.max_depth:
+			keys.insert(i, key)
+			self._amounts.insert(i, amount)
+			self.volume += amount
+			if pending is not None:
+				pending.append((key, 1, amount))
+
+		# only events being handled by a full book reach this logic
+		# if the event's rate is better than the worst level, effectively replace the worst level with the event
+		elif i < len(keys):
+			worst_key = keys.pop()
+			worst_amount = self._amounts.pop()
+			self.volume += amount - worst_amount
+			keys.insert(i, key)
+			self._amounts.insert(i, amount)
+			if pending is not None:
+				pending.append((worst_key, -1, -worst_amount))
+				pending.append((key, 1, amount))
+
 		else:
-			max_rate = self.max_rate_level()[0]
-			if rate < max_rate:
-				# print '~~~~~~~~~~~~~~~~~~~~~~  ASK MODIFY  ~~~~~~~~~~~~~~~~~~~~~~'
-				self.rate_tree.remove(max_rate)
-				del self.rate_dict[max_rate]
-				self.rate_tree.insert(rate, 0)
-				self.rate_dict[rate] = amount
+			return
+
+		if pending is not None and len(pending) > self.max_depth:
+			self._pending = None
 
 	def remove(self, event):
 		# if the event's rate is in the book, delete it
-		rate = float(event[u'data'][u'rate'])
-		if self.rate_exists(rate):
-			# print '~~~~~~~~~~~~~~~~~~~~~~  ASK REMOVE  ~~~~~~~~~~~~~~~~~~~~~~'
-			self.rate_tree.remove(rate)
-			del self.rate_dict[rate]
-			self.depth -= 1
+		i = self._index(float(event[u'data'][u'rate']))
+		if i >= 0:
+			key = self._keys.pop(i)
+			amount = self._amounts.pop(i)
+			self.volume -= amount
+			if not self._keys:
+				self.volume = 0
+			pending = self._pending
+			if pending is not None:
+				pending.append((key, -1, -amount))
+				if len(pending) > self.max_depth:
+					self._pending = None
+
+	def _refresh(self):
+		"""
+		Brings the depth tree up to date, applying the queued changes or rebuilding it from the level lists
+		"""
+		pending = self._pending
+		sign = self._sign
+		if pending:
+			tree = self._tree
+			for key, count, amount in pending:
+				if not tree.add(key, count, amount, sign * key * amount):
+					# the book drifted out of the tree's window
+					pending = None
+					break
+			else:
+				del pending[:]
+		if pending is None:
+			keys = self._keys
+			self._tree = tree = _DepthTree(keys[0], keys[-1]) if keys else _DepthTree(0.0, 0.0)
+			for key, amount in zip(keys, self._amounts):
+				tree.add(key, 1, amount, sign * key * amount)
+			self._pending = []
+
+	def cumulative_amount(self, levels):
+		"""
+		Returns the amount held in the best <levels> rate levels
+		"""
+		if levels <= 0 or not self._keys:
+			return 0.0
+		self._refresh()
+		return self._tree.first_levels(levels)[0]
+
+	def amount_within(self, fraction):
+		"""
+		Returns the amount available at rates within <fraction> (0.01 = 1%) of the best rate
+		"""
+		if not self._keys:
+			return 0.0
+		self._refresh()
+		best_rate = self._sign * self._keys[0]
+		limit = best_rate * (1 - fraction) if self.side == 'bid' else best_rate * (1 + fraction)
+		i = bisect_right(self._keys, self._sign * limit)
+		return self._tree.first_levels(i)[0] if i else 0.0
+
+	def price_to_fill(self, amount):
+		"""
+		Returns the average rate paid to fill <amount> against this side, None if the book is too thin
+		"""
+		fill = self._fill(amount)
+		if fill is None:
+			return None
+		i, filled, notional = fill
+		return (notional + (amount - filled) * self._sign * self._keys[i]) / amount
+
+	def rate_to_fill(self, amount):
+		"""
+		Returns the worst rate reached while filling <amount> against this side, None if the book is too thin
+		"""
+		fill = self._fill(amount)
+		if fill is None:
+			return None
+		return self._sign * self._keys[fill[0]]
+
+	def _fill(self, amount):
+		"""
+		Returns (index of the level completing <amount>, amount and notional of the levels before it), None if too thin
+		"""
+		if amount <= 0:
+			raise ValueError('amount must be positive')
+		self._refresh()
+		fill = self._tree.fill(amount)
+		if fill[0] >= len(self._keys):
+			return None
+		return fill
 
 	def __str__(self):
-		rate_tree_str = '[' + ','.join(rate[0] for rate in reversed(self.rate_tree)) + ']'
-		return 'ASKS: ' + rate_tree_str
+		rates_str = '[' + ','.join(str(level[0]) for level in reversed(list(self))) + ']'
+		return ('BIDS: ' if self.side == 'bid' else 'ASKS: ') + rates_str
+
+
+class BidBook(BookSide):
+	"""
+	A BidBook is the bid side of the order book, max_rate_level() is its best level.
+	"""
+
+	def __init__(self, max_depth, data):
+		BookSide.__init__(self, 'bid', max_depth, data)
+
+
+class AskBook(BookSide):
+	"""
+	An AskBook is the ask side of the order book, min_rate_level() is its best level.
+	"""
+
+	def __init__(self, max_depth, data):
+		BookSide.__init__(self, 'ask', max_depth, data)
+
+
+class _TradeWindow(object):
+	"""
+	Running sums over the trades of the last <seconds>, advanced one trade at a time as trades enter and expire.
+	"""
+
+	__slots__ = ('seconds', 'tail', 'count', 'amount', 'total', 'buy_amount', 'sell_amount')
+
+	def __init__(self, seconds, tail):
+		self.seconds = seconds
+		# int: absolute index of the oldest trade still inside the window
+		self.tail = tail
+		self.count = 0
+		self.amount = 0.0
+		self.total = 0.0
+		self.buy_amount = 0.0
+		self.sell_amount = 0.0
 
 
 class TradeBook(object):
 	"""
 	A TradeBook is used to store the most recent completed trades with a max depth.
-	A trade_deque is used to chronologically store tradeIDs, makes removing old trades and adding new trades O(1).
-	The trade_deque goes oldest to newest from left to right.
-	A trade_dict is used to support querying from rates in the tree to the corresponding indexes in the deque.
+	Trades live in a fixed capacity ring buffer of typed arrays (tradeID, timestamp, rate, amount, total, side),
+	so a new trade overwrites the oldest slot in place with no per trade object allocation.
+	Rolling windows keep running sums that are updated as trades enter and expire, so VWAP, buy/sell volume and
+	trade count over a window cost O(1) per trade. A window only covers the trades still held in the buffer, size
+	max_depth for the trade rate of the longest window, window_stats() reports 'truncated' when it falls short.
 	"""
 
-	def __init__(self, max_depth, data):
-		# deque: maintains chronological order of trades
-		self.trade_deque = deque(maxlen=max_depth)
-
-		# dict: Uses tradeID and data for key value pairs
-		self.trade_dict = {}
-
-		# populate trade_deque and trade_dict from public API call data
-		# set volume
-		for trade in (reversed(data[0:max_depth])):
-			# global_trade_id = trade[u'globalTradeID'].encode('ascii', 'ignore')
-			trade_id = trade[u'tradeID']
-			timestamp = dateutil.parser.parse(trade[u'date'].encode('ascii', 'ignore'))
-			rate = float(trade[u'rate'])
-			# key u'amount' contains volume of second member of pair
-			# for ex., if pair = 'BTC_ETH', then u'amount' corresponds with amount of ETH in trade
-			amount = float(trade[u'amount'])
-			total = float(trade[u'total'])
-			trade_type = trade[u'type'].encode('ascii', 'ignore')
-
-			self.trade_deque.append(trade_id)
-			self.trade_dict[trade_id] = {'timestamp': timestamp, 'rate': rate, 'amount': amount, 'total': total, 'type': trade_type}
+	def __init__(self, max_depth, data, windows=(60.0, 300.0)):
+		"""
+		Initializes a trade book from a public API marketTradeHist() call
+
+		Args:
+			max_depth: Int number of trades held.
+			data: List of trade dicts as returned by the public API, newest first.
+			windows: Sequence of rolling window lengths in seconds.
+
+		"""
+		# int: capacity of the ring buffer
+		self.max_depth = max_depth
+
+		# arrays: one column per trade field, slot = absolute index % max_depth
+		self._ids = array('q', bytes(8 * max_depth))
+		self._timestamps = array('d', bytes(8 * max_depth))
+		self._rates = array('d', bytes(8 * max_depth))
+		self._amounts = array('d', bytes(8 * max_depth))
+		self._totals = array('d', bytes(8 * max_depth))
+		# 1 for buy, -1 for sell
+		self._sides = array('b', bytes(max_depth))
+
+		# int: absolute index the next trade is written to, also the number of trades ever added
+		self._next = 0
+
+		# dict: tradeID and absolute index key value pairs for trades still in the buffer
+		self._slots = {}
+
+		# float: rate of the most recent trade, None until a trade arrives
+		self.last_rate = None
+
+		# float: timestamp of the last trade overwritten in the ring buffer, None until the buffer wraps
+		self._dropped_timestamp = None
+
+		# dict: window length and _TradeWindow key value pairs
+		self._windows = {}
+
+		# populate ring buffer from public API call data, oldest first
+		for trade in reversed(data[0:max_depth]):
+			timestamp = calendar.timegm(time.strptime(trade[u'date'], '%Y-%m-%d %H:%M:%S'))
+			self.add_trade(trade[u'tradeID'], timestamp, trade[u'rate'], trade[u'amount'], trade[u'total'],
+						   trade[u'type'])
+
+		for seconds in windows:
+			self.add_window(seconds)
 
 	def __len__(self):
-		return len(self.trade_dict)
+		return min(self._next, self.max_depth)
 
 	def trade_exists(self, trade_id):
-		return trade_id in self.trade_dict
+		return int(trade_id) in self._slots
 
 	def get_trade_at_id(self, trade_id):
-		return self.trade_dict.get(trade_id)
+		index = self._slots.get(int(trade_id))
+		if index is None:
+			return None
+		slot = index % self.max_depth
+		return {'timestamp': datetime.datetime.utcfromtimestamp(self._timestamps[slot]), 'rate': self._rates[slot],
+				'amount': self._amounts[slot], 'total': self._totals[slot],
+				'type': 'buy' if self._sides[slot] > 0 else 'sell'}
 
-	def new_trade(self, event):
-		timestamp = datetime.datetime.utcnow()
-		trade_id = event[u'data'][u'tradeID']
-		rate = float(event[u'data'][u'rate'])
-		amount = float(event[u'data'][u'amount'])
-		total = float(event[u'data'][u'total'])
-		trade_type = event[u'data'][u'rate'].encode('ascii', 'ignore')
-		if len(self) < self.trade_deque.maxlen:
-			# print '~~~~~~~~~~~~~~~~~~~~~~~~  TRADE  ~~~~~~~~~~~~~~~~~~~~~~~~'
-			self.trade_deque.append(trade_id)
-			self.trade_dict[trade_id] =  {'timestamp': timestamp, 'rate': rate, 'amount': amount, 'total': total, 'type': trade_type}
-		elif len(self) == self.trade_deque.maxlen:
-			# print '~~~~~~~~~~~~~~~~~~~~~~  TRADE  ~~~~~~~~~~~~~~~~~~~~~~'
-			oldest_id = self.trade_deque.popleft()
-			del self.trade_dict[oldest_id]
-			self.trade_deque.append(trade_id)
-			self.trade_dict[trade_id] = {'timestamp': timestamp, 'rate': rate, 'amount': amount, 'total': total, 'type': trade_type}
+	def new_trade(self, event, timestamp=None):
+		"""
+		Adds a newTrade stream event, stamped with <timestamp> (epoch seconds) or the time of receipt
+		"""
+		data = event[u'data']
+		if timestamp is None:
+			timestamp = time.time()
+		self.add_trade(data[u'tradeID'], timestamp, data[u'rate'], data[u'amount'], data[u'total'], data[u'type'])
+
+	def add_trade(self, trade_id, timestamp, rate, amount, total, trade_type):
+		trade_id = int(trade_id)
+		if trade_id in self._slots:
+			return
+		index = self._next
+		slot = index % self.max_depth
+		if index >= self.max_depth:
+			# the oldest trade is about to be overwritten, it leaves every window still holding it
+			oldest = index - self.max_depth
+			for window in self._windows.values():
+				if window.tail == oldest:
+					self._expire_oldest(window)
+			del self._slots[self._ids[slot]]
+			self._dropped_timestamp = self._timestamps[slot]
+
+		rate = float(rate)
+		amount = float(amount)
+		side = 1 if trade_type == 'buy' else -1
+		self._ids[slot] = trade_id
+		self._timestamps[slot] = timestamp
+		self._rates[slot] = rate
+		self._amounts[slot] = amount
+		self._totals[slot] = float(total)
+		self._sides[slot] = side
+		self._slots[trade_id] = index
+		self._next = index + 1
+		self.last_rate = rate
+
+		for window in self._windows.values():
+			window.count += 1
+			window.amount += amount
+			window.total += self._totals[slot]
+			if side > 0:
+				window.buy_amount += amount
+			else:
+				window.sell_amount += amount
+			self._expire(window, timestamp)
+
+	def add_window(self, seconds):
+		"""
+		Starts maintaining a rolling window of <seconds>, seeded from the trades already held
+		"""
+		window = _TradeWindow(seconds, max(0, self._next - self.max_depth))
+		self._windows[seconds] = window
+		for index in range(window.tail, self._next):
+			slot = index % self.max_depth
+			window.count += 1
+			window.amount += self._amounts[slot]
+			window.total += self._totals[slot]
+			if self._sides[slot] > 0:
+				window.buy_amount += self._amounts[slot]
+			else:
+				window.sell_amount += self._amounts[slot]
+		if self._next:
+			self._expire(window, self._timestamps[(self._next - 1) % self.max_depth])
+
+	def _expire(self, window, now):
+		cutoff = now - window.seconds
+		timestamps = self._timestamps
+		while window.tail < self._next and timestamps[window.tail % self.max_depth] < cutoff:
+			self._expire_oldest(window)
+
+	def _expire_oldest(self, window):
+		slot = window.tail % self.max_depth
+		amount = self._amounts[slot]
+		window.count -= 1
+		window.amount -= amount
+		window.total -= self._totals[slot]
+		if self._sides[slot] > 0:
+			window.buy_amount -= amount
+		else:
+			window.sell_amount -= amount
+		window.tail += 1
+		if window.count == 0:
+			window.amount = window.total = window.buy_amount = window.sell_amount = 0.0
+
+	def window_stats(self, seconds, now=None):
+		"""
+		Returns a dict of rolling statistics over the last <seconds>, measured back from <now> if given,
+		else from the most recent trade. 'truncated' is True when trades inside the window were already overwritten
+		in the ring buffer, so the statistics only cover its newest max_depth trades.
+		"""
+		window = self._windows[seconds]
+		if now is not None:
+			self._expire(window, now)
+		else:
+			now = self._timestamps[(self._next - 1) % self.max_depth] if self._next else 0.0
+		truncated = self._dropped_timestamp is not None and self._dropped_timestamp >= now - seconds
+		return {'count': window.count,
+				'volume': window.amount,
+				'total': window.total,
+				'buy_volume': window.buy_amount,
+				'sell_volume': window.sell_amount,
+				'vwap': window.total / window.amount if window.amount else None,
+				'last_rate': self.last_rate,
+				'truncated': truncated}
+
+	def vwap(self, seconds, now=None):
+		return self.window_stats(seconds, now)['vwap']
+
+	def columns(self, last=None):
+		"""
+		Returns the (tradeID, timestamp, rate, amount, total, side) typed arrays, oldest first, side 1 buy -1 sell,
+		of every trade held or only the <last> ones
+		"""
+		start = self._next % self.max_depth if self._next > self.max_depth else 0
+		end = min(self._next, self.max_depth)
+		skip = max(0, end - last) if last is not None else 0
+		return tuple((column[start:end] + column[:start])[skip:] for column in
+					 (self._ids, self._timestamps, self._rates, self._amounts, self._totals, self._sides))
+
+	def __iter__(self):
+		"""
+		Yields (tradeID, timestamp, rate, amount, total, type) tuples, oldest first
+		"""
+		for index in range(max(0, self._next - self.max_depth), self._next):
+			slot = index % self.max_depth
+			yield (self._ids[slot], self._timestamps[slot], self._rates[slot], self._amounts[slot],
+				   self._totals[slot], 'buy' if self._sides[slot] > 0 else 'sell')
 
 	def __str__(self):
-		deque_str = '[' + ','.join(trade for trade in self.trade_deque) + ']'
-		return 'TRADES: ' + deque_str
\ No newline at end of file
+		return 'TRADES: [' + ','.join(str(trade[0]) for trade in self) + ']'
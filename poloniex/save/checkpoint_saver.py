@@ -0,0 +1,162 @@
+from poloniex.construct.dispatch import Dispatcher
+from poloniex.model import columnar
+from poloniex.model.checkpoint_library import CheckpointLibrary, epoch
+
+from threading import Thread
+import numpy as np
+import queue
+
+# DELTA_DTYPE side codes
+BID = 1
+ASK = -1
+
+# DELTA_DTYPE amount of a removed level
+REMOVED = -1.0
+
+
+class _PairState(object):
+
+	__slots__ = ('checkpoint_id', 'checkpoint_time', 'chunk', 'pending')
+
+	def __init__(self):
+		self.checkpoint_id = None
+		self.checkpoint_time = None
+		self.chunk = 0
+		self.pending = []
+
+
+class CheckpointWriter(object):
+	"""
+	Writes a CheckpointLibrary from live or replayed Wizards: a full bid/ask checkpoint every <interval> seconds and,
+	in between, every level change applied to the books in delta chunks of up to <batch_size> changes.
+	Register it on each wizard with writer.subscribe(wizard), or as a Replay callback.
+	Documents are built on the calling thread, where the books are consistent, and stored by a background thread so
+	the stream reader never waits on Mongo. A resync reloading the books from a snapshot replaces them wholesale, the
+	wizard reports it with tick None and a new checkpoint is taken right away.
+	"""
+
+	def __init__(self, library, interval=60.0, batch_size=5000, flush_interval=5.0, compress=True):
+		"""
+		Args:
+			library: CheckpointLibrary.
+			interval: Float seconds of tick time between checkpoints.
+			batch_size: Int level changes per delta chunk.
+			flush_interval: Float maximum seconds of tick time a change waits before its chunk is written.
+			compress: Bool zlib compression of checkpoint and delta arrays.
+
+		"""
+		self.library = library
+		self.interval = interval
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.compress = compress
+
+		# dict: pair and _PairState key value pairs
+		self._pairs = {}
+		self._queue = queue.Queue()
+
+		# Dispatcher: calls on_tick() on the stream thread, while the books are as the tick left them
+		self.dispatcher = Dispatcher('checkpoint-writer', threaded=False)
+
+		# counters for monitoring
+		self.checkpoints = 0
+		self.chunks = 0
+		self.deltas = 0
+		self.failed_writes = 0
+
+		self._writerT = Thread(target=self._run)
+		self._writerT.daemon = True
+		self._writerT.start()
+
+	def subscribe(self, wizard):
+		"""
+		Records every tick applied to <wizard> and every resync, returns the Subscription
+		"""
+		return wizard.on_tick_applied(self.on_tick, dispatcher=self.dispatcher, coalesce=False)
+
+	def on_tick(self, wizard, tick):
+		"""
+		Tick listener, records the level changes <tick> just applied to <wizard>'s books, or checkpoints the books
+		reloaded by a resync if <tick> is None
+		"""
+		state = self._pairs.get(wizard.pair)
+		if state is None:
+			state = self._pairs[wizard.pair] = _PairState()
+
+		if tick is None:
+			# the deltas so far don't lead to the reloaded books
+			self._flush(wizard.pair, state)
+			self._checkpoint(wizard, wizard.snapshot().timestamp, wizard.sequence, state)
+			return
+
+		timestamp = epoch(tick.timestamp)
+		if state.checkpoint_id is None or timestamp - state.checkpoint_time >= self.interval:
+			# the checkpoint is taken after this tick, so its changes are already in it
+			self._flush(wizard.pair, state)
+			# wizard.sequence only moves to the tick's once its listeners have run
+			self._checkpoint(wizard, tick.timestamp, tick.sequence if tick.sequence is not None else wizard.sequence,
+							 state)
+			return
+
+		pending = state.pending
+		for side, events in ((BID, tick.bid_arr), (ASK, tick.ask_arr)):
+			for event in events:
+				data = event[u'data']
+				if event[u'type'] == 'orderBookRemove':
+					pending.append((timestamp, side, float(data[u'rate']), REMOVED))
+				else:
+					pending.append((timestamp, side, float(data[u'rate']), float(data[u'amount'])))
+
+		if pending and (len(pending) >= self.batch_size or timestamp - pending[0][0] >= self.flush_interval):
+			self._flush(wizard.pair, state)
+
+	def _checkpoint(self, wizard, timestamp, sequence, state):
+		doc = CheckpointLibrary.checkpoint_doc(wizard.pair, timestamp, sequence, wizard.bid_book,
+											   wizard.ask_book, self.compress)
+		state.checkpoint_id = doc['_id']
+		state.checkpoint_time = epoch(timestamp)
+		state.chunk = 0
+		self.checkpoints += 1
+		self._queue.put((self.library.store_checkpoint, doc))
+
+	def _flush(self, pair, state):
+		if not state.pending:
+			return
+		deltas = np.array(state.pending, dtype=columnar.DELTA_DTYPE)
+		state.pending = []
+		doc = CheckpointLibrary.delta_doc(pair, state.checkpoint_id, state.chunk, deltas, self.compress)
+		state.chunk += 1
+		self.chunks += 1
+		self.deltas += len(deltas)
+		self._queue.put((self.library.store_deltas, doc))
+
+	def flush(self):
+		"""
+		Queues every pending change for writing, call from the thread feeding on_tick()
+		"""
+		for pair, state in self._pairs.items():
+			self._flush(pair, state)
+
+	def stats(self):
+		return {'checkpoints': self.checkpoints, 'chunks': self.chunks, 'deltas': self.deltas,
+				'queued': self._queue.qsize(), 'failed_writes': self.failed_writes}
+
+	def close(self, timeout=None):
+		"""
+		Flushes pending changes, waits for every queued document to be stored and joins the writer thread
+		"""
+		self.flush()
+		self._queue.put(None)
+		self._writerT.join(timeout)
+
+	def _run(self):
+		while True:
+			item = self._queue.get()
+			if item is None:
+				return
+			store, doc = item
+			try:
+				store(doc)
+			except Exception as e:
+				self.failed_writes += 1
+				print('CHECKPOINT: write for {0} failed: {1}'.format(doc['pair'], e))
@@ -0,0 +1,315 @@
+from poloniex.model.wizard_build import Tick
+
+from bisect import bisect_left
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# record header: payload length, receipt timestamp, sequence, crc32 of timestamp + sequence + payload
+HEADER = struct.Struct('<IdqI')
+# sparse index entry: timestamp, sequence, offset of the record in its segment
+INDEX_ENTRY = struct.Struct('<dqQ')
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+
+# sequence stored for ticks that carry none
+NO_SEQUENCE = -1
+
+
+def _crc(timestamp, sequence, payload):
+	return zlib.crc32(payload, zlib.crc32(struct.pack('<dq', timestamp, sequence))) & 0xffffffff
+
+
+def _segment_paths(directory):
+	"""
+	Returns (segment path, index path) pairs in order, segment files are named by their zero padded number
+	"""
+	names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+	return [(os.path.join(directory, name), os.path.join(directory, name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX))
+			for name in names]
+
+
+def _read_index(index_path):
+	if not os.path.exists(index_path):
+		return []
+	with open(index_path, 'rb') as f:
+		data = f.read()
+	count = len(data) // INDEX_ENTRY.size
+	return [INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size) for i in range(count)]
+
+
+def _scan(buf, offset, end):
+	"""
+	Yields (offset, timestamp, sequence, payload start, payload end) for every intact record from <offset>,
+	stopping at the first torn or corrupt one
+	"""
+	while offset + HEADER.size <= end:
+		length, timestamp, sequence, crc = HEADER.unpack_from(buf, offset)
+		start = offset + HEADER.size
+		if start + length > end or _crc(timestamp, sequence, buf[start:start + length]) != crc:
+			return
+		yield offset, timestamp, sequence, start, start + length
+		offset = start + length
+
+
+def _last_timestamp(buf, index):
+	"""
+	Returns the timestamp of the last intact record in <buf>, scanned from its last index entry, None if it holds none
+	"""
+	timestamp = None
+	for _, timestamp, _, _, _ in _scan(buf, index[-1][2] if index else 0, len(buf)):
+		pass
+	return timestamp
+
+
+class JournalRecord(object):
+	"""
+	A JournalRecord is one tick as stored in the journal.
+	timestamp and sequence are read straight from the header, payload is a memoryview into the mapped segment, so
+	nothing is copied or parsed until tick() is called.
+	"""
+
+	__slots__ = ('timestamp', 'sequence', 'payload')
+
+	def __init__(self, timestamp, sequence, payload):
+		self.timestamp = timestamp
+		self.sequence = sequence
+		self.payload = payload
+
+	def tick(self):
+		"""
+		Decodes the payload into a Tick
+		"""
+		return Tick(self.payload.tobytes())
+
+
+class JournalWriter(object):
+	"""
+	Append-only tick journal for one stream: length prefixed, checksummed records in numbered segment files, each
+	with a sparse index of (timestamp, sequence, offset) written every <index_interval> records.
+	On open, the tail of the last segment is scanned from its last index entry and cut back to the last intact
+	record, so a crash mid-write loses at most the torn record.
+	Appends are flushed every <flush_records> records or <flush_seconds> seconds, whichever comes first, so a crash
+	of the process loses at most that much of the tail.
+	"""
+
+	def __init__(self, directory, segment_size=64 * 1024 * 1024, index_interval=64, fsync=False, flush_records=1024,
+				 flush_seconds=1.0):
+		"""
+		Args:
+			directory: String directory holding the segments, created if missing.
+			segment_size: Int bytes after which a new segment is started.
+			index_interval: Int records between sparse index entries.
+			fsync: Bool to fsync on every flush(), at the cost of write latency.
+			flush_records: Int appends after which the journal is flushed.
+			flush_seconds: Float seconds after which an append flushes the journal.
+
+		"""
+		self.directory = directory
+		self.segment_size = segment_size
+		self.index_interval = index_interval
+		self.fsync = fsync
+		self.flush_records = flush_records
+		self.flush_seconds = flush_seconds
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self._segment = None
+		self._index = None
+		self._segment_number = 0
+		self._offset = 0
+		self._records = 0
+		self._last_timestamp = 0.0
+		# int: appends since the last flush, and float: time.monotonic() of the last flush
+		self._unflushed = 0
+		self._flushed_at = time.monotonic()
+		self._recover()
+
+	def _recover(self):
+		paths = _segment_paths(self.directory)
+		if not paths:
+			self._open_segment(0)
+			return
+
+		segment_path, index_path = paths[-1]
+		self._segment_number = int(os.path.basename(segment_path)[:-len(SEGMENT_SUFFIX)])
+		size = os.path.getsize(segment_path)
+		index = [entry for entry in _read_index(index_path) if entry[2] < size]
+		offset = index[-1][2] if index else 0
+		records = (len(index) - 1) * self.index_interval if index else 0
+
+		with open(segment_path, 'rb') as f:
+			buf = f.read()
+		end = offset
+		last_timestamp = None
+		for end_offset, last_timestamp, sequence, start, stop in _scan(buf, offset, len(buf)):
+			end = stop
+			records += 1
+
+		if end < size:
+			print('JOURNAL: truncating {0} torn bytes from {1}'.format(size - end, segment_path))
+		# an entry pointing at the torn record goes too, the next append at that count writes it again
+		index = [entry for entry in index if entry[2] < end]
+
+		# nothing intact after the last index entry: the last record is further back, in this segment or an earlier one,
+		# and new records must not be timestamped before it
+		if last_timestamp is None:
+			last_timestamp = _last_timestamp(buf[:end], index)
+		for earlier_segment, earlier_index in reversed(paths[:-1]):
+			if last_timestamp is not None:
+				break
+			with open(earlier_segment, 'rb') as f:
+				earlier = f.read()
+			last_timestamp = _last_timestamp(earlier, [entry for entry in _read_index(earlier_index)
+														if entry[2] < len(earlier)])
+		if last_timestamp is not None:
+			self._last_timestamp = last_timestamp
+		with open(segment_path, 'r+b') as f:
+			f.truncate(end)
+		with open(index_path, 'r+b' if os.path.exists(index_path) else 'wb') as f:
+			f.truncate(len(index) * INDEX_ENTRY.size)
+
+		self._segment = open(segment_path, 'ab')
+		self._index = open(index_path, 'ab')
+		self._offset = end
+		self._records = records
+
+	def _open_segment(self, number):
+		if self._segment is not None:
+			self.flush()
+			self._segment.close()
+			self._index.close()
+		self._segment_number = number
+		name = os.path.join(self.directory, '{0:010d}'.format(number))
+		self._segment = open(name + SEGMENT_SUFFIX, 'ab')
+		self._index = open(name + INDEX_SUFFIX, 'ab')
+		self._offset = 0
+		self._records = 0
+
+	def on_event(self, topic, args, kwargs):
+		"""
+		StreamClient handler, subscribe it next to a pair's Wizard: stream.subscribe(pair, journal.on_event)
+		"""
+		self.append(args, kwargs)
+
+	def append(self, args, kwargs, timestamp=None):
+		"""
+		Appends one stream tick, framed as Tick.encode() does
+		"""
+		if timestamp is None:
+			timestamp = time.time()
+		payload = Tick.encode(args, kwargs, timestamp).rstrip('\n').encode('utf-8')
+		sequence = kwargs.get(u'seq')
+		self.append_payload(payload, timestamp, NO_SEQUENCE if sequence is None else sequence)
+
+	def append_payload(self, payload, timestamp, sequence):
+		# timestamps never go backwards inside the journal, the sparse index relies on it
+		timestamp = max(timestamp, self._last_timestamp)
+		self._last_timestamp = timestamp
+
+		if self._offset and self._offset + HEADER.size + len(payload) > self.segment_size:
+			self._open_segment(self._segment_number + 1)
+
+		if self._records % self.index_interval == 0:
+			self._index.write(INDEX_ENTRY.pack(timestamp, sequence, self._offset))
+		self._segment.write(HEADER.pack(len(payload), timestamp, sequence, _crc(timestamp, sequence, payload)))
+		self._segment.write(payload)
+		self._offset += HEADER.size + len(payload)
+		self._records += 1
+
+		self._unflushed += 1
+		if self._unflushed >= self.flush_records or time.monotonic() - self._flushed_at >= self.flush_seconds:
+			self.flush()
+
+	def flush(self):
+		self._segment.flush()
+		self._index.flush()
+		if self.fsync:
+			os.fsync(self._segment.fileno())
+			os.fsync(self._index.fileno())
+		self._unflushed = 0
+		self._flushed_at = time.monotonic()
+
+	def close(self):
+		self.flush()
+		self._segment.close()
+		self._index.close()
+
+
+class JournalReader(object):
+	"""
+	Reads a journal written by JournalWriter by memory mapping its segments.
+	Seeking to a time or sequence is a bisect over the segments' first index entries, then over the sparse index
+	of one segment, to the last entry before the start, followed by a scan forward from there.
+	Timestamps never go backwards in a journal, sequences can: ticks without one are stored as NO_SEQUENCE and a
+	reconnected stream may restart them. A journal whose indexed sequences are not sorted is read from its first
+	record to seek to a sequence.
+	Records hold memoryviews into the maps, call close() only once they are no longer used.
+	"""
+
+	def __init__(self, directory):
+		self.directory = directory
+		self._segments = []
+		for segment_path, index_path in _segment_paths(directory):
+			if os.path.getsize(segment_path) == 0:
+				continue
+			with open(segment_path, 'rb') as f:
+				mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			index = _read_index(index_path) or [(0.0, NO_SEQUENCE, 0)]
+			self._segments.append((mapped, index))
+
+		# bool: every indexed sequence is a real one and none goes backwards, so sequence seeks can bisect the index
+		sequences = [entry[1] for _, index in self._segments for entry in index]
+		self._sequences_sorted = all(0 <= sequences[i] <= sequences[i + 1] for i in range(len(sequences) - 1))
+
+	def _start(self, key, value):
+		"""
+		Returns (segment number, offset) of the last indexed record with entry[key] < value, or of the first record.
+		Records sharing a key can span index entries and segments, so seeking stops before the first of them.
+		"""
+		firsts = [index[0][key] for _, index in self._segments]
+		segment = max(0, bisect_left(firsts, value) - 1)
+		index = self._segments[segment][1]
+		position = max(0, bisect_left([entry[key] for entry in index], value) - 1)
+		return segment, index[position][2]
+
+	def read(self, start_time=None, end_time=None, start_sequence=None):
+		"""
+		Yields JournalRecords in order, from the first record at or after <start_time> (or <start_sequence>) up to,
+		but excluding, <end_time>
+		"""
+		if not self._segments:
+			return
+		if start_time is not None:
+			segment, offset = self._start(0, start_time)
+		elif start_sequence is not None and self._sequences_sorted:
+			segment, offset = self._start(1, start_sequence)
+		else:
+			segment, offset = 0, 0
+
+		# once the first record is found everything after it is read, later sequences may well be lower
+		started = start_time is None and start_sequence is None
+		for mapped, _ in self._segments[segment:]:
+			view = memoryview(mapped)
+			for _, timestamp, sequence, start, stop in _scan(view, offset, len(mapped)):
+				if not started:
+					if start_time is not None and timestamp < start_time:
+						continue
+					if start_sequence is not None and sequence < start_sequence:
+						continue
+					started = True
+				if end_time is not None and timestamp >= end_time:
+					return
+				yield JournalRecord(timestamp, sequence, view[start:stop])
+			offset = 0
+
+	def __iter__(self):
+		return self.read()
+
+	def close(self):
+		for mapped, _ in self._segments:
+			mapped.close()
+		self._segments = []
@@ -0,0 +1,120 @@
+from poloniex.model.raw_library import RawData
+
+from threading import Lock, Thread
+import queue
+import time
+
+
+class RawTickWriter(object):
+	"""
+	Captures every raw stream tick into a RawDataLibrary without ever blocking the stream reader.
+	on_event() only timestamps the tick and puts it on a bounded in-memory queue. A background thread drains the
+	queue and persists ticks with one store_many() (insert_many) per batch, flushing when <batch_size> ticks are
+	waiting or <flush_interval> seconds have passed. When Mongo falls behind and the queue is full, new ticks are
+	dropped and counted rather than stalling the reader.
+	"""
+
+	def __init__(self, library, max_queue=100000, batch_size=1000, flush_interval=1.0):
+		"""
+		Args:
+			library: RawDataLibrary, or anything with a store_many(list of RawData) method.
+			max_queue: Int maximum ticks held in memory waiting to be written.
+			batch_size: Int ticks written per insert_many.
+			flush_interval: Float maximum seconds a tick waits before its batch is flushed.
+
+		"""
+		self.library = library
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self._queue = queue.Queue(max_queue)
+		self._stopped = False
+
+		# counters for monitoring capture health
+		self.received = 0
+		self.written = 0
+		self.dropped = 0
+		self.flushes = 0
+		# Lock: dropped is counted by both the reader calling write() and the writer thread
+		self._dropped_lock = Lock()
+		self.failed_flushes = 0
+
+		# float: seconds between receipt of the oldest tick in the last batch and that batch being written
+		self.last_lag = 0.0
+		self.max_lag = 0.0
+
+		self._writerT = Thread(target=self._run)
+		self._writerT.daemon = True
+		self._writerT.start()
+
+	def on_event(self, topic, args, kwargs):
+		"""
+		StreamClient handler, subscribe it next to a pair's Wizard: stream.subscribe(pair, writer.on_event)
+		"""
+		self.write(topic, args, kwargs)
+
+	def write(self, pair, args, kwargs, timestamp=None):
+		"""
+		Queues one raw tick, returns False if it was dropped because the queue is full
+		"""
+		self.received += 1
+		if timestamp is None:
+			timestamp = time.time()
+		try:
+			self._queue.put_nowait(RawData('tick', args, pair, timestamp, kwargs.get(u'seq')))
+			return True
+		except queue.Full:
+			with self._dropped_lock:
+				self.dropped += 1
+			return False
+
+	def queued(self):
+		return self._queue.qsize()
+
+	def stats(self):
+		return {'received': self.received, 'written': self.written, 'dropped': self.dropped,
+				'queued': self.queued(), 'flushes': self.flushes, 'failed_flushes': self.failed_flushes,
+				'last_lag': self.last_lag, 'max_lag': self.max_lag}
+
+	def close(self, timeout=None):
+		"""
+		Stops taking ticks, flushes what is queued and joins the writer thread
+		"""
+		self._stopped = True
+		self._writerT.join(timeout)
+
+	def _run(self):
+		batch = []
+		deadline = None
+		while True:
+			timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.time())
+			try:
+				batch.append(self._queue.get(timeout=timeout))
+				if deadline is None:
+					deadline = time.time() + self.flush_interval
+				# drain whatever else is already waiting without going back to sleep
+				while len(batch) < self.batch_size:
+					batch.append(self._queue.get_nowait())
+			except queue.Empty:
+				pass
+
+			if batch and (len(batch) >= self.batch_size or time.time() >= deadline or self._stopped):
+				self._flush(batch)
+				batch = []
+				deadline = None
+			elif self._stopped and self._queue.empty():
+				return
+
+	def _flush(self, batch):
+		try:
+			self.library.store_many(batch)
+		except Exception as e:
+			# the reader must never see Mongo errors, the batch is counted as dropped
+			self.failed_flushes += 1
+			with self._dropped_lock:
+				self.dropped += len(batch)
+			print('RAW: failed to write {0} ticks: {1}'.format(len(batch), e))
+			return
+		self.flushes += 1
+		self.written += len(batch)
+		self.last_lag = time.time() - batch[0].timestamp
+		self.max_lag = max(self.max_lag, self.last_lag)
@@ -21,4 +21,9 @@ POLONIEX_DIR = {
 	'build': SETTINGS_PATH + '/build/',
 	'save': SETTINGS_PATH + '/save/',
 	'model': SETTINGS_PATH + '/model/'
-}
\ No newline at end of file
+}
+
+POLONIEX_WAMP = {
+	'url': u'wss://api.poloniex.com:443',
+	'realm': u'realm1'
+}
@@ -0,0 +1,182 @@
+from poloniex.settings import POLONIEX_WAMP
+
+import asyncio
+import itertools
+import json
+import time
+import websockets
+
+# WAMP v2 message codes used by a subscriber-only client
+HELLO = 1
+WELCOME = 2
+ABORT = 3
+GOODBYE = 6
+ERROR = 8
+SUBSCRIBE = 32
+SUBSCRIBED = 33
+UNSUBSCRIBE = 34
+UNSUBSCRIBED = 35
+EVENT = 36
+
+
+class WampError(Exception):
+	"""
+	Raised when the WAMP router aborts or closes the session, run() reconnects after it like after a dropped connection.
+	"""
+
+
+class StreamClient(object):
+	"""
+	In-process asyncio client for Poloniex's WAMP push API.
+	A StreamClient holds one websocket connection and any number of topic subscriptions.
+	Every EVENT message is decoded once and handed to its topic's handlers as python objects,
+	so no subprocess, STDOUT pipe or string round trip sits between the exchange and the books.
+	"""
+
+	def __init__(self, url=POLONIEX_WAMP['url'], realm=POLONIEX_WAMP['realm']):
+		"""
+		Initializes a stream client, no connection is made until run() is awaited.
+
+		Args:
+			url: String websocket url of the WAMP router, point it at a local server for testing.
+			realm: String WAMP realm to join.
+
+		"""
+		self.url = url
+		self.realm = realm
+
+		# dict: topic and list of handlers key value pairs, (re)subscribed on every connect
+		self._topics = {}
+
+		# dict: router subscription id and topic key value pairs
+		self._subscriptions = {}
+
+		# dict: request id and topic key value pairs for in flight SUBSCRIBE messages
+		self._pending = {}
+
+		self._request_ids = itertools.count(1)
+		self._websocket = None
+		self._stopped = False
+		self.session_id = None
+
+		# int: sessions joined, run() resets its reconnect back off once a connection got this far
+		self._joins = 0
+
+		# bool: stamp every incoming message with time.perf_counter() in received_at, set by a Wizard given a
+		# LatencyRecorder so its handlers can measure from receipt
+		self.track_receipt = False
+		self.received_at = None
+
+	def subscribe(self, topic, handler):
+		"""
+		Registers handler(topic, args, kwargs) for every EVENT published to topic, a topic can have several handlers.
+		An exception raised by a handler is printed and the event still reaches the topic's other handlers.
+		Safe to call before or while the client is running, but only from the client's event loop once running.
+		"""
+		if topic in self._topics:
+			self._topics[topic].append(handler)
+			return
+		self._topics[topic] = [handler]
+		if self._websocket is not None and self.session_id is not None:
+			return asyncio.ensure_future(self._send_subscribe(topic))
+
+	async def run(self, reconnect_delay=1.0, max_reconnect_delay=60.0):
+		"""
+		Connects, joins the realm, subscribes every registered topic and dispatches events until stop() is called.
+		The connection is re-established if the router drops, aborts or closes it, after reconnect_delay seconds,
+		doubling up to max_reconnect_delay while connections keep failing before a session is joined.
+		"""
+		self._stopped = False
+		delay = reconnect_delay
+		while not self._stopped:
+			joins = self._joins
+			try:
+				await self._session()
+			except (websockets.ConnectionClosed, OSError, WampError) as e:
+				print('STREAM: connection to {0} lost: {1}'.format(self.url, e))
+			if self._stopped:
+				break
+			delay = reconnect_delay if self._joins != joins else min(delay * 2, max_reconnect_delay)
+			await asyncio.sleep(delay)
+
+	def stop(self):
+		"""
+		Stops the client, the current connection is closed and run() returns.
+		"""
+		self._stopped = True
+		if self._websocket is not None:
+			return asyncio.ensure_future(self._websocket.close())
+
+	async def _session(self):
+		async with websockets.connect(self.url, subprotocols=['wamp.2.json']) as websocket:
+			self._websocket = websocket
+			self._subscriptions.clear()
+			self._pending.clear()
+			try:
+				await self._send([HELLO, self.realm, {'roles': {'subscriber': {}}}])
+				async for raw in websocket:
+					if self.track_receipt:
+						self.received_at = time.perf_counter()
+					try:
+						message = json.loads(raw)
+					except ValueError as e:
+						# a frame that does not decode means the stream itself is broken, start a fresh one
+						raise WampError('undecodable message: {0}'.format(e))
+					try:
+						self._dispatch(message)
+					except (IndexError, KeyError, TypeError) as e:
+						print('STREAM: dropped malformed message {0!r}: {1!r}'.format(message, e))
+					if self._stopped:
+						break
+			finally:
+				self._websocket = None
+				self.session_id = None
+
+	def _dispatch(self, message):
+		code = message[0]
+		if code == EVENT:
+			# [EVENT, subscription, publication, details, args?, kwargs?]
+			topic = self._subscriptions.get(message[1])
+			if topic is not None:
+				args = message[4] if len(message) > 4 else []
+				kwargs = message[5] if len(message) > 5 else {}
+				for handler in self._topics[topic]:
+					# one failing handler must neither take the connection down nor starve the topic's other handlers
+					try:
+						handler(topic, args, kwargs)
+					except Exception as e:
+						print('STREAM: {0} handler {1} failed: {2!r}'.format(topic, handler, e))
+
+		elif code == SUBSCRIBED:
+			# [SUBSCRIBED, request, subscription]
+			topic = self._pending.pop(message[1], None)
+			if topic is not None:
+				self._subscriptions[message[2]] = topic
+				print('STREAM: subscribed to {0}'.format(topic))
+
+		elif code == WELCOME:
+			# [WELCOME, session, details]
+			self.session_id = message[1]
+			self._joins += 1
+			for topic in self._topics:
+				asyncio.ensure_future(self._send_subscribe(topic))
+
+		elif code == ERROR:
+			# [ERROR, request type, request, details, error uri]
+			# a rejected subscription only loses its topic, it is retried on the next connect
+			if message[1] == SUBSCRIBE:
+				topic = self._pending.pop(message[2], None)
+				print('STREAM: subscription to {0} rejected: {1}'.format(topic, message[4]))
+			else:
+				print('STREAM: request {0} failed: {1}'.format(message[2], message[4]))
+
+		elif code in (ABORT, GOODBYE):
+			raise WampError('session closed by router: {0}'.format(message[-1]))
+
+	async def _send_subscribe(self, topic):
+		request_id = next(self._request_ids)
+		self._pending[request_id] = topic
+		await self._send([SUBSCRIBE, request_id, {}, topic])
+
+	async def _send(self, message):
+		await self._websocket.send(json.dumps(message))
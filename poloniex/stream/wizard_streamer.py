@@ -1,13 +1,14 @@
+from poloniex.model.wizard_build import Tick
+
 from twisted.internet.defer import inlineCallbacks
 from autobahn.twisted.wamp import ApplicationSession, ApplicationRunner
 import sys
 
 
 def on_event(*args, **kwargs):
-	if args:
-		print ('*' + str(kwargs) + '*' + '*'.join(str(event) for event in args))
-	else:
-		print ('*' + str(kwargs))
+	# one JSON line per tick, framed by Tick.encode() so recordings always replay with Tick()
+	sys.stdout.write(Tick.encode(list(args), kwargs))
+	sys.stdout.flush()
 
 
 class StreamBook(ApplicationSession):
@@ -23,4 +24,4 @@ if __name__ == "__main__":
 
 	pair = sys.argv[1]
 	subscriber = ApplicationRunner(u"wss://api.poloniex.com:443", u"realm1", extra={'topic_connection': pair})
-	subscriber.run(StreamBook)
\ No newline at end of file
+	subscriber.run(StreamBook)
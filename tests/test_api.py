@@ -0,0 +1,62 @@
+from poloniex.api.api import PoloniexAPI
+from poloniex.bench.http_bench import StubHandler, StubServer, TICKER
+
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+import hashlib
+import hmac
+import json
+
+
+class _RecordingHandler(StubHandler):
+	"""
+	StubHandler that records the connection, command and signature of every request
+	"""
+	requests = []
+
+	def do_POST(self):
+		body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+		args = parse_qs(body.decode('utf-8') or urlsplit(self.path).query)
+		self.requests.append((self.client_address[1], args['command'][0], args.get('nonce', [None])[0], body,
+							  self.headers.get('Sign')))
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(TICKER)))
+		self.end_headers()
+		self.wfile.write(TICKER)
+
+
+def _server():
+	_RecordingHandler.requests = []
+	server = StubServer(('127.0.0.1', 0), _RecordingHandler)
+	Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def test_calls_share_one_keep_alive_connection():
+	server = _server()
+	url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+	api = PoloniexAPI('key', 'secret')
+	api.publicURL, api.privateURL = [url + '/public', url + '/tradingApi']
+	try:
+		for _ in range(20):
+			assert api.marketTicker() == json.loads(TICKER.decode('utf-8'))
+		api.myBalances()
+		api.myBalances()
+	finally:
+		api.close()
+		server.shutdown()
+		server.server_close()
+
+	requests = _RecordingHandler.requests
+	# one TCP connection carried every public and private call
+	assert len(set(port for port, _, _, _, _ in requests)) == 1
+	assert [command for _, command, _, _, _ in requests] == ['returnTicker'] * 20 + ['returnBalances'] * 2
+	assert [command for command, secs in api.timings] == ['returnTicker'] * 20 + ['returnBalances'] * 2
+	assert all(secs > 0 for command, secs in api.timings)
+
+	# private calls are signed over their nonce, which only goes up
+	private = requests[20:]
+	assert int(private[0][2]) < int(private[1][2])
+	for _, _, _, body, sign in private:
+		assert sign == hmac.new(b'secret', body, hashlib.sha512).hexdigest()
@@ -0,0 +1,53 @@
+from poloniex.construct.backtest import SimulatedExchange
+from poloniex.construct.mm_strat import MarketMaker
+from poloniex.construct.replay import ReplayWizard
+from poloniex.model.wizard_build import Tick
+
+PAIR = 'BTC_ETH'
+START = {'bids': [['0.0490', '1.0']], 'asks': [['0.0510', '1.0']], 'seq': 0}
+
+
+def _trade(side, rate, amount):
+	return {u'type': u'newTrade', u'data': {u'type': side, u'rate': rate, u'amount': amount, u'tradeID': u'1',
+											u'date': u'2017-01-01 00:00:00', u'total': u'0'}}
+
+
+def _exchange():
+	return SimulatedExchange(ReplayWizard(PAIR, 10, market_orders=START), balances={'BTC': 1.0, 'ETH': 10.0})
+
+
+def _open(exchange):
+	return [(order['rate'], order['amount']) for order in exchange.myOrders(PAIR)]
+
+
+def test_trade_through_resting_orders_fills_no_more_than_its_amount():
+	exchange = _exchange()
+	exchange.sell(PAIR, '0.0505', '1.0')
+	exchange.sell(PAIR, '0.0506', '1.0')
+	exchange.sell(PAIR, '0.0505', '1.0')
+
+	# a 1.5 buy printed at 0.0510 went through both rates, best priced then oldest orders fill first
+	exchange.on_tick(exchange.wizard, Tick(Tick.encode([_trade(u'buy', '0.0510', '1.5')], {u'seq': 1}, 100.0)))
+	assert [(fill.order_number, fill.rate, fill.amount) for fill in exchange.fills] == [('1', 0.0505, 1.0),
+																						  ('3', 0.0505, 0.5)]
+	assert _open(exchange) == [('0.05060000', '1.00000000'), ('0.05050000', '0.50000000')]
+
+
+def test_refused_move_keeps_the_order():
+	exchange = _exchange()
+	number = exchange.buy(PAIR, '0.0480', '1.0')['orderNumber']
+	assert exchange.moveOrder(number, '0') == {'success': 0, 'error': 'Invalid rate or amount.'}
+	assert _open(exchange) == [('0.04800000', '1.00000000')]
+
+	moved = exchange.moveOrder(number, '0.0485')
+	assert moved['success'] == 1
+	assert exchange.myOrders(PAIR)[0]['orderNumber'] == moved['orderNumber']
+	assert _open(exchange) == [('0.04850000', '1.00000000')]
+
+
+def test_spread_of_one_sided_book():
+	strategy = MarketMaker(ReplayWizard(PAIR, 10, market_orders={'bids': [['0.0490', '1.0']], 'asks': [], 'seq': 0}),
+						   api=None)
+	assert strategy.calculate_spread() is None
+	strategy = MarketMaker(ReplayWizard(PAIR, 10, market_orders=START), api=None)
+	assert abs(strategy.calculate_spread() - 0.002) < 1e-12
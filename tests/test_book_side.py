@@ -0,0 +1,155 @@
+from poloniex.model.wizard_build import AskBook, BidBook
+
+import random
+
+import pytest
+
+
+def _modify(side, rate, amount):
+	return {u'type': u'orderBookModify', u'data': {u'type': side, u'rate': rate, u'amount': amount}}
+
+
+def _remove(side, rate):
+	return {u'type': u'orderBookRemove', u'data': {u'type': side, u'rate': rate, u'amount': '0.00000000'}}
+
+
+class _Reference(object):
+	"""
+	The brute force book side the tests check BookSide against, a dict of rate and amount walked in full every query
+	"""
+
+	def __init__(self, side, max_depth, data):
+		self.side = side
+		self.max_depth = max_depth
+		self.levels = {}
+		for rate, amount in data:
+			self.levels[float(rate)] = float(amount)
+		self.levels = dict(self.best(max_depth))
+
+	def best(self, levels=None):
+		return sorted(self.levels.items(), reverse=self.side == 'bid')[:levels]
+
+	def modify(self, rate, amount):
+		self.levels[rate] = amount
+		self.levels = dict(self.best(self.max_depth))
+
+	def remove(self, rate):
+		self.levels.pop(rate, None)
+
+	def cumulative_amount(self, levels):
+		return sum(amount for _, amount in self.best(max(levels, 0)))
+
+	def amount_within(self, fraction):
+		if not self.levels:
+			return 0.0
+		best_rate = self.best(1)[0][0]
+		if self.side == 'bid':
+			limit = best_rate * (1 - fraction)
+			return sum(amount for rate, amount in self.levels.items() if rate >= limit)
+		limit = best_rate * (1 + fraction)
+		return sum(amount for rate, amount in self.levels.items() if rate <= limit)
+
+	def _fill(self, amount):
+		filled = notional = 0.0
+		for rate, level_amount in self.best():
+			if filled + level_amount >= amount:
+				return rate, notional + (amount - filled) * rate
+			filled += level_amount
+			notional += rate * level_amount
+		return None
+
+	def price_to_fill(self, amount):
+		fill = self._fill(amount)
+		return None if fill is None else fill[1] / amount
+
+	def rate_to_fill(self, amount):
+		fill = self._fill(amount)
+		return None if fill is None else fill[0]
+
+
+def _check(book, reference, rng):
+	assert list(book) == reference.best()
+	for levels in (0, 1, 2, 5, len(reference.levels), len(reference.levels) + 3):
+		assert book.cumulative_amount(levels) == pytest.approx(reference.cumulative_amount(levels))
+	for fraction in (0.0, 0.001, 0.01, 0.05, 1.0):
+		assert book.amount_within(fraction) == pytest.approx(reference.amount_within(fraction))
+	total = sum(reference.levels.values())
+	for amount in (0.001, rng.uniform(0.01, total + 1.0), total / 2.0 + 0.0001, total + 0.5):
+		# amounts landing exactly on a cumulative boundary may round either way, keep clear of them
+		assert book.rate_to_fill(amount) == reference.rate_to_fill(amount)
+		assert book.price_to_fill(amount) == pytest.approx(reference.price_to_fill(amount))
+
+
+@pytest.mark.parametrize('book_type, side', [(BidBook, 'bid'), (AskBook, 'ask')])
+def test_depth_queries_match_brute_force(book_type, side):
+	rng = random.Random(side)
+	rates = ['{0:.8f}'.format(0.0400 + step * 0.00001) for step in range(400)]
+	data = [[rate, '{0:.8f}'.format(rng.uniform(0.1, 5.0))] for rate in rng.sample(rates, 30)]
+	book = book_type(20, data)
+	reference = _Reference(side, 20, data)
+	_check(book, reference, rng)
+
+	for step in range(3000):
+		rate = rng.choice(rates)
+		if rng.random() < 0.3:
+			book.remove(_remove(side, rate))
+			reference.remove(float(rate))
+		else:
+			amount = '{0:.8f}'.format(rng.uniform(0.01, 5.0))
+			book.modify(_modify(side, rate, amount))
+			reference.modify(float(rate), float(amount))
+		# query after some events only, so both queued changes and full rebuilds get applied
+		if step % rng.choice((1, 3, 50)) == 0:
+			_check(book, reference, rng)
+	_check(book, reference, rng)
+
+
+def test_depth_queries_on_empty_and_reloaded_book():
+	book = AskBook(5, [])
+	assert book.cumulative_amount(3) == 0.0
+	assert book.amount_within(0.01) == 0.0
+	assert book.price_to_fill(1.0) is None
+	with pytest.raises(ValueError):
+		book.rate_to_fill(0.0)
+
+	book.load([['0.0510', '1.0'], ['0.0520', '2.0']])
+	assert book.cumulative_amount(5) == 3.0
+	assert book.rate_to_fill(2.5) == 0.052
+	book.remove(_remove('ask', '0.0510'))
+	book.remove(_remove('ask', '0.0520'))
+	assert book.price_to_fill(1.0) is None
+	# every node went with the last level
+	assert book._tree.nodes == {}
+
+
+def test_levels_stay_sorted_and_trimmed_to_depth():
+	bids = BidBook(3, [['0.0480', '1.0'], ['0.0490', '2.0'], ['0.0470', '3.0'], ['0.0460', '4.0']])
+	asks = AskBook(3, [['0.0520', '1.0'], ['0.0510', '2.0']])
+	# the worst level of the snapshot didn't fit
+	assert list(bids) == [(0.049, 2.0), (0.048, 1.0), (0.047, 3.0)]
+	assert (bids.max_rate_level(), bids.min_rate_level()) == ((0.049, 2.0), (0.047, 3.0))
+	assert (asks.max_rate_level(), asks.min_rate_level()) == ((0.052, 1.0), (0.051, 2.0))
+	assert bids.volume == 6.0
+
+	# a better rate pushes the worst level out of a full book, a worse one is ignored
+	bids.modify(_modify('bid', '0.0495', '0.5'))
+	bids.modify(_modify('bid', '0.0400', '9.0'))
+	assert bids.rates() == [0.0495, 0.049, 0.048]
+	assert bids.volume == 3.5
+
+	bids.modify(_modify('bid', '0.0490', '4.0'))
+	assert bids.get_amount_at_rate(0.049) == 4.0
+	assert bids.volume == 5.5
+
+	bids.remove(_remove('bid', '0.0495'))
+	bids.remove(_remove('bid', '0.0300'))
+	assert bids.best_level() == (0.049, 4.0)
+	assert not bids.rate_exists(0.0495)
+	assert bids.get_amount_at_rate(0.0495) is None
+	assert (len(bids), bids.volume) == (2, 5.0)
+
+	asks.modify(_modify('ask', '0.0505', '1.5'))
+	asks.modify(_modify('ask', '0.0530', '1.0'))
+	assert asks.top() == ((0.0505, 1.5), (0.051, 2.0), (0.052, 1.0))
+	assert asks.top(1) == ((0.0505, 1.5),)
+	assert asks.amounts(2) == [1.5, 2.0]
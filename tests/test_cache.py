@@ -0,0 +1,142 @@
+from poloniex.api import cache as cache_module
+from poloniex.api.cache import ResponseCache
+
+import asyncio
+import threading
+
+import pytest
+
+
+class _Clock(object):
+	"""
+	Stands in for the time module inside poloniex.api.cache, advanced by hand
+	"""
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def monotonic(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = _Clock()
+	monkeypatch.setattr(cache_module, 'time', clock)
+	return clock
+
+
+def _fetcher(responses):
+	calls = []
+
+	def fetch():
+		calls.append(len(calls))
+		return responses[len(calls) - 1]
+	return fetch, calls
+
+
+def test_responses_expire_after_their_ttl(clock):
+	cache = ResponseCache(ttls={'returnTicker': 2.0})
+	fetch, calls = _fetcher([{'BTC_ETH': 1}, {'BTC_ETH': 2}])
+	assert cache.get('returnTicker', {}, fetch) == {'BTC_ETH': 1}
+	clock.now += 1.9
+	assert cache.get('returnTicker', {}, fetch) == {'BTC_ETH': 1}
+	clock.now += 0.2
+	assert cache.get('returnTicker', {}, fetch) == {'BTC_ETH': 2}
+	assert len(calls) == 2
+	assert cache.metrics() == {'hits': 1, 'misses': 2, 'coalesced': 0, 'size': 1}
+
+
+def test_errors_are_never_cached(clock):
+	cache = ResponseCache()
+	fetch, calls = _fetcher([{'error': 'busy'}, {'BTC_ETH': 1}])
+	assert cache.get('returnTicker', {}, fetch) == {'error': 'busy'}
+	assert cache.get('returnTicker', {}, fetch) == {'BTC_ETH': 1}
+	assert len(calls) == 2
+
+
+def test_least_recently_used_is_evicted(clock):
+	cache = ResponseCache(ttls={'returnOrderBook': 60.0}, maxSize=2)
+	for pair in ('BTC_ETH', 'BTC_XMR'):
+		cache.get('returnOrderBook', {'currencyPair': pair}, lambda: pair)
+	# touching BTC_ETH leaves BTC_XMR least recently used
+	assert cache.get('returnOrderBook', {'currencyPair': 'BTC_ETH'}, lambda: 'refetched') == 'BTC_ETH'
+	cache.get('returnOrderBook', {'currencyPair': 'BTC_LTC'}, lambda: 'BTC_LTC')
+	assert cache.get('returnOrderBook', {'currencyPair': 'BTC_ETH'}, lambda: 'refetched') == 'BTC_ETH'
+	assert cache.get('returnOrderBook', {'currencyPair': 'BTC_XMR'}, lambda: 'refetched') == 'refetched'
+
+
+def test_concurrent_threads_share_one_fetch(clock):
+	cache = ResponseCache()
+	started = threading.Event()
+	release = threading.Event()
+	calls = []
+
+	def fetch():
+		calls.append(1)
+		started.set()
+		release.wait(5.0)
+		return {'BTC_ETH': 1}
+
+	results = []
+	threads = [threading.Thread(target=lambda: results.append(cache.get('returnTicker', {}, fetch)))
+			   for _ in range(4)]
+	threads[0].start()
+	started.wait(5.0)
+	for thread in threads[1:]:
+		thread.start()
+	while cache.coalesced < 3:
+		pass
+	release.set()
+	for thread in threads:
+		thread.join()
+	assert calls == [1]
+	assert results == [{'BTC_ETH': 1}] * 4
+
+
+def test_coroutines_share_one_fetch():
+	cache = ResponseCache()
+	calls = []
+
+	async def fetch():
+		calls.append(1)
+		await asyncio.sleep(0.01)
+		return {'BTC_ETH': 1}
+
+	async def main():
+		return await asyncio.gather(*[cache.getAsync('returnTicker', {}, fetch) for _ in range(4)])
+
+	assert asyncio.run(main()) == [{'BTC_ETH': 1}] * 4
+	assert calls == [1]
+	assert cache.metrics()['coalesced'] == 3
+
+
+def test_cancelled_caller_leaves_the_others_their_result():
+	cache = ResponseCache()
+	fetched = []
+
+	async def fetch():
+		await asyncio.sleep(0.05)
+		fetched.append(1)
+		return {'BTC_ETH': 1}
+
+	async def main():
+		first = asyncio.ensure_future(cache.getAsync('returnTicker', {}, fetch))
+		await asyncio.sleep(0)
+		second = asyncio.ensure_future(cache.getAsync('returnTicker', {}, fetch))
+		await asyncio.sleep(0.01)
+		# the caller that started the fetch goes away, the one waiting on it still gets the response
+		first.cancel()
+		assert await second == {'BTC_ETH': 1}
+		assert first.cancelled()
+
+		# with every caller gone the fetch itself is cancelled
+		alone = asyncio.ensure_future(cache.getAsync('return24hVolume', {}, fetch))
+		await asyncio.sleep(0.01)
+		alone.cancel()
+		await asyncio.sleep(0.1)
+		assert alone.cancelled()
+		assert cache._futures == {}
+
+	asyncio.run(main())
+	assert fetched == [1]
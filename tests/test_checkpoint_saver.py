@@ -0,0 +1,84 @@
+from poloniex.construct.wizard import Wizard
+from poloniex.model.checkpoint_library import CheckpointLibrary
+from poloniex.model.wizard_build import Tick
+from poloniex.save.checkpoint_saver import CheckpointWriter
+from poloniex.stream.wamp_client import StreamClient
+
+import mongomock
+
+PAIR = 'BTC_ETH'
+
+
+class _ArcticLibrary(object):
+	"""
+	The part of an arctic library CheckpointLibrary uses, over mongomock
+	"""
+
+	def __init__(self):
+		self._collection = mongomock.MongoClient().test.checkpoints
+
+	def get_top_level_collection(self):
+		return self._collection
+
+	def check_quota(self):
+		pass
+
+
+class _API(object):
+	"""
+	Serves the resync snapshot
+	"""
+
+	def __init__(self, market_orders):
+		self.market_orders = market_orders
+
+	def marketOrders(self, pair, depth):
+		return self.market_orders
+
+
+def _modify(side, rate, amount):
+	return {u'type': u'orderBookModify', u'data': {u'type': side, u'rate': rate, u'amount': amount}}
+
+
+def _tick(sequence, timestamp, *events):
+	return Tick(Tick.encode(list(events), {u'seq': sequence}, timestamp))
+
+
+def _levels(books):
+	return [list(book) for book in books]
+
+
+def test_books_at_after_resync():
+	library = CheckpointLibrary(_ArcticLibrary())
+	writer = CheckpointWriter(library, interval=3600.0)
+	start = {'bids': [['0.0490', '1.0'], ['0.0480', '1.0']], 'asks': [['0.0510', '1.0'], ['0.0520', '1.0']], 'seq': 0}
+	# the resync snapshot shares no level with the books before it
+	reloaded = {'bids': [['0.0450', '2.0']], 'asks': [['0.0550', '2.0']], 'seq': 8}
+	wizard = Wizard(PAIR, 10, gap_tolerance=2, api=_API(reloaded), market_orders=start, market_trade_history=[],
+					stream=StreamClient())
+	writer.subscribe(wizard)
+
+	# dict: tick timestamp and the books as they stood after it
+	expected = {}
+	ticks = [_tick(1, 100.0, _modify(u'bid', '0.0495', '3.0')),
+			 _tick(2, 101.0, _modify(u'ask', '0.0505', '3.0')),
+			 # sequence 3 never arrives, the third held tick triggers the resync
+			 _tick(4, 103.0, _modify(u'bid', '0.0470', '4.0')),
+			 _tick(9, 104.0, _modify(u'bid', '0.0455', '5.0')),
+			 _tick(10, 105.0, _modify(u'ask', '0.0545', '5.0')),
+			 _tick(11, 106.0, _modify(u'bid', '0.0440', '6.0'))]
+	for tick in ticks:
+		wizard.on_tick(tick)
+		if wizard._resync_buffer is None and not wizard._ahead:
+			expected[tick.timestamp] = _levels((wizard.bid_book, wizard.ask_book))
+	writer.close()
+
+	assert wizard.resyncs == 1
+	assert wizard.sequence == 11
+	assert sorted(expected) == [tick.timestamp for tick in ticks[:2]] + [tick.timestamp for tick in ticks[-2:]]
+	for timestamp, books in expected.items():
+		assert _levels(library.books_at(PAIR, timestamp)) == books
+	# the resync checkpointed the snapshot, timestamped like the latest buffered tick
+	checkpoints = list(library._checkpoints.find({'pair': PAIR}, sort=[('timestamp', 1)]))
+	assert [(doc['timestamp'], doc['sequence']) for doc in checkpoints] == [(ticks[0].timestamp, 1),
+																			(ticks[4].timestamp, 8)]
@@ -0,0 +1,103 @@
+from poloniex.api import coach as coach_module
+from poloniex.api.coach import Coach
+
+import asyncio
+import threading
+
+import pytest
+
+
+class _Clock(object):
+	"""
+	Stands in for the time and asyncio modules inside poloniex.api.coach: time only moves when a caller sleeps,
+	unless frozen, when sleeps are only recorded
+	"""
+
+	def __init__(self):
+		self.now = 1000.0
+		self.frozen = False
+		self.sleeps = []
+		self._lock = threading.Lock()
+
+	def monotonic(self):
+		return self.now
+
+	def sleep(self, delay):
+		with self._lock:
+			self.sleeps.append(delay)
+			if not self.frozen:
+				self.now += delay
+
+
+class _AsyncClock(object):
+
+	def __init__(self, clock):
+		self.clock = clock
+
+	async def sleep(self, delay):
+		self.clock.sleep(delay)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = _Clock()
+	monkeypatch.setattr(coach_module, 'time', clock)
+	monkeypatch.setattr(coach_module, 'asyncio', _AsyncClock(clock))
+	return clock
+
+
+def test_burst_then_one_call_limit_per_time_frame(clock):
+	coach = Coach(timeFrame=1.0, callLimit=6)
+	started = []
+	for _ in range(20):
+		coach.wait()
+		started.append(clock.now - 1000.0)
+
+	# a full burst goes through at once, then every slot frees a time frame after the call that took it
+	assert started == [0.0] * 6 + [1.0] * 6 + [2.0] * 6 + [3.0] * 2
+	assert all(started[i + 6] - started[i] >= 1.0 for i in range(len(started) - 6))
+	assert clock.sleeps == [1.0, 1.0, 1.0]
+	# the four calls of second 2.0 are a whole time frame old by now
+	assert coach.metrics() == {'calls': 20, 'waits': 3, 'waitTime': 3.0, 'tokens': 4}
+
+	clock.now += 0.5
+	for _ in range(4):
+		coach.wait()
+	assert coach.tokens() == 0
+	coach.wait()
+	assert clock.sleeps == [1.0, 1.0, 1.0, 0.5]
+	clock.now += 1.0
+	assert coach.tokens() == 6
+
+
+def test_threads_reserve_distinct_slots(clock):
+	clock.frozen = True
+	coach = Coach(timeFrame=1.0, callLimit=6)
+
+	def calls():
+		for _ in range(30):
+			coach.wait()
+
+	threads = [threading.Thread(target=calls) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	# every call reserved at the same instant still got a slot of its own
+	assert sorted(clock.sleeps) == [float(second) for second in range(1, 20) for _ in range(6)]
+	assert coach.metrics()['calls'] == 120
+
+
+def test_wait_async_shares_the_budget(clock):
+	coach = Coach(timeFrame=1.0, callLimit=2)
+
+	async def main():
+		for _ in range(3):
+			await coach.waitAsync()
+		coach.wait()
+		coach.wait()
+
+	asyncio.run(main())
+	# the third call waited for the first slot back, the fourth took the second's, the fifth waits for the third's
+	assert clock.sleeps == [1.0, 1.0]
+	assert clock.now == 1002.0
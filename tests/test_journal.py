@@ -0,0 +1,82 @@
+from poloniex.save.journal import JournalReader, JournalWriter, NO_SEQUENCE
+
+import os
+
+
+def _write(directory, timestamps, **kwargs):
+	writer = JournalWriter(str(directory), **kwargs)
+	for sequence, timestamp in enumerate(timestamps):
+		writer.append([], {u'seq': sequence}, timestamp)
+	writer.close()
+
+
+def _sequences(directory, **kwargs):
+	reader = JournalReader(str(directory))
+	try:
+		return [record.sequence for record in reader.read(**kwargs)]
+	finally:
+		reader.close()
+
+
+def test_seek_to_shared_timestamp(tmp_path):
+	_write(tmp_path, [5.0] * 9 + [6.0], index_interval=4)
+	assert _sequences(tmp_path, start_time=5.0) == list(range(10))
+	assert _sequences(tmp_path, start_time=6.0) == [9]
+	assert _sequences(tmp_path, start_time=5.5) == [9]
+
+
+def test_seek_to_shared_timestamp_across_segments(tmp_path):
+	# small segments put records sharing a timestamp in several segments
+	_write(tmp_path, [1.0] * 5 + [2.0] * 40 + [3.0] * 5, index_interval=4, segment_size=256)
+	assert _sequences(tmp_path, start_time=2.0, end_time=3.0) == list(range(5, 45))
+	assert _sequences(tmp_path, start_time=3.0) == list(range(45, 50))
+
+
+def test_seek_to_sequence(tmp_path):
+	_write(tmp_path, [float(t // 8) for t in range(64)], index_interval=4, segment_size=256)
+	for start in (0, 1, 7, 8, 33, 63):
+		assert _sequences(tmp_path, start_sequence=start) == list(range(start, 64))
+
+
+def test_seek_to_sequence_in_unsorted_journal(tmp_path):
+	# a reconnect restarted the sequences, and a few ticks carried none
+	sequences = list(range(100, 120)) + [None] * 3 + list(range(1, 20))
+	writer = JournalWriter(str(tmp_path), index_interval=4)
+	for timestamp, sequence in enumerate(sequences):
+		writer.append([], {} if sequence is None else {u'seq': sequence}, float(timestamp))
+	writer.close()
+	stored = [NO_SEQUENCE if sequence is None else sequence for sequence in sequences]
+	assert _sequences(tmp_path, start_sequence=110) == stored[10:]
+	assert _sequences(tmp_path, start_sequence=5) == stored
+	assert _sequences(tmp_path, start_sequence=200) == []
+
+
+def test_recovered_writer_keeps_timestamps_ordered(tmp_path):
+	_write(tmp_path, [10.0 + t for t in range(20)], index_interval=4, segment_size=256)
+	# a crash right after a new segment was opened leaves it empty
+	last = sorted(os.listdir(str(tmp_path)))[-1]
+	open(os.path.join(str(tmp_path), '{0:010d}.seg'.format(int(last.split('.')[0]) + 1)), 'wb').close()
+
+	writer = JournalWriter(str(tmp_path), index_interval=4, segment_size=256)
+	writer.append([], {u'seq': 20}, 1.0)
+	writer.close()
+	reader = JournalReader(str(tmp_path))
+	try:
+		records = [(record.timestamp, record.sequence) for record in reader.read()]
+	finally:
+		reader.close()
+	# the new record is stamped no earlier than the last one before the crash
+	assert records == [(10.0 + t, t) for t in range(20)] + [(29.0, 20)]
+	assert _sequences(tmp_path, start_time=29.0) == [19, 20]
+
+
+def test_appends_are_flushed_periodically(tmp_path):
+	writer = JournalWriter(str(tmp_path), flush_records=3, flush_seconds=3600.0)
+	for sequence in range(5):
+		writer.append([], {u'seq': sequence}, 1.0)
+		# records reach the file, where any other process can read them, every third append
+		assert _sequences(tmp_path) == list(range(3 if sequence >= 2 else 0))
+	writer.flush_seconds = 0.0
+	writer.append([], {u'seq': 5}, 1.0)
+	assert _sequences(tmp_path) == list(range(6))
+	writer.close()
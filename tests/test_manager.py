@@ -0,0 +1,79 @@
+from poloniex.construct.manager import WizardManager
+from poloniex.save.journal import JournalReader
+from poloniex.stream.wamp_client import WELCOME, SUBSCRIBE, SUBSCRIBED, EVENT
+
+import json
+import threading
+import time
+
+from websockets.sync.server import serve
+
+PAIRS = ['BTC_ETH', 'BTC_XMR']
+START = {'bids': [['0.0490', '1.0']], 'asks': [['0.0510', '1.0']], 'seq': 0}
+
+
+class _API(object):
+	"""
+	Serves one snapshot for every pair and an empty trade history, recording the calls made
+	"""
+
+	def __init__(self):
+		self.calls = []
+
+	def marketOrders(self, pair, depth):
+		self.calls.append(('marketOrders', pair))
+		return dict((each, START) for each in PAIRS)
+
+	def marketTradeHist(self, pair):
+		self.calls.append(('marketTradeHist', pair))
+		return []
+
+
+def _router(connection):
+	"""
+	Welcomes one client and publishes a bid at sequence 1 to every topic it subscribes
+	"""
+	connection.recv()
+	connection.send(json.dumps([WELCOME, 1, {}]))
+	for raw in connection:
+		message = json.loads(raw)
+		if message[0] != SUBSCRIBE:
+			continue
+		subscription = 100 + message[1]
+		connection.send(json.dumps([SUBSCRIBED, message[1], subscription]))
+		event = {u'type': u'orderBookModify', u'data': {u'type': u'bid', u'rate': u'0.0495', u'amount': u'2.0'}}
+		connection.send(json.dumps([EVENT, subscription, 1, {}, [event], {'seq': 1}]))
+
+
+def test_pairs_share_one_stream_and_one_snapshot_call(tmp_path):
+	api = _API()
+	manager = WizardManager(PAIRS, 10, api=api, journal_dir=str(tmp_path))
+	assert sorted(api.calls) == sorted([('marketOrders', 'all')] + [('marketTradeHist', pair) for pair in PAIRS])
+	assert len(manager) == 2 and list(manager) == PAIRS
+	# one stream client carries every pair's wizard and journal
+	assert set(manager[pair]._stream for pair in manager) == {manager._stream}
+	for pair in PAIRS:
+		assert manager._stream._topics[pair] == [manager[pair].catch_book, manager.journals[pair].on_event]
+
+	with serve(_router, '127.0.0.1', 0, subprotocols=['wamp.2.json']) as server:
+		serving = threading.Thread(target=server.serve_forever)
+		serving.start()
+		try:
+			manager._stream.url = 'ws://127.0.0.1:{0}'.format(server.socket.getsockname()[1])
+			manager.start()
+			deadline = time.time() + 5.0
+			while any(manager[pair].sequence != 1 for pair in PAIRS) and time.time() < deadline:
+				time.sleep(0.005)
+			manager.stop()
+		finally:
+			server.shutdown()
+			serving.join()
+
+	for pair in PAIRS:
+		assert manager[pair].sequence == 1
+		assert list(manager[pair].bid_book) == [(0.0495, 2.0), (0.049, 1.0)]
+		reader = JournalReader(str(tmp_path / pair))
+		try:
+			assert [record.sequence for record in reader] == [1]
+		finally:
+			reader.close()
@@ -0,0 +1,68 @@
+from poloniex.api import nonce as nonce_module
+from poloniex.api.nonce import NonceManager
+
+import threading
+
+import pytest
+
+
+class _Clock(object):
+	"""
+	Stands in for the time module inside poloniex.api.nonce, set by hand
+	"""
+
+	def __init__(self):
+		self.now = 1500000000.0
+
+	def time(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = _Clock()
+	monkeypatch.setattr(nonce_module, 'time', clock)
+	return clock
+
+
+def test_nonces_increase_even_when_the_clock_does_not(clock):
+	nonces = NonceManager()
+	first = [next(nonces) for _ in range(5)]
+	assert first == [1500000000000 + i for i in range(5)]
+	# a clock stepping back never takes nonces with it
+	clock.now -= 60.0
+	assert nonces.next() == first[-1] + 1
+	clock.now += 120.0
+	assert nonces.next() == 1500000060000
+
+
+def test_threads_never_share_a_nonce(clock):
+	nonces = NonceManager()
+	taken = []
+
+	def take():
+		mine = [nonces.next() for _ in range(2000)]
+		# each thread sees its own nonces strictly increasing
+		assert mine == sorted(set(mine))
+		taken.extend(mine)
+
+	threads = [threading.Thread(target=take) for _ in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert len(set(taken)) == 16000
+
+
+def test_restart_resumes_above_everything_handed_out(clock, tmp_path):
+	path = str(tmp_path / 'nonce')
+	nonces = NonceManager(path, reserve=100)
+	handed_out = [nonces.next() for _ in range(250)]
+	with open(path) as f:
+		assert int(f.read()) > handed_out[-1]
+
+	# a restart behind a clock stepped back an hour, without any clean shutdown
+	clock.now -= 3600.0
+	restarted = NonceManager(path, reserve=100)
+	assert restarted.next() > handed_out[-1]
+	assert not (tmp_path / 'nonce.tmp').exists()
@@ -0,0 +1,80 @@
+from poloniex.model.raw_library import RawDataLibrary
+from poloniex.save.raw_saver import RawTickWriter
+
+import threading
+
+import mongomock
+import pymongo.errors
+
+PAIR = 'BTC_ETH'
+
+
+class _FlakyCollection(object):
+	"""
+	A mongomock collection whose first insert_many stores half the batch and then loses the connection
+	"""
+
+	def __init__(self):
+		self.collection = mongomock.MongoClient().test.raw
+		self.attempts = 0
+
+	def insert_many(self, docs, ordered=True):
+		self.attempts += 1
+		if self.attempts == 1:
+			self.collection.insert_many(docs[:len(docs) // 2], ordered=ordered)
+			raise pymongo.errors.AutoReconnect('connection reset')
+		return self.collection.insert_many(docs, ordered=ordered)
+
+
+class _ArcticLibrary(object):
+	"""
+	The part of an arctic library RawDataLibrary uses
+	"""
+
+	def __init__(self, collection):
+		self._collection = collection
+
+	def get_top_level_collection(self):
+		return self._collection
+
+	def check_quota(self):
+		pass
+
+
+class _Stalled(object):
+	"""
+	A library whose writes never return until released, so the writer's queue fills up
+	"""
+
+	def __init__(self):
+		self.release = threading.Event()
+
+	def store_many(self, raw_datas):
+		self.release.wait()
+
+
+def test_retried_batch_is_stored_once():
+	flaky = _FlakyCollection()
+	writer = RawTickWriter(RawDataLibrary(_ArcticLibrary(flaky)), batch_size=10, flush_interval=0.01)
+	for sequence in range(10):
+		writer.write(PAIR, [], {u'seq': sequence}, 100.0 + sequence)
+	writer.close(5.0)
+
+	assert flaky.attempts == 2
+	assert writer.stats()['written'] == 10
+	assert sorted(doc['sequence'] for doc in flaky.collection.find()) == list(range(10))
+
+
+def test_dropped_ticks_are_all_counted():
+	library = _Stalled()
+	writer = RawTickWriter(library, max_queue=10, batch_size=1, flush_interval=0.01)
+	threads = [threading.Thread(target=lambda: [writer.write(PAIR, [], {}) for _ in range(2000)]) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	library.release.set()
+	writer.close(5.0)
+
+	stats = writer.stats()
+	assert stats['dropped'] + stats['written'] == 8000
@@ -0,0 +1,151 @@
+from poloniex.stream.wamp_client import StreamClient, HELLO, WELCOME, ABORT, ERROR, SUBSCRIBE, SUBSCRIBED, EVENT
+
+import asyncio
+import json
+
+import websockets
+
+PAIR = 'BTC_ETH'
+
+
+class _Router(object):
+	"""
+	A local WAMP router playing one script per connection. A script is a list of steps, run in order from the
+	connection's first SUBSCRIBE: 'wait' waits for the next SUBSCRIBE, ('event', topic, n) publishes event n to topic,
+	('raw', text) sends text as is, 'abort' aborts the session and 'close' closes the connection.
+	"""
+
+	def __init__(self, *scripts):
+		self.scripts = list(scripts)
+		# set: topics whose subscriptions are rejected
+		self.rejected = set()
+		self.hellos = []
+		self.subscribed = []
+		self.connections = 0
+
+	async def handle(self, connection):
+		self.connections += 1
+		script = list(self.scripts.pop(0) if self.scripts else [])
+		hello = json.loads(await connection.recv())
+		assert hello[0] == HELLO
+		self.hellos.append(hello[1])
+		await connection.send(json.dumps([WELCOME, self.connections, {}]))
+		subscriptions = {}
+		try:
+			async for raw in connection:
+				message = json.loads(raw)
+				assert message[0] == SUBSCRIBE
+				topic = message[3]
+				self.subscribed.append(topic)
+				if topic in self.rejected:
+					await connection.send(json.dumps([ERROR, SUBSCRIBE, message[1], {}, 'wamp.error.not_authorized']))
+				else:
+					subscriptions[topic] = 100 + len(self.subscribed)
+					await connection.send(json.dumps([SUBSCRIBED, message[1], subscriptions[topic]]))
+				if script and script[0] == 'wait':
+					script.pop(0)
+				while script and script[0] != 'wait':
+					step = script.pop(0)
+					if step == 'close':
+						await connection.close()
+						return
+					elif step == 'abort':
+						await connection.send(json.dumps([ABORT, {}, 'wamp.close.system_shutdown']))
+					elif step[0] == 'raw':
+						await connection.send(step[1])
+					else:
+						_, event_topic, n = step
+						await connection.send(json.dumps([EVENT, subscriptions[event_topic], n, {}, [{'n': n}],
+														  {'seq': n}]))
+		except websockets.ConnectionClosed:
+			pass
+
+
+def _run(router, client, drive):
+	"""
+	Runs <client> against <router> on a local port until the coroutine function <drive> returns
+	"""
+	async def main():
+		async with websockets.serve(router.handle, '127.0.0.1', 0, subprotocols=['wamp.2.json']) as server:
+			client.url = 'ws://127.0.0.1:{0}'.format(server.sockets[0].getsockname()[1])
+			running = asyncio.ensure_future(client.run(reconnect_delay=0.01))
+			try:
+				await asyncio.wait_for(drive(), 5.0)
+			finally:
+				client.stop()
+				await asyncio.wait_for(running, 5.0)
+	asyncio.run(main())
+
+
+async def _until(condition):
+	while not condition():
+		await asyncio.sleep(0.005)
+
+
+def _recorder(received):
+	def handler(topic, args, kwargs):
+		received.append((topic, args[0]['n'], kwargs['seq']))
+	return handler
+
+
+def test_events_reach_their_topics_handlers():
+	received = []
+	router = _Router(['wait', 'wait', ('event', PAIR, 1), ('event', 'BTC_LTC', 2),
+					  'wait', ('event', 'BTC_XMR', 3), ('event', PAIR, 4)])
+	client = StreamClient(realm='realm1')
+	client.subscribe(PAIR, _recorder(received))
+	client.subscribe('BTC_LTC', _recorder(received))
+
+	async def drive():
+		await _until(lambda: len(received) == 2)
+		# subscribing while running sends the SUBSCRIBE straight away
+		client.subscribe('BTC_XMR', _recorder(received))
+		await _until(lambda: len(received) == 4)
+
+	_run(router, client, drive)
+	assert received == [(PAIR, 1, 1), ('BTC_LTC', 2, 2), ('BTC_XMR', 3, 3), (PAIR, 4, 4)]
+	assert router.hellos == ['realm1']
+	assert sorted(router.subscribed) == sorted([PAIR, 'BTC_LTC', 'BTC_XMR'])
+
+
+def test_reconnects_and_resubscribes():
+	received = []
+	# a rejected subscription only loses its own topic, the router closing or aborting the session reconnects
+	router = _Router(['wait', 'wait', ('event', PAIR, 1), 'close'],
+					 ['wait', 'wait', ('event', PAIR, 2), 'abort'],
+					 ['wait', 'wait', ('event', PAIR, 3)])
+	router.rejected.add('BTC_BAD')
+	client = StreamClient()
+	client.subscribe(PAIR, _recorder(received))
+	client.subscribe('BTC_BAD', _recorder(received))
+
+	async def drive():
+		await _until(lambda: len(received) == 3)
+
+	_run(router, client, drive)
+	assert received == [(PAIR, n, n) for n in (1, 2, 3)]
+	assert router.connections == 3
+	assert client._joins == 3
+	assert sorted(router.subscribed) == sorted([PAIR, 'BTC_BAD'] * 3)
+
+
+def test_bad_handlers_and_malformed_messages_are_survived():
+	received = []
+
+	def failing(topic, args, kwargs):
+		raise IndexError('handler bug')
+
+	# an EVENT cut short, then an undecodable frame that forces a reconnect
+	router = _Router(['wait', ('event', PAIR, 1), ('raw', '[36]'), ('event', PAIR, 2), ('raw', 'not json{')],
+					 ['wait', ('event', PAIR, 3)])
+	client = StreamClient()
+	client.subscribe(PAIR, failing)
+	client.subscribe(PAIR, _recorder(received))
+
+	async def drive():
+		await _until(lambda: len(received) == 3)
+
+	_run(router, client, drive)
+	assert received == [(PAIR, n, n) for n in (1, 2, 3)]
+	assert router.connections == 2
+	assert router.subscribed == [PAIR, PAIR]
@@ -0,0 +1,120 @@
+from poloniex.construct.wizard import Wizard
+from poloniex.model.wizard_build import Tick
+from poloniex.stream.wamp_client import StreamClient
+
+import asyncio
+
+PAIR = 'BTC_ETH'
+START = {'bids': [['0.0490', '1.0']], 'asks': [['0.0510', '1.0']], 'seq': 0}
+
+
+class _API(object):
+	"""
+	Serves resync snapshots in turn, raising any that are exceptions
+	"""
+
+	def __init__(self, *responses):
+		self.responses = list(responses)
+		self.calls = 0
+
+	def marketOrders(self, pair, depth):
+		self.calls += 1
+		response = self.responses.pop(0)
+		if isinstance(response, Exception):
+			raise response
+		return response
+
+
+def _modify(side, rate, amount):
+	return {u'type': u'orderBookModify', u'data': {u'type': side, u'rate': rate, u'amount': amount}}
+
+
+def _tick(sequence, rate='0.0485', side=u'bid'):
+	return Tick(Tick.encode([_modify(side, rate, '1.0')], {u'seq': sequence}, 100.0 + sequence))
+
+
+def _wizard(api, gap_tolerance=2):
+	wizard = Wizard(PAIR, 10, gap_tolerance=gap_tolerance, api=api, market_orders=START, market_trade_history=[],
+					stream=StreamClient())
+	wizard.resync_retry_delay = 0.0
+	return wizard
+
+
+def test_failed_resync_snapshot_is_retried():
+	reloaded = {'bids': [['0.0450', '2.0']], 'asks': [['0.0550', '2.0']], 'seq': 5}
+	for failure in ({'error': 'Please do not make more than 6 API calls per second.'}, IOError('timed out'),
+					{'asks': []}):
+		api = _API(failure, reloaded)
+		wizard = _wizard(api)
+		for sequence in (1, 3, 4, 5):
+			wizard.on_tick(_tick(sequence))
+		# the failed snapshot left the wizard buffering, not stuck
+		assert api.calls == 1
+		assert wizard._resync_buffer is not None
+		assert wizard.sequence == 1
+
+		# the next tick retries, the snapshot loads and the buffer is replayed past it
+		wizard.on_tick(_tick(6, '0.0460'))
+		assert api.calls == 2
+		assert wizard._resync_buffer is None
+		assert wizard.sequence == 6
+		assert list(wizard.bid_book) == [(0.046, 1.0), (0.045, 2.0)]
+		wizard.on_tick(_tick(7, '0.0440'))
+		assert wizard.sequence == 7
+
+
+def _trade(trade_id, rate='0.0500'):
+	return {u'type': u'newTrade', u'data': {u'type': u'buy', u'rate': rate, u'amount': u'0.5', u'tradeID': trade_id,
+											u'date': u'2017-01-01 00:00:00', u'total': u'0.025'}}
+
+
+def test_out_of_order_ticks_are_applied_in_sequence():
+	api = _API()
+	wizard = _wizard(api)
+	for sequence, rate in ((1, '0.0485'), (3, '0.0475'), (2, '0.0480')):
+		wizard.on_tick(_tick(sequence, rate))
+	# a repeat of an applied tick changes nothing
+	wizard.on_tick(_tick(2, '0.0400'))
+
+	assert api.calls == 0
+	assert wizard.sequence == 3
+	assert (wizard.gaps, wizard.stale_ticks, wizard.resyncs) == (1, 1, 0)
+	assert wizard.bid_book.rates() == [0.049, 0.0485, 0.048, 0.0475]
+
+
+def test_unfilled_gap_resyncs_and_replays_newer_ticks():
+	api = _API({'bids': [['0.0450', '2.0']], 'asks': [['0.0550', '2.0']], 'seq': 4})
+	wizard = _wizard(api)
+	wizard.on_tick(_tick(1))
+	# sequence 2 never arrives, the third tick held past it is one more than gap_tolerance
+	wizard.on_tick(Tick(Tick.encode([_modify(u'bid', '0.0470', '1.0'), _trade(u'7')], {u'seq': 3}, 103.0)))
+	wizard.on_tick(_tick(4, '0.0465'))
+	assert api.calls == 0
+	wizard.on_tick(_tick(5, '0.0460'))
+
+	assert api.calls == 1
+	assert wizard.resyncs == 1
+	assert wizard._resync_buffer is None and not wizard._ahead
+	assert wizard.sequence == 5
+	# ticks 3 and 4 are already in the snapshot, only 5 is replayed over it, but tick 3's trade is kept
+	assert list(wizard.bid_book) == [(0.046, 1.0), (0.045, 2.0)]
+	assert list(wizard.ask_book) == [(0.055, 2.0)]
+	assert wizard.trade_book.trade_exists(u'7')
+
+
+def test_resync_snapshot_is_fetched_off_the_loop_thread():
+	api = _API(IOError('timed out'), {'bids': [['0.0450', '2.0']], 'asks': [['0.0550', '2.0']], 'seq': 3})
+	wizard = _wizard(api)
+
+	async def main():
+		wizard._loop = asyncio.get_event_loop()
+		for sequence in (1, 3, 4, 5):
+			wizard.on_tick(_tick(sequence))
+		# the failed fetch is retried from the loop, no further tick is needed
+		while wizard._resync_buffer is not None:
+			await asyncio.sleep(0.005)
+
+	asyncio.run(asyncio.wait_for(main(), 5.0))
+	assert api.calls == 2
+	assert wizard.sequence == 5
+	assert list(wizard.bid_book) == [(0.0485, 1.0), (0.045, 2.0)]